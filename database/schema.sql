@@ -231,6 +231,35 @@ CREATE TABLE system_audit_log (
 CREATE INDEX idx_audit_timestamp ON system_audit_log(created_at DESC);
 CREATE INDEX idx_audit_entity ON system_audit_log(entity_type, entity_id);
 
+-- ============================================================================
+-- 11. CHI Claim Rules (Declarative Validation)
+-- ============================================================================
+-- Compiled by the financial rules engine into its pricing snapshot (see
+-- financial-rules-engine/chi_rules.py for the condition format).
+-- scope 'item' rules apply to each claim line (optionally only to one SBS
+-- code or catalogue category), 'claim' rules to the priced claim.
+
+CREATE TABLE chi_claim_rules (
+    rule_id SERIAL PRIMARY KEY,
+    rule_code VARCHAR(50) UNIQUE NOT NULL,
+    description TEXT,
+    scope VARCHAR(10) NOT NULL CHECK (scope IN ('item', 'claim')),
+    sbs_code VARCHAR(50) REFERENCES sbs_master_catalogue(sbs_id),
+    category VARCHAR(50),
+    tier_level INT REFERENCES pricing_tier_rules(tier_level),
+    condition JSONB NOT NULL DEFAULT '{}',
+    action VARCHAR(10) NOT NULL CHECK (action IN ('reject', 'cap', 'flag')),
+    action_value DECIMAL(12,2),
+    message TEXT,
+    priority INT DEFAULT 100,
+    is_active BOOLEAN DEFAULT TRUE,
+    effective_date DATE NOT NULL DEFAULT CURRENT_DATE,
+    expiry_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CHECK (action <> 'cap' OR action_value IS NOT NULL),
+    CHECK (scope = 'item' OR (sbs_code IS NULL AND category IS NULL))
+);
+
 -- ============================================================================
 -- Triggers for updated_at timestamps
 -- ============================================================================
@@ -248,6 +277,98 @@ CREATE TRIGGER update_facilities_modtime BEFORE UPDATE ON facilities FOR EACH RO
 CREATE TRIGGER update_internal_codes_modtime BEFORE UPDATE ON facility_internal_codes FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 CREATE TRIGGER update_normalization_map_modtime BEFORE UPDATE ON sbs_normalization_map FOR EACH ROW EXECUTE FUNCTION update_modified_column();
 
+-- ============================================================================
+-- Cache Invalidation Notifications
+-- ============================================================================
+-- Services keep in-process copies of mapping data and LISTEN on these
+-- channels to drop them as soon as the underlying rows change.
+-- Payload: {"table": "<table>", "facility_id": <int or null>}
+-- A null facility_id means "invalidate everything" (e.g. catalogue edits).
+-- Identical payloads within one transaction are collapsed by Postgres, so bulk
+-- loads send one notification per facility.
+
+CREATE OR REPLACE FUNCTION notify_mapping_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_facility INT;
+    new_facility INT;
+BEGIN
+    IF TG_TABLE_NAME IN ('facility_internal_codes', 'facilities') THEN
+        IF TG_OP <> 'INSERT' THEN old_facility := OLD.facility_id; END IF;
+        IF TG_OP <> 'DELETE' THEN new_facility := NEW.facility_id; END IF;
+    ELSIF TG_TABLE_NAME = 'sbs_normalization_map' THEN
+        IF TG_OP <> 'INSERT' THEN
+            SELECT facility_id INTO old_facility FROM facility_internal_codes WHERE internal_code_id = OLD.internal_code_id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            SELECT facility_id INTO new_facility FROM facility_internal_codes WHERE internal_code_id = NEW.internal_code_id;
+        END IF;
+    END IF;
+
+    IF TG_TABLE_NAME = 'sbs_master_catalogue' THEN
+        PERFORM pg_notify('sbs_mapping_changed', json_build_object('table', TG_TABLE_NAME, 'facility_id', NULL)::text);
+    ELSE
+        IF old_facility IS NOT NULL AND old_facility IS DISTINCT FROM new_facility THEN
+            PERFORM pg_notify('sbs_mapping_changed', json_build_object('table', TG_TABLE_NAME, 'facility_id', old_facility)::text);
+        END IF;
+        -- An unresolvable facility (e.g. parent row already deleted) falls back to a full invalidation
+        PERFORM pg_notify('sbs_mapping_changed', json_build_object('table', TG_TABLE_NAME, 'facility_id', COALESCE(new_facility, old_facility))::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_normalization_map_change AFTER INSERT OR UPDATE OR DELETE ON sbs_normalization_map FOR EACH ROW EXECUTE FUNCTION notify_mapping_change();
+CREATE TRIGGER notify_internal_codes_change AFTER INSERT OR UPDATE OR DELETE ON facility_internal_codes FOR EACH ROW EXECUTE FUNCTION notify_mapping_change();
+CREATE TRIGGER notify_sbs_master_change AFTER INSERT OR UPDATE OR DELETE ON sbs_master_catalogue FOR EACH ROW EXECUTE FUNCTION notify_mapping_change();
+-- Mappings of inactive facilities are not served (v_active_mappings)
+CREATE TRIGGER notify_facilities_mapping_change AFTER UPDATE OF is_active OR DELETE ON facilities FOR EACH ROW EXECUTE FUNCTION notify_mapping_change();
+
+-- Pricing reference data (standard prices, tier markups, facility tiers,
+-- bundles, CHI claim rules) is snapshotted in memory by the financial rules
+-- engine, which reloads it on every notification. Statement-level, so a bulk
+-- price update sends one.
+-- Payload: {"table": "<table>"}
+
+CREATE OR REPLACE FUNCTION notify_pricing_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('sbs_pricing_changed', json_build_object('table', TG_TABLE_NAME)::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_sbs_master_pricing_change AFTER INSERT OR UPDATE OR DELETE ON sbs_master_catalogue FOR EACH STATEMENT EXECUTE FUNCTION notify_pricing_change();
+CREATE TRIGGER notify_pricing_tier_rules_change AFTER INSERT OR UPDATE OR DELETE ON pricing_tier_rules FOR EACH STATEMENT EXECUTE FUNCTION notify_pricing_change();
+CREATE TRIGGER notify_facilities_pricing_change AFTER INSERT OR UPDATE OR DELETE ON facilities FOR EACH STATEMENT EXECUTE FUNCTION notify_pricing_change();
+CREATE TRIGGER notify_service_bundles_pricing_change AFTER INSERT OR UPDATE OR DELETE ON service_bundles FOR EACH STATEMENT EXECUTE FUNCTION notify_pricing_change();
+CREATE TRIGGER notify_bundle_items_pricing_change AFTER INSERT OR UPDATE OR DELETE ON bundle_items FOR EACH STATEMENT EXECUTE FUNCTION notify_pricing_change();
+CREATE TRIGGER notify_chi_claim_rules_pricing_change AFTER INSERT OR UPDATE OR DELETE ON chi_claim_rules FOR EACH STATEMENT EXECUTE FUNCTION notify_pricing_change();
+
+-- Signing certificates: the signer service caches each facility's active
+-- certificate row and parsed private key, and drops a facility's entry on
+-- every notification. Row-level, so only the affected facilities reload.
+-- Payload: {"facility_id": <int>}
+
+CREATE OR REPLACE FUNCTION notify_certificate_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_facility INT;
+    new_facility INT;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN old_facility := OLD.facility_id; END IF;
+    IF TG_OP <> 'DELETE' THEN new_facility := NEW.facility_id; END IF;
+
+    IF old_facility IS NOT NULL AND old_facility IS DISTINCT FROM new_facility THEN
+        PERFORM pg_notify('sbs_certificates_changed', json_build_object('facility_id', old_facility)::text);
+    END IF;
+    PERFORM pg_notify('sbs_certificates_changed', json_build_object('facility_id', COALESCE(new_facility, old_facility))::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_facility_certificates_change AFTER INSERT OR UPDATE OR DELETE ON facility_certificates FOR EACH ROW EXECUTE FUNCTION notify_certificate_change();
+
 -- ============================================================================
 -- Sample Data for Testing
 -- ============================================================================
@@ -263,6 +384,10 @@ INSERT INTO sbs_master_catalogue (sbs_id, description_ar, description_en, versio
 INSERT INTO facilities (facility_code, facility_name, facility_name_ar, chi_license_number, accreditation_tier, region, city) VALUES
 ('FAC-001', 'King Fahad Medical City', 'مدينة الملك فهد الطبية', 'CHI-RYD-001', 1, 'Riyadh', 'Riyadh');
 
+-- Sample CHI Claim Rule
+INSERT INTO chi_claim_rules (rule_code, description, scope, category, condition, action, message) VALUES
+('LAB-UNITS-REVIEW', 'Unusually high lab test quantities', 'item', 'Lab', '{"field": "units", "op": ">", "value": 10}', 'flag', 'More than 10 units of a lab test require review');
+
 -- Sample Internal Codes
 INSERT INTO facility_internal_codes (internal_code, facility_id, local_description, price_gross) VALUES
 ('LAB-CBC-01', 1, 'CBC - Complete Blood Count Test', 60.00),
@@ -288,7 +413,8 @@ SELECT
     snm.sbs_code,
     smc.description_en as sbs_description,
     snm.confidence,
-    snm.mapping_source
+    snm.mapping_source,
+    smc.description_ar as sbs_description_ar
 FROM sbs_normalization_map snm
 JOIN facility_internal_codes fic ON snm.internal_code_id = fic.internal_code_id
 JOIN facilities f ON fic.facility_id = f.facility_id
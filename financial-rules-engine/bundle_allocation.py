@@ -0,0 +1,150 @@
+"""
+Bundle Allocation
+Chooses which bundles a claim is billed under: the set of non-overlapping
+bundle applications (a bundle may apply more than once) that minimizes the
+payable amount, i.e. maximizes the saving over individual pricing. Lines
+not absorbed by a bundle are priced individually.
+
+- greedy: applies candidates best-saving-first (and, separately,
+  best-saving-per-line-first) and keeps the better of the two. Always runs
+  and seeds the exact search.
+- exact: depth-first branch and bound over the candidate bundles, used when
+  there are at most max_exact_candidates of them. The bound is the value of
+  the lines the remaining candidates could still absorb. The search stops at
+  time_budget seconds and returns the best allocation found so far
+  (method "bounded").
+"""
+
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+import time
+
+from bundle_index import (
+    Bundle,
+    BundleAssignment,
+    BundleIndex,
+    ClaimLine,
+    bundle_saving,
+    claim_units,
+    group_lines,
+    take_lines
+)
+
+ZERO = Decimal("0")
+
+DEFAULT_MAX_EXACT_CANDIDATES = 16
+DEFAULT_TIME_BUDGET = 0.02
+
+
+class Allocation(NamedTuple):
+    assignments: List[BundleAssignment]
+    leftovers: List[ClaimLine]
+    saving: Decimal
+    # "none" (no candidates), "greedy", "exact" or "bounded" (exact search hit its time budget)
+    method: str
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _without(available: Dict[str, Tuple[ClaimLine, ...]], taken: Sequence[ClaimLine]) -> Dict[str, Tuple[ClaimLine, ...]]:
+    used = {line.sequence for line in taken}
+    remaining = dict(available)
+    for code in {line.sbs_code for line in taken}:
+        remaining[code] = tuple(line for line in available[code] if line.sequence not in used)
+    return remaining
+
+
+def _greedy(candidates: Sequence[Bundle], available: Dict[str, Tuple[ClaimLine, ...]]) -> List[BundleAssignment]:
+    """Apply each candidate in order as often as it still saves money"""
+    assignments = []
+    for bundle in candidates:
+        while True:
+            taken = take_lines(bundle, available)
+            if taken is None:
+                break
+            saving = bundle_saving(bundle, taken)
+            if saving <= 0:
+                break
+            assignments.append(BundleAssignment(bundle, taken, saving))
+            available = _without(available, taken)
+    return assignments
+
+
+def _total(assignments: Sequence[BundleAssignment]) -> Decimal:
+    return sum((assignment.saving for assignment in assignments), ZERO)
+
+
+class _ExactSearch:
+    """Branch and bound: at each candidate either apply it once more or move on"""
+
+    def __init__(self, candidates: Sequence[Bundle], incumbent: List[BundleAssignment], deadline: float):
+        self.candidates = candidates
+        self.best = incumbent
+        self.best_saving = _total(incumbent)
+        self.deadline = deadline
+        self.nodes = 0
+        # Codes any candidate from position i on can still absorb
+        self.suffix_codes = [frozenset()] * (len(candidates) + 1)
+        for i in range(len(candidates) - 1, -1, -1):
+            codes = {item.sbs_code for item in candidates[i].items}
+            self.suffix_codes[i] = self.suffix_codes[i + 1] | codes
+
+    def bound(self, i: int, available: Dict[str, Tuple[ClaimLine, ...]]) -> Decimal:
+        return sum(
+            (line.price or ZERO for code in self.suffix_codes[i] for line in available.get(code, ())),
+            ZERO
+        )
+
+    def search(self, i: int, available, saving: Decimal, chosen: List[BundleAssignment]) -> None:
+        self.nodes += 1
+        if self.nodes % 256 == 0 and time.perf_counter() > self.deadline:
+            raise _OutOfTime()
+        if saving > self.best_saving:
+            self.best, self.best_saving = list(chosen), saving
+        if i == len(self.candidates) or saving + self.bound(i, available) <= self.best_saving:
+            return
+
+        bundle = self.candidates[i]
+        taken = take_lines(bundle, available)
+        if taken is not None:
+            gain = bundle_saving(bundle, taken)
+            if gain > 0:
+                chosen.append(BundleAssignment(bundle, taken, gain))
+                self.search(i, _without(available, taken), saving + gain, chosen)
+                chosen.pop()
+        self.search(i + 1, available, saving, chosen)
+
+
+def allocate_bundles(index: BundleIndex, lines: Sequence[ClaimLine],
+                     max_exact_candidates: int = DEFAULT_MAX_EXACT_CANDIDATES,
+                     time_budget: float = DEFAULT_TIME_BUDGET) -> Allocation:
+    """Bundle applications with the largest total saving, and the lines left to price individually"""
+    started = time.perf_counter()
+    available = {code: tuple(code_lines) for code, code_lines in group_lines(lines).items()}
+
+    candidates = []
+    for bundle in index.match(claim_units(lines)):
+        taken = take_lines(bundle, available)
+        if taken is not None and bundle_saving(bundle, taken) > 0:
+            candidates.append((bundle_saving(bundle, taken), len(taken), bundle))
+    if not candidates:
+        return Allocation([], list(lines), ZERO, "none")
+
+    by_saving = [c[2] for c in sorted(candidates, key=lambda c: (-c[0], c[2].bundle_id))]
+    by_ratio = [c[2] for c in sorted(candidates, key=lambda c: (-c[0] / c[1], c[2].bundle_id))]
+    best = max(_greedy(by_saving, available), _greedy(by_ratio, available), key=_total)
+    method = "greedy"
+
+    if len(candidates) <= max_exact_candidates:
+        search = _ExactSearch(by_saving, best, started + time_budget)
+        try:
+            search.search(0, available, ZERO, [])
+            method = "exact"
+        except _OutOfTime:
+            method = "bounded"
+        best = search.best
+
+    used = {line.sequence for assignment in best for line in assignment.lines}
+    return Allocation(best, [line for line in lines if line.sequence not in used], _total(best), method)
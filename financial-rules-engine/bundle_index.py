@@ -0,0 +1,162 @@
+"""
+Bundle Index
+In-memory index of the active service bundles, so a claim is matched
+against every bundle without a database round trip.
+
+Layout:
+- bundles: one Bundle per active bundle with a price; bundle item i is
+  bit 1 << i of that bundle, mandatory items form mandatory_mask
+- postings: sbs_code -> ((bundle slot, bit, quantity), ...)
+
+match() walks the postings of the claim's codes only, OR-ing the bit of each
+bundle item whose quantity the claim covers. A bundle is satisfied when all
+of its mandatory bits are set and at least MIN_MATCHED_ITEMS items are
+covered; optional items count when present but are never required.
+
+take_lines() fills a bundle with whole claim lines; bundle_allocation
+decides which bundles to apply.
+"""
+
+from decimal import Decimal
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import sys
+
+# Carried over from the original SQL (HAVING COUNT(bi.sbs_code) >= 2)
+MIN_MATCHED_ITEMS = 2
+
+
+class BundleItem(NamedTuple):
+    sbs_code: str
+    quantity: int
+    is_mandatory: bool
+
+
+class Bundle(NamedTuple):
+    bundle_id: int
+    bundle_code: str
+    bundle_name: str
+    price: Decimal
+    items: Tuple[BundleItem, ...]
+    mandatory_mask: int
+
+
+class ClaimLine(NamedTuple):
+    """One priced line of a claim: its 1-based sequence, code, units and standard price"""
+    sequence: int
+    sbs_code: str
+    units: int
+    price: Optional[Decimal]
+
+
+class BundleAssignment(NamedTuple):
+    bundle: Bundle
+    lines: Tuple[ClaimLine, ...]
+    saving: Decimal
+
+
+class BundleIndex:
+    """Immutable inverted index from SBS code to the bundle items that use it"""
+
+    __slots__ = ("bundles", "postings")
+
+    def __init__(self, bundles: Sequence[Bundle]):
+        self.bundles = tuple(bundles)
+        postings: Dict[str, List[Tuple[int, int, int]]] = {}
+        for slot, bundle in enumerate(self.bundles):
+            for position, item in enumerate(bundle.items):
+                postings.setdefault(item.sbs_code, []).append((slot, 1 << position, item.quantity))
+        self.postings = {code: tuple(entries) for code, entries in postings.items()}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping]) -> "BundleIndex":
+        """
+        Build from one row per bundle item with bundle_id, bundle_code,
+        bundle_name, total_allowed_price, sbs_code, quantity, is_mandatory.
+        Bundles without a price are skipped.
+        """
+        headers: Dict[int, Mapping] = {}
+        items: Dict[int, List[BundleItem]] = {}
+        for row in rows:
+            if row["total_allowed_price"] is None:
+                continue
+            headers.setdefault(row["bundle_id"], row)
+            items.setdefault(row["bundle_id"], []).append(BundleItem(
+                sys.intern(row["sbs_code"]),
+                max(1, int(row["quantity"] or 1)),
+                row["is_mandatory"] is not False
+            ))
+
+        bundles = []
+        for bundle_id in sorted(headers):
+            row = headers[bundle_id]
+            bundle_items = tuple(sorted(items[bundle_id], key=lambda item: (not item.is_mandatory, item.sbs_code)))
+            mandatory_mask = sum(1 << i for i, item in enumerate(bundle_items) if item.is_mandatory)
+            bundles.append(Bundle(
+                bundle_id, row["bundle_code"], row["bundle_name"],
+                Decimal(str(row["total_allowed_price"])), bundle_items, mandatory_mask
+            ))
+        return cls(bundles)
+
+    def __len__(self) -> int:
+        return len(self.bundles)
+
+    def match(self, units: Mapping[str, int]) -> List[Bundle]:
+        """Bundles fully satisfied by the claim's units per SBS code"""
+        covered: Dict[int, int] = {}
+        for code, available in units.items():
+            for slot, bit, quantity in self.postings.get(code, ()):
+                if available >= quantity:
+                    covered[slot] = covered.get(slot, 0) | bit
+
+        satisfied = []
+        for slot, mask in covered.items():
+            bundle = self.bundles[slot]
+            if mask & bundle.mandatory_mask == bundle.mandatory_mask and bin(mask).count("1") >= MIN_MATCHED_ITEMS:
+                satisfied.append(bundle)
+        return satisfied
+
+
+def claim_units(lines: Iterable[ClaimLine]) -> Dict[str, int]:
+    units: Dict[str, int] = {}
+    for line in lines:
+        units[line.sbs_code] = units.get(line.sbs_code, 0) + line.units
+    return units
+
+
+def take_lines(bundle: Bundle, available: Mapping[str, Sequence[ClaimLine]]) -> Optional[Tuple[ClaimLine, ...]]:
+    """
+    Whole claim lines that fill the bundle from the available lines, or None
+    if a mandatory item cannot be covered. Optional items take what is there.
+    """
+    taken: List[ClaimLine] = []
+    matched = 0
+    for item in bundle.items:
+        lines = available.get(item.sbs_code, ())
+        start = len(taken)
+        units = 0
+        for line in lines:
+            if units >= item.quantity:
+                break
+            taken.append(line)
+            units += line.units
+        if units >= item.quantity:
+            matched += 1
+        elif item.is_mandatory:
+            return None
+        else:
+            del taken[start:]  # a partially covered optional item is not absorbed
+    if matched < MIN_MATCHED_ITEMS:
+        return None
+    return tuple(taken)
+
+
+def bundle_saving(bundle: Bundle, lines: Iterable[ClaimLine]) -> Decimal:
+    """Individual base prices the bundle replaces minus its price (unpriced lines count as 0)"""
+    return sum((line.price or Decimal("0") for line in lines), Decimal("0")) - bundle.price
+
+
+def group_lines(lines: Iterable[ClaimLine]) -> Dict[str, List[ClaimLine]]:
+    grouped: Dict[str, List[ClaimLine]] = {}
+    for line in lines:
+        grouped.setdefault(line.sbs_code, []).append(line)
+    return grouped
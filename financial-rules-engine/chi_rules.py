@@ -0,0 +1,427 @@
+"""
+CHI Claim Rules
+Declarative claim rules stored in chi_claim_rules, compiled once per pricing
+snapshot into Python closures and indexed so that a claim line only
+evaluates the rules that can apply to it.
+
+A rule row:
+- scope: "item" (each coded claim line, before bundling) or "claim" (the
+  priced claim)
+- sbs_code, category, tier_level: where the rule applies; null matches any.
+  Item rules are indexed by SBS code and catalogue category.
+- condition: JSON predicate; an empty condition always matches, e.g.
+    {"all": [{"field": "units", "op": ">", "value": 4},
+             {"not": {"field": "facility_id", "op": "in", "value": [1, 2]}}]}
+  Combinators: all, any, not. Operators: ==, !=, <, <=, >, >=, in, not_in,
+  contains. Fields: ITEM_FIELDS or CLAIM_FIELDS; money fields compare as
+  exact Decimals. Literals must fit the field: numbers for number and money
+  fields, strings for codes and categories, lists for in/not_in; contains
+  applies to sbs_codes only.
+- action: reject (item: line not payable; claim: claim rejected), cap
+  (item: base price capped at action_value; claim: payable amount capped at
+  action_value) or flag (reported only).
+- priority: lower runs first; evaluation of a line or claim stops at the
+  first reject.
+
+Coverage limits in pricing_tier_rules compile into built-in claim rules:
+base_coverage_limit caps the payable amount of a claim, and
+annual_coverage_limit flags a claim that alone exceeds it (year-to-date
+spend per patient is not tracked by this service).
+
+Every compiled rule counts its evaluations, matches and failed evaluations
+(counted as no match) and the time spent in its predicate (GET /admin/rules). Counters are plain integers updated
+without locking, so they are approximate under concurrent requests, and
+they restart from zero when the snapshot is recompiled.
+"""
+
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import hashlib
+import json
+import operator
+import time
+
+RULES_QUERY = """
+SELECT
+    rule_code,
+    scope,
+    sbs_code,
+    category,
+    tier_level,
+    condition,
+    action,
+    action_value::text AS action_value,
+    message,
+    priority
+FROM chi_claim_rules
+WHERE is_active = TRUE
+  AND effective_date <= CURRENT_DATE
+  AND (expiry_date IS NULL OR expiry_date > CURRENT_DATE)
+ORDER BY priority, rule_code
+"""
+
+COVERAGE_LIMITS_QUERY = """
+SELECT
+    tier_level,
+    base_coverage_limit::text AS base_coverage_limit,
+    annual_coverage_limit::text AS annual_coverage_limit
+FROM pricing_tier_rules
+WHERE base_coverage_limit IS NOT NULL OR annual_coverage_limit IS NOT NULL
+ORDER BY tier_level
+"""
+
+ITEM_FIELDS = {"sbs_code", "category", "units", "base_price", "tier_level", "facility_id"}
+CLAIM_FIELDS = {"total", "item_count", "tier_level", "facility_id", "sbs_codes"}
+MONEY_FIELDS = {"base_price", "total"}
+NUMBER_FIELDS = {"units", "item_count", "tier_level", "facility_id"}
+STRING_FIELDS = {"sbs_code", "category"}
+COLLECTION_FIELDS = {"sbs_codes"}
+
+ACTIONS = {"reject", "cap", "flag"}
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda field, value: field in value,
+    "not_in": lambda field, value: field not in value,
+    "contains": lambda field, value: value in field,
+}
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+class RuleCompileError(ValueError):
+    pass
+
+
+class RuleOutcome(NamedTuple):
+    rule_code: str
+    action: str
+    value: Optional[Decimal]
+    message: str
+
+
+def _check_scalar(field: str, value: Any) -> None:
+    if field in NUMBER_FIELDS or field in MONEY_FIELDS:
+        expected, ok = "a number", isinstance(value, (int, float)) and not isinstance(value, bool)
+        if field in MONEY_FIELDS and isinstance(value, str):
+            ok = True
+    else:
+        expected, ok = "a string", isinstance(value, str)
+    if not ok:
+        raise RuleCompileError(f"{field!r} compares with {expected}, got {value!r}")
+
+
+def _check_literal(field: str, op: str, value: Any) -> None:
+    """Raise RuleCompileError unless the literal can be compared with the field by op"""
+    if op == "contains":
+        if field not in COLLECTION_FIELDS:
+            raise RuleCompileError(f"contains needs a collection field, got {field!r}")
+        _check_scalar("sbs_code", value)
+        return
+    if field in COLLECTION_FIELDS:
+        raise RuleCompileError(f"{field!r} only supports contains, got {op!r}")
+    if op in ("in", "not_in"):
+        if not isinstance(value, list):
+            raise RuleCompileError(f"{op} needs a list, got {value!r}")
+        for item in value:
+            _check_scalar(field, item)
+        return
+    _check_scalar(field, value)
+
+
+def _literal(field: str, value: Any) -> Any:
+    if field in MONEY_FIELDS:
+        if isinstance(value, list):
+            return [Decimal(str(v)) for v in value]
+        return Decimal(str(value))
+    return value
+
+
+def compile_condition(node: Any, fields: set) -> Predicate:
+    """Closure evaluating a JSON predicate against a context dict"""
+    if not node:
+        return lambda ctx: True
+    if not isinstance(node, dict):
+        raise RuleCompileError(f"Condition must be an object, got {node!r}")
+
+    if "all" in node or "any" in node:
+        combinator = all if "all" in node else any
+        predicates = [compile_condition(child, fields) for child in node["all" if "all" in node else "any"]]
+        return lambda ctx: combinator(predicate(ctx) for predicate in predicates)
+    if "not" in node:
+        inner = compile_condition(node["not"], fields)
+        return lambda ctx: not inner(ctx)
+
+    field, op = node.get("field"), node.get("op")
+    if field not in fields:
+        raise RuleCompileError(f"Unknown field {field!r}; expected one of {sorted(fields)}")
+    if op not in OPERATORS:
+        raise RuleCompileError(f"Unknown operator {op!r}; expected one of {sorted(OPERATORS)}")
+    if "value" not in node:
+        raise RuleCompileError(f"Condition on {field!r} has no value")
+    _check_literal(field, op, node["value"])
+    compare = OPERATORS[op]
+    value = _literal(field, node["value"])
+    if op in ("in", "not_in"):
+        value = frozenset(value)
+
+    def leaf(ctx: Dict[str, Any]) -> bool:
+        actual = ctx.get(field)
+        if actual is None:
+            return False
+        return compare(actual, value)
+    return leaf
+
+
+class RuleStats:
+    __slots__ = ("evaluations", "matches", "errors", "nanoseconds")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.matches = 0
+        self.errors = 0
+        self.nanoseconds = 0
+
+
+class CompiledRule:
+    """One rule: applicability keys, compiled condition, action and counters"""
+
+    __slots__ = ("rule_code", "scope", "sbs_code", "category", "tier_level", "action", "value",
+                 "message", "priority", "predicate", "builtin", "stats")
+
+    def __init__(self, rule_code: str, scope: str, predicate: Predicate, action: str,
+                 value: Optional[Decimal] = None, message: str = "", priority: int = 100,
+                 sbs_code: Optional[str] = None, category: Optional[str] = None,
+                 tier_level: Optional[int] = None, builtin: bool = False):
+        self.rule_code = rule_code
+        self.scope = scope
+        self.sbs_code = sbs_code
+        self.category = category
+        self.tier_level = tier_level
+        self.action = action
+        self.value = value
+        self.message = message
+        self.priority = priority
+        self.predicate = predicate
+        self.builtin = builtin
+        self.stats = RuleStats()
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "CompiledRule":
+        rule_code = row["rule_code"]
+        scope = row["scope"]
+        if scope not in ("item", "claim"):
+            raise RuleCompileError(f"Rule {rule_code}: unknown scope {scope!r}")
+        if row["action"] not in ACTIONS:
+            raise RuleCompileError(f"Rule {rule_code}: unknown action {row['action']!r}")
+        if row["action"] == "cap" and row.get("action_value") is None:
+            raise RuleCompileError(f"Rule {rule_code}: cap needs an action_value")
+        if scope == "claim" and (row.get("sbs_code") or row.get("category")):
+            raise RuleCompileError(f"Rule {rule_code}: claim rules cannot be scoped to a code or category")
+
+        condition = row.get("condition")
+        if isinstance(condition, str):
+            condition = json.loads(condition)
+        try:
+            predicate = compile_condition(condition, ITEM_FIELDS if scope == "item" else CLAIM_FIELDS)
+        except (RuleCompileError, TypeError, ValueError, ArithmeticError) as e:
+            raise RuleCompileError(f"Rule {rule_code}: {e}")
+
+        return cls(
+            rule_code,
+            scope,
+            predicate,
+            row["action"],
+            value=Decimal(str(row["action_value"])) if row.get("action_value") is not None else None,
+            message=row.get("message") or rule_code,
+            priority=row.get("priority") if row.get("priority") is not None else 100,
+            sbs_code=row.get("sbs_code"),
+            category=row.get("category"),
+            tier_level=row.get("tier_level")
+        )
+
+    def matches(self, ctx: Dict[str, Any]) -> bool:
+        """Whether the rule applies to ctx; a predicate that fails is counted and does not match"""
+        stats = self.stats
+        started = time.perf_counter_ns()
+        try:
+            matched = self.predicate(ctx)
+        except (TypeError, ValueError, ArithmeticError) as e:
+            matched = False
+            stats.errors += 1
+            # Once per compiled rule; later failures are only counted (GET /admin/rules)
+            if stats.errors == 1:
+                print(f"✗ CHI rule {self.rule_code} failed, treated as no match: {e}")
+        stats.nanoseconds += time.perf_counter_ns() - started
+        stats.evaluations += 1
+        if matched:
+            stats.matches += 1
+        return matched
+
+
+def coverage_rules(rows: Iterable[Dict[str, Any]]) -> List[CompiledRule]:
+    """Built-in claim rules for the coverage limits of each pricing tier"""
+    rules = []
+    for row in rows:
+        tier = row["tier_level"]
+        if row.get("base_coverage_limit") is not None:
+            limit = Decimal(str(row["base_coverage_limit"]))
+            rules.append(CompiledRule(
+                f"TIER{tier}-BASE-COVERAGE", "claim",
+                compile_condition({"field": "total", "op": ">", "value": str(limit)}, CLAIM_FIELDS),
+                "cap", value=limit, tier_level=tier, priority=1000, builtin=True,
+                message=f"Claim total exceeds the tier {tier} base coverage limit of {limit} SAR"
+            ))
+        if row.get("annual_coverage_limit") is not None:
+            limit = Decimal(str(row["annual_coverage_limit"]))
+            rules.append(CompiledRule(
+                f"TIER{tier}-ANNUAL-COVERAGE", "claim",
+                compile_condition({"field": "total", "op": ">", "value": str(limit)}, CLAIM_FIELDS),
+                "flag", value=limit, tier_level=tier, priority=1000, builtin=True,
+                message=f"Claim total alone exceeds the tier {tier} annual coverage limit of {limit} SAR"
+            ))
+    return rules
+
+
+def _evaluate(rules: Tuple[CompiledRule, ...], ctx: Dict[str, Any]) -> List[RuleOutcome]:
+    outcomes = []
+    for rule in rules:
+        if rule.matches(ctx):
+            outcomes.append(RuleOutcome(rule.rule_code, rule.action, rule.value, rule.message))
+            if rule.action == "reject":
+                break
+    return outcomes
+
+
+def _by_priority(rules: Iterable[CompiledRule]) -> Tuple[CompiledRule, ...]:
+    return tuple(sorted(rules, key=lambda rule: (rule.priority, rule.rule_code)))
+
+
+class RuleSet:
+    """
+    Compiled rules with their applicability indexes. Item rules are found
+    through the line's SBS code and category (from categories, the
+    catalogue category of each code); the applicable tuple for each
+    (code, tier) and each tier is built on first use and memoized.
+    """
+
+    def __init__(self, rules: Iterable[CompiledRule] = (), categories: Optional[Dict[str, str]] = None,
+                 errors: Iterable[str] = (), version: str = ""):
+        self.rules = _by_priority(rules)
+        self.categories = categories or {}
+        self.errors = list(errors)
+        self.version = version
+        self._by_code: Dict[str, List[CompiledRule]] = {}
+        self._by_category: Dict[str, List[CompiledRule]] = {}
+        self._any_item: List[CompiledRule] = []
+        self._claim: List[CompiledRule] = []
+        for rule in self.rules:
+            if rule.scope == "claim":
+                self._claim.append(rule)
+            elif rule.sbs_code:
+                self._by_code.setdefault(rule.sbs_code, []).append(rule)
+            elif rule.category:
+                self._by_category.setdefault(rule.category, []).append(rule)
+            else:
+                self._any_item.append(rule)
+        self._item_cache: Dict[Tuple[str, Any], Tuple[CompiledRule, ...]] = {}
+        self._claim_cache: Dict[Any, Tuple[CompiledRule, ...]] = {}
+
+    @classmethod
+    def from_rows(cls, rule_rows: Iterable[Dict[str, Any]], coverage_rows: Iterable[Dict[str, Any]] = (),
+                  categories: Optional[Dict[str, str]] = None) -> "RuleSet":
+        """Compile rule rows plus tier coverage limits; invalid rules are skipped and listed in errors"""
+        rule_rows, coverage_rows = list(rule_rows), list(coverage_rows)
+        rules, errors = coverage_rules(coverage_rows), []
+        for row in rule_rows:
+            try:
+                rules.append(CompiledRule.from_row(row))
+            except (RuleCompileError, KeyError) as e:
+                errors.append(str(e))
+                print(f"✗ Skipping CHI rule: {e}")
+        return cls(rules, categories, errors, rules_version(rule_rows, coverage_rows))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def item_rules(self, sbs_code: str, tier_level: Any) -> Tuple[CompiledRule, ...]:
+        key = (sbs_code, tier_level)
+        rules = self._item_cache.get(key)
+        if rules is None:
+            candidates = (
+                self._by_code.get(sbs_code, [])
+                + self._by_category.get(self.categories.get(sbs_code), [])
+                + self._any_item
+            )
+            rules = _by_priority(
+                rule for rule in candidates if rule.tier_level is None or rule.tier_level == tier_level
+            )
+            self._item_cache[key] = rules
+        return rules
+
+    def claim_rules(self, tier_level: Any) -> Tuple[CompiledRule, ...]:
+        rules = self._claim_cache.get(tier_level)
+        if rules is None:
+            rules = tuple(rule for rule in self._claim if rule.tier_level is None or rule.tier_level == tier_level)
+            self._claim_cache[tier_level] = rules
+        return rules
+
+    def evaluate_item(self, sbs_code: str, units: int, base_price: Optional[Decimal],
+                      tier_level: Any, facility_id: int) -> List[RuleOutcome]:
+        rules = self.item_rules(sbs_code, tier_level)
+        if not rules:
+            return []
+        return _evaluate(rules, {
+            "sbs_code": sbs_code,
+            "category": self.categories.get(sbs_code),
+            "units": units,
+            "base_price": base_price,
+            "tier_level": tier_level,
+            "facility_id": facility_id,
+        })
+
+    def evaluate_claim(self, total: Decimal, item_count: int, sbs_codes: Iterable[str],
+                       tier_level: Any, facility_id: int) -> List[RuleOutcome]:
+        rules = self.claim_rules(tier_level)
+        if not rules:
+            return []
+        return _evaluate(rules, {
+            "total": total,
+            "item_count": item_count,
+            "sbs_codes": frozenset(sbs_codes),
+            "tier_level": tier_level,
+            "facility_id": facility_id,
+        })
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-rule evaluation counters and timings"""
+        return [
+            {
+                "rule_code": rule.rule_code,
+                "scope": rule.scope,
+                "action": rule.action,
+                "builtin": rule.builtin,
+                "evaluations": rule.stats.evaluations,
+                "matches": rule.stats.matches,
+                "errors": rule.stats.errors,
+                "total_ms": round(rule.stats.nanoseconds / 1e6, 3),
+                "mean_us": round(rule.stats.nanoseconds / rule.stats.evaluations / 1e3, 3)
+                if rule.stats.evaluations else 0.0,
+            }
+            for rule in self.rules
+        ]
+
+
+def rules_version(rule_rows: Iterable[Dict[str, Any]], coverage_rows: Iterable[Dict[str, Any]]) -> str:
+    """Short hash of the rule definitions and coverage limits"""
+    digest = hashlib.sha256()
+    for row in sorted(rule_rows, key=lambda row: row["rule_code"]):
+        digest.update(f"r|{json.dumps(row, sort_keys=True, default=str)}\n".encode())
+    for row in sorted(coverage_rows, key=lambda row: row["tier_level"]):
+        digest.update(f"c|{json.dumps(row, sort_keys=True, default=str)}\n".encode())
+    return digest.hexdigest()[:16]
@@ -0,0 +1,287 @@
+"""
+Claim Pricing
+Prices FHIR claims from already-resolved reference data (facility tiers,
+standard prices, bundle index), with no I/O, so /validate and
+/validate/batch share the same rules and a batch resolves its reference
+data once for all of its claims. Amounts are computed in integer halalas
+by pricing_kernel.
+"""
+
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+import json
+
+from bundle_allocation import allocate_bundles
+from bundle_index import BundleAssignment, BundleIndex, ClaimLine
+from chi_rules import RuleOutcome, RuleSet
+from pricing_kernel import (
+    ROUND_HALF_EVEN,
+    apply_markup,
+    apply_markup_batch,
+    claim_totals,
+    from_halalas,
+    to_halalas,
+    to_halalas_array
+)
+
+SBS_SERVICES_SYSTEM = "http://sbs.sa/coding/services"
+SBS_BUNDLES_SYSTEM = "http://sbs.sa/coding/bundles"
+
+
+class ClaimPricingError(Exception):
+    """A claim that cannot be priced; status_code is the HTTP status to report"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def item_sbs_code(item: Dict[str, Any]) -> Optional[str]:
+    """First SBS service coding of a claim item"""
+    if 'productOrService' in item and 'coding' in item['productOrService']:
+        for coding in item['productOrService']['coding']:
+            if coding.get('system') == SBS_SERVICES_SYSTEM:
+                return coding['code']
+    return None
+
+
+def item_units(item: Dict[str, Any]) -> int:
+    """Units on a claim item (FHIR quantity.value), at least 1"""
+    quantity = item.get('quantity')
+    value = quantity.get('value') if isinstance(quantity, dict) else quantity
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def coded_items(items: List[Dict[str, Any]]) -> List[Tuple[int, str, int]]:
+    """(1-based sequence, SBS code, units) of every claim item carrying an SBS code"""
+    coded = []
+    for idx, item in enumerate(items, start=1):
+        sbs_code = item_sbs_code(item)
+        if sbs_code:
+            coded.append((idx, sbs_code, item_units(item)))
+    return coded
+
+
+def apply_pricing_markup(base_price: Decimal, markup_pct: float, rounding: str = ROUND_HALF_EVEN) -> Decimal:
+    """Apply facility tier markup to base price"""
+    return from_halalas(apply_markup(to_halalas(base_price), markup_pct, rounding))
+
+
+def unwrap_claim(body: Any) -> Any:
+    """Accept both {"claim": {...}} and a bare claim"""
+    if isinstance(body, dict) and "claim" in body:
+        return body["claim"]
+    return body
+
+
+def parse_claim_entry(claim: Any) -> Union[Dict[str, Any], ClaimPricingError]:
+    """A decoded batch entry as a claim body, or a ClaimPricingError if it is not an object"""
+    if isinstance(claim, dict):
+        return unwrap_claim(claim)
+    return ClaimPricingError(422, "Claim must be a JSON object")
+
+
+def parse_claim_array(body: bytes) -> List[Union[Dict[str, Any], ClaimPricingError]]:
+    """Claims of a JSON-array /validate/batch body; a malformed array raises ValueError"""
+    claims = json.loads(body)
+    if not isinstance(claims, list):
+        raise ValueError("Expected a JSON array of claims")
+    return [parse_claim_entry(claim) for claim in claims]
+
+
+def parse_claim_line(line: bytes) -> Union[Dict[str, Any], ClaimPricingError]:
+    """One NDJSON line of a /validate/batch body; a malformed line becomes a ClaimPricingError"""
+    try:
+        claim = json.loads(line)
+    except ValueError as e:
+        return ClaimPricingError(400, f"Invalid JSON: {e}")
+    return parse_claim_entry(claim)
+
+
+async def iter_ndjson_claims(chunks: AsyncIterable[bytes]) -> AsyncIterator[Union[Dict[str, Any], ClaimPricingError]]:
+    """Claims of an NDJSON body, one per non-blank line, parsed as its chunks arrive"""
+    pending = b""
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield parse_claim_line(line)
+    if pending.strip():
+        yield parse_claim_line(pending)
+
+
+def _rule_result(outcome: RuleOutcome, sequence: Optional[int] = None) -> Dict[str, Any]:
+    result = {"rule": outcome.rule_code, "action": outcome.action, "message": outcome.message}
+    if sequence is not None:
+        result["sequence"] = sequence
+    return result
+
+
+def price_claims(claims: Sequence[Tuple[int, List[Dict[str, Any]]]], facilities: Dict[int, Optional[Dict[str, Any]]],
+                 prices: Dict[str, Decimal], bundles: BundleIndex, pricing_version: str,
+                 max_exact_candidates: int, time_budget: float, rounding: str = ROUND_HALF_EVEN,
+                 rules: Optional[RuleSet] = None) -> List[Union[Dict[str, Any], ClaimPricingError]]:
+    """
+    Validated claim bodies (see ValidatedClaim in main.py) for (facility_id,
+    items) pairs, in order; a claim that cannot be priced gets a
+    ClaimPricingError in its slot.
+
+    Rules Applied:
+    1. Item CHI rules (reject, cap or flag each line; see chi_rules)
+    2. Calculate service bundles (non-overlapping; remaining items priced individually)
+    3. Apply facility tier markup
+    4. Calculate net prices
+    5. Claim CHI rules, including the tier coverage limits (reject the
+       claim, cap the payable amount or flag)
+
+    Bundles are allocated claim by claim; the markup, rounding and totals of
+    every billed line of every claim are then computed in one pricing kernel
+    call, in integer halalas.
+    """
+    plans: List[Any] = []
+    base_prices: List[Decimal] = []
+    line_markups: List[Any] = []
+    offsets = [0]
+
+    for facility_id, items in claims:
+        facility_info = facilities.get(facility_id)
+        if not facility_info:
+            plans.append(ClaimPricingError(404, f"Facility {facility_id} not found or inactive"))
+            offsets.append(len(base_prices))
+            continue
+
+        tier_level = facility_info['accreditation_tier']
+        rule_results: List[Dict[str, Any]] = []
+        lines = []
+        for idx, sbs_code, units in coded_items(items):
+            price = prices.get(sbs_code)
+            outcomes = rules.evaluate_item(sbs_code, units, price, tier_level, facility_id) if rules else ()
+            for outcome in outcomes:
+                rule_results.append(_rule_result(outcome, idx))
+                if outcome.action == "cap" and price is not None:
+                    price = min(price, outcome.value)
+            if any(outcome.action == "reject" for outcome in outcomes):
+                continue
+            lines.append(ClaimLine(idx, sbs_code, units, price))
+
+        # Non-overlapping bundles minimizing the payable amount; the rest is priced per item
+        allocation = allocate_bundles(
+            bundles,
+            lines,
+            max_exact_candidates=max_exact_candidates,
+            time_budget=time_budget
+        )
+        billed = allocation.assignments + [line for line in allocation.leftovers if line.price]
+        for entry in billed:
+            base_prices.append(entry.bundle.price if isinstance(entry, BundleAssignment) else entry.price)
+            line_markups.append(facility_info['markup_pct'])
+        plans.append((facility_id, items, facility_info, allocation, billed, lines, rule_results))
+        offsets.append(len(base_prices))
+
+    base_halalas = to_halalas_array(base_prices, rounding)
+    net_halalas = apply_markup_batch(base_halalas, line_markups, rounding)
+    totals = claim_totals(net_halalas, offsets).tolist()
+    base_halalas, net_halalas = base_halalas.tolist(), net_halalas.tolist()
+
+    results: List[Union[Dict[str, Any], ClaimPricingError]] = []
+    for claim_index, plan in enumerate(plans):
+        if isinstance(plan, ClaimPricingError):
+            results.append(plan)
+            continue
+        facility_id, items, facility_info, allocation, billed, lines, rule_results = plan
+        markup_pct = float(facility_info['markup_pct'])
+        validated_items = []
+        for position, entry in enumerate(billed, start=offsets[claim_index]):
+            base = base_halalas[position] / 100
+            net = {"value": net_halalas[position] / 100, "currency": "SAR"}
+            if isinstance(entry, BundleAssignment):
+                bundle = entry.bundle
+                sequences = sorted(line.sequence for line in entry.lines)
+                validated_items.append({
+                    "sequence": sequences[0],
+                    "productOrService": {
+                        "coding": [{
+                            "system": SBS_BUNDLES_SYSTEM,
+                            "code": bundle.bundle_code,
+                            "display": bundle.bundle_name
+                        }]
+                    },
+                    "net": net,
+                    "extensions": {
+                        "bundle_id": bundle.bundle_id,
+                        "original_items": len(sequences),
+                        "item_sequences": sequences,
+                        "base_price": base,
+                        "markup_applied": markup_pct
+                    }
+                })
+            else:
+                validated_items.append({
+                    "sequence": entry.sequence,
+                    "productOrService": items[entry.sequence - 1]['productOrService'],
+                    "unitPrice": {
+                        "value": base,
+                        "currency": "SAR"
+                    },
+                    "net": net,
+                    "extensions": {
+                        "base_price": base,
+                        "markup_applied": markup_pct,
+                        "facility_tier": facility_info['accreditation_tier']
+                    }
+                })
+        validated_items.sort(key=lambda item: item['sequence'])
+
+        total = payable = totals[claim_index]
+        outcomes = rules.evaluate_claim(
+            from_halalas(total), len(validated_items), (line.sbs_code for line in lines),
+            facility_info['accreditation_tier'], facility_id
+        ) if rules else ()
+        rejection = next((outcome for outcome in outcomes if outcome.action == "reject"), None)
+        if rejection:
+            results.append(ClaimPricingError(422, f"Claim rejected by rule {rejection.rule_code}: {rejection.message}"))
+            continue
+        for outcome in outcomes:
+            rule_results.append(_rule_result(outcome))
+            if outcome.action == "cap":
+                payable = min(payable, to_halalas(outcome.value))
+
+        results.append({
+            "resourceType": "Claim",
+            "status": "active",
+            "item": validated_items,
+            "total": {
+                "value": total / 100,
+                "currency": "SAR"
+            },
+            "extensions": {
+                "facility_id": facility_id,
+                "facility_tier": facility_info['accreditation_tier'],
+                "markup_percentage": markup_pct,
+                "bundle_applied": bool(allocation.assignments),
+                "bundles_applied": [assignment.bundle.bundle_code for assignment in allocation.assignments],
+                "bundle_allocation": allocation.method,
+                "rules_applied": rule_results,
+                "payable_amount": payable / 100,
+                "pricing_version": pricing_version
+            }
+        })
+    return results
+
+
+def price_claim(facility_id: int, items: List[Dict[str, Any]], facility_info: Optional[Dict[str, Any]],
+                prices: Dict[str, Decimal], bundles: BundleIndex, pricing_version: str,
+                max_exact_candidates: int, time_budget: float, rounding: str = ROUND_HALF_EVEN,
+                rules: Optional[RuleSet] = None) -> Dict[str, Any]:
+    """price_claims for one claim; raises ClaimPricingError if it cannot be priced"""
+    result = price_claims(
+        [(facility_id, items)], {facility_id: facility_info}, prices, bundles, pricing_version,
+        max_exact_candidates, time_budget, rounding, rules
+    )[0]
+    if isinstance(result, ClaimPricingError):
+        raise result
+    return result
@@ -5,18 +5,26 @@ Port: 8002
 """
 
 from fastapi import FastAPI, HTTPException, status, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any
-from decimal import Decimal
+import json
 import os
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from collections import deque
-from threading import Lock
-import time
+from sbs_common.db import DatabasePool
+from sbs_common.metrics import ServiceMetrics
+from sbs_common.middleware import RateLimiter, install_middleware
+from claim_pricing import (
+    ClaimPricingError,
+    coded_items,
+    iter_ndjson_claims,
+    parse_claim_array,
+    price_claims
+)
+from pricing_kernel import ROUND_HALF_EVEN, check_rounding
+from pricing_repository import fetch_batch_pricing
+from pricing_snapshot import PricingChangeListener, PricingSnapshotStore
 
 load_dotenv()
 
@@ -26,61 +34,37 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware - Restrict to allowed origins
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-Request-ID"],
+service_metrics = ServiceMetrics("rules_engine")
+
+# Shared middleware: CORS, request IDs + latency metrics, rate limiting (100 requests per minute per IP)
+install_middleware(app, service_metrics, rate_limiter=RateLimiter(max_requests=100, time_window=60))
+
+# Database connection pool
+db_pool = DatabasePool(
+    min_size=int(os.getenv("DB_POOL_MIN", "2")),
+    max_size=int(os.getenv("DB_POOL_MAX", "20")),
+    checkout_observer=service_metrics.pool_checkout_wait.labels(driver="psycopg2").observe
 )
+db_pool.open()
+get_db_connection = db_pool.connection
 
-# Rate limiter implementation
-class RateLimiter:
-    """Token bucket rate limiter"""
-    def __init__(self, max_requests: int = 100, time_window: int = 60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = {}
-        self.lock = Lock()
-
-    def is_allowed(self, identifier: str) -> bool:
-        with self.lock:
-            now = time.time()
-            if identifier not in self.requests:
-                self.requests[identifier] = deque()
-            while self.requests[identifier] and self.requests[identifier][0] < now - self.time_window:
-                self.requests[identifier].popleft()
-            if len(self.requests[identifier]) < self.max_requests:
-                self.requests[identifier].append(now)
-                return True
-            return False
-
-rate_limiter = RateLimiter(max_requests=100, time_window=60)
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting middleware"""
-    if request.url.path in ["/health", "/"]:
-        return await call_next(request)
-    client_ip = request.client.host if request.client else "unknown"
-    if not rate_limiter.is_allowed(client_ip):
-        return JSONResponse(
-            status_code=429,
-            content={"error": "Rate limit exceeded", "retry_after_seconds": 60}
-        )
-    return await call_next(request)
 
+# In-memory prices, tier markups, facility tiers and bundles, reloaded on NOTIFY or POST /admin/pricing/reload
+PRICING_SNAPSHOT_ENABLED = os.getenv("PRICING_SNAPSHOT_ENABLED", "true").lower() == "true"
+PRICING_SNAPSHOT_REFRESH_SECONDS = float(os.getenv("PRICING_SNAPSHOT_REFRESH_SECONDS", "3600"))
+pricing_store: Optional[PricingSnapshotStore] = None
+pricing_listener: Optional[PricingChangeListener] = None
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        database=os.getenv("DB_NAME", "sbs_integration"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT", "5432")
-    )
+# Bundle allocation: exact search up to this many candidate bundles, within the time budget
+BUNDLE_EXACT_MAX_CANDIDATES = int(os.getenv("BUNDLE_EXACT_MAX_CANDIDATES", "16"))
+BUNDLE_ALLOCATION_BUDGET_MS = float(os.getenv("BUNDLE_ALLOCATION_BUDGET_MS", "20"))
+
+# Most claims accepted by one POST /validate/batch
+VALIDATE_MAX_BATCH_CLAIMS = int(os.getenv("VALIDATE_MAX_BATCH_CLAIMS", "10000"))
+VALIDATE_BATCH_CHUNK = 500
+
+# Rounding of marked-up prices to whole halalas: half_even (banker's) or half_up
+PRICING_ROUNDING = check_rounding(os.getenv("PRICING_ROUNDING", ROUND_HALF_EVEN))
 
 
 class FHIRClaim(BaseModel):
@@ -102,114 +86,39 @@ class ValidatedClaim(BaseModel):
     extensions: Optional[Dict[str, Any]] = None
 
 
-def get_facility_tier(facility_id: int) -> Optional[Dict]:
-    """Get facility accreditation tier and pricing rules"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        query = """
-        SELECT 
-            f.facility_id,
-            f.accreditation_tier,
-            ptr.markup_pct,
-            ptr.tier_description
-        FROM facilities f
-        JOIN pricing_tier_rules ptr ON f.accreditation_tier = ptr.tier_level
-        WHERE f.facility_id = %s AND f.is_active = TRUE
-        """
-        
-        cursor.execute(query, (facility_id,))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        return dict(result) if result else None
-        
-    except Exception as e:
-        print(f"Error fetching facility tier: {e}")
-        return None
-
-
-def get_sbs_standard_price(sbs_code: str) -> Optional[Decimal]:
-    """Get the standard price for an SBS code"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute(
-            "SELECT standard_price FROM sbs_master_catalogue WHERE sbs_id = %s AND is_active = TRUE",
-            (sbs_code,)
-        )
-        
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        return Decimal(result['standard_price']) if result and result['standard_price'] else None
-        
-    except Exception as e:
-        print(f"Error fetching SBS price: {e}")
-        return None
-
-
-def check_for_bundles(item_codes: List[str]) -> Optional[Dict]:
+def lookup_claim_pricing(facility_ids: List[int], sbs_codes: List[str]):
     """
-    Check if the claim items qualify for a service bundle
-    Returns bundle information if applicable
+    Pricing inputs for a set of claims and the version of the price table
+    they came from: the in-memory snapshot when loaded, otherwise the live
+    tables in a single query (version "database"). That query is the only
+    database access of a /validate call, so it borrows the call's one pooled
+    connection here; a snapshot hit never takes a pool slot.
     """
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Find bundles that contain all the provided codes
-        query = """
-        SELECT 
-            sb.bundle_id,
-            sb.bundle_code,
-            sb.bundle_name,
-            sb.total_allowed_price,
-            COUNT(bi.sbs_code) as matched_items
-        FROM service_bundles sb
-        JOIN bundle_items bi ON sb.bundle_id = bi.bundle_id
-        WHERE bi.sbs_code = ANY(%s)
-          AND sb.is_active = TRUE
-        GROUP BY sb.bundle_id, sb.bundle_code, sb.bundle_name, sb.total_allowed_price
-        HAVING COUNT(bi.sbs_code) >= 2
-        ORDER BY matched_items DESC
-        LIMIT 1
-        """
-        
-        cursor.execute(query, (item_codes,))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        return dict(result) if result else None
-        
-    except Exception as e:
-        print(f"Error checking bundles: {e}")
-        return None
-
-
-def apply_pricing_markup(base_price: Decimal, markup_pct: float) -> Decimal:
-    """Apply facility tier markup to base price"""
-    markup_multiplier = Decimal(1 + (markup_pct / 100))
-    return (base_price * markup_multiplier).quantize(Decimal('0.01'))
-
-
-def calculate_claim_total(items: List[Dict]) -> Decimal:
-    """Calculate total claim amount from all items"""
-    total = Decimal('0.00')
-    
-    for item in items:
-        if 'net' in item and 'value' in item['net']:
-            total += Decimal(str(item['net']['value']))
-    
-    return total
+    snapshot = pricing_store.current if pricing_store else None
+    if snapshot is None:
+        with get_db_connection() as conn:
+            return fetch_batch_pricing(conn, facility_ids, sbs_codes), "database"
+    return {
+        "facilities": {facility_id: snapshot.facility_tier(facility_id) for facility_id in set(facility_ids)},
+        "prices": {code: snapshot.prices[code] for code in set(sbs_codes) if code in snapshot.prices},
+        "bundles": snapshot.bundles,
+        "rules": snapshot.rules,
+    }, snapshot.version
+
+
+def price_validated_claims(claims: List[FHIRClaim], pricing: Dict[str, Any], pricing_version: str) -> List[Any]:
+    """Price claims against pricing resolved by lookup_claim_pricing (ClaimPricingError per failed claim)"""
+    return price_claims(
+        [(claim.facility_id, claim.item) for claim in claims],
+        pricing['facilities'],
+        pricing['prices'],
+        pricing['bundles'],
+        pricing_version,
+        max_exact_candidates=BUNDLE_EXACT_MAX_CANDIDATES,
+        time_budget=BUNDLE_ALLOCATION_BUDGET_MS / 1000,
+        rounding=PRICING_ROUNDING,
+        rules=pricing['rules']
+    )
 
 
 @app.get("/")
@@ -225,9 +134,16 @@ def root():
 def health_check():
     """Health check endpoint"""
     try:
-        conn = get_db_connection()
-        conn.close()
-        return {"status": "healthy", "database": "connected"}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "pool": db_pool.stats(),
+            "pricing_version": pricing_store.current.version if pricing_store and pricing_store.current else None
+        }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -235,6 +151,56 @@ def health_check():
         )
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition"""
+    body, content_type = service_metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/admin/pricing")
+def get_pricing_status():
+    """Version, size and age of the in-memory pricing snapshot"""
+    if not pricing_store:
+        return {"enabled": False}
+    return pricing_store.status()
+
+
+@app.post("/admin/pricing/reload")
+def reload_pricing():
+    """Reload the pricing snapshot now and swap it in"""
+    if not pricing_store:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Pricing snapshot is disabled (PRICING_SNAPSHOT_ENABLED=false)"
+        )
+    try:
+        pricing_store.reload()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Pricing snapshot reload failed: {str(e)}"
+        )
+    return pricing_store.status()
+
+
+@app.get("/admin/rules")
+def get_rule_stats():
+    """Compiled CHI rules of the current pricing snapshot with per-rule counters and timings"""
+    snapshot = pricing_store.current if pricing_store else None
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Pricing snapshot is not loaded; rules are compiled per request"
+        )
+    return {
+        "version": snapshot.rules.version,
+        "pricing_version": snapshot.version,
+        "errors": snapshot.rules.errors,
+        "rules": snapshot.rules.stats()
+    }
+
+
 @app.post("/validate")
 async def validate_claim(request: Request):
     """
@@ -245,10 +211,11 @@ async def validate_claim(request: Request):
     - Wrapped claim: {"claim": {"resourceType": "Claim", ...}}
     
     Rules Applied:
-    1. Calculate service bundles
-    2. Apply facility tier markup
-    3. Validate coverage limits
+    1. Item CHI rules (chi_claim_rules)
+    2. Calculate service bundles (non-overlapping; remaining items priced individually)
+    3. Apply facility tier markup
     4. Calculate net prices
+    5. Claim CHI rules and tier coverage limits
     """
     
     # Get the raw body
@@ -269,115 +236,162 @@ async def validate_claim(request: Request):
             detail=f"Invalid claim data: {str(e)}"
         )
     
-    # Get facility pricing tier
-    facility_info = get_facility_tier(claim.facility_id)
-    if not facility_info:
+    # Facility tier, standard prices and bundles from the snapshot (or the database in one round trip).
+    # Off the event loop: without a snapshot this waits for a pool slot and the query
+    sbs_codes = [sbs_code for _, sbs_code, _ in coded_items(claim.item)]
+    try:
+        pricing, pricing_version = await run_in_threadpool(lookup_claim_pricing, [claim.facility_id], sbs_codes)
+    except Exception as e:
+        print(f"Error fetching claim pricing: {e}")
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Facility {claim.facility_id} not found or inactive"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Pricing lookup failed: {str(e)}"
         )
     
-    markup_pct = float(facility_info['markup_pct'])
-    
-    # Extract SBS codes from claim items
-    sbs_codes = []
-    for item in claim.item:
-        if 'productOrService' in item and 'coding' in item['productOrService']:
-            for coding in item['productOrService']['coding']:
-                if coding.get('system') == 'http://sbs.sa/coding/services':
-                    sbs_codes.append(coding['code'])
+    # Bundle allocation can search for up to BUNDLE_ALLOCATION_BUDGET_MS
+    result = (await run_in_threadpool(price_validated_claims, [claim], pricing, pricing_version))[0]
+    if isinstance(result, ClaimPricingError):
+        raise HTTPException(status_code=result.status_code, detail=result.message)
+    return ValidatedClaim(**result)
+
+
+@app.post("/validate/batch")
+async def validate_claim_batch(request: Request):
+    """
+    Apply financial rules to many FHIR claims in one request
     
-    # Check for applicable bundles
-    bundle_info = check_for_bundles(sbs_codes)
+    Accepts a JSON array of claims, or NDJSON (one claim per line,
+    Content-Type: application/x-ndjson); claims may be wrapped as in /validate.
+    NDJSON is parsed line by line as it arrives, so the raw body is never
+    held whole; a JSON array is read whole first.
     
-    # Process each item
-    validated_items = []
-    bundle_applied = False
+    Facility tiers, standard prices and bundles for the whole batch are
+    resolved once, then each claim is priced in memory. The response is
+    NDJSON, one line per claim in input order:
+    - {"index": 0, "status": "ok", "claim": {...}}
+    - {"index": 1, "status": "error", "error": {"status_code": 404, "message": "..."}}
+    A claim that fails does not abort the rest of the batch.
+    """
+    # The first bytes tell a JSON array from NDJSON
+    body = request.stream()
+    head = b""
+    async for data in body:
+        head += data
+        if head.strip():
+            break
     
-    if bundle_info and not bundle_applied:
-        # Apply bundle pricing
-        bundle_price = Decimal(str(bundle_info['total_allowed_price']))
-        final_price = apply_pricing_markup(bundle_price, markup_pct)
-        
-        # Create a single bundled item
-        bundled_item = {
-            "sequence": 1,
-            "productOrService": {
-                "coding": [{
-                    "system": "http://sbs.sa/coding/bundles",
-                    "code": bundle_info['bundle_code'],
-                    "display": bundle_info['bundle_name']
-                }]
-            },
-            "net": {
-                "value": float(final_price),
-                "currency": "SAR"
-            },
-            "extensions": {
-                "bundle_id": bundle_info['bundle_id'],
-                "original_items": len(sbs_codes),
-                "base_price": float(bundle_price),
-                "markup_applied": markup_pct
-            }
-        }
-        validated_items.append(bundled_item)
-        bundle_applied = True
-        
+    if "ndjson" not in request.headers.get("content-type", "") and head.lstrip().startswith(b"["):
+        async for data in body:
+            head += data
+        try:
+            entries = parse_claim_array(head)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid claim batch: {str(e)}"
+            )
+        if len(entries) > VALIDATE_MAX_BATCH_CLAIMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch has {len(entries)} claims; the limit is {VALIDATE_MAX_BATCH_CLAIMS}"
+            )
     else:
-        # Apply individual pricing
-        for idx, item in enumerate(claim.item, start=1):
-            if 'productOrService' in item and 'coding' in item['productOrService']:
-                sbs_code = None
-                for coding in item['productOrService']['coding']:
-                    if coding.get('system') == 'http://sbs.sa/coding/services':
-                        sbs_code = coding['code']
-                        break
-                
-                if sbs_code:
-                    base_price = get_sbs_standard_price(sbs_code)
-                    if base_price:
-                        final_price = apply_pricing_markup(base_price, markup_pct)
-                        
-                        validated_item = {
-                            "sequence": idx,
-                            "productOrService": item['productOrService'],
-                            "unitPrice": {
-                                "value": float(base_price),
-                                "currency": "SAR"
-                            },
-                            "net": {
-                                "value": float(final_price),
-                                "currency": "SAR"
-                            },
-                            "extensions": {
-                                "base_price": float(base_price),
-                                "markup_applied": markup_pct,
-                                "facility_tier": facility_info['accreditation_tier']
-                            }
-                        }
-                        validated_items.append(validated_item)
+        async def ndjson_body():
+            yield head
+            async for data in body:
+                yield data
+        
+        # The whole body is read before the response starts; reading stops at the first claim past the limit
+        entries = []
+        async for entry in iter_ndjson_claims(ndjson_body()):
+            if len(entries) == VALIDATE_MAX_BATCH_CLAIMS:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Batch exceeds the limit of {VALIDATE_MAX_BATCH_CLAIMS} claims"
+                )
+            entries.append(entry)
     
-    # Calculate total
-    total_amount = calculate_claim_total(validated_items)
+    claims: List[Any] = []
+    for entry in entries:
+        if isinstance(entry, ClaimPricingError):
+            claims.append(entry)
+            continue
+        try:
+            claims.append(FHIRClaim(**entry))
+        except Exception as e:
+            claims.append(ClaimPricingError(status.HTTP_422_UNPROCESSABLE_ENTITY, f"Invalid claim data: {str(e)}"))
     
-    # Build response
-    return ValidatedClaim(
-        resourceType="Claim",
-        status="active",
-        item=validated_items,
-        total={
-            "value": float(total_amount),
-            "currency": "SAR"
-        },
-        extensions={
-            "facility_id": claim.facility_id,
-            "facility_tier": facility_info['accreditation_tier'],
-            "markup_percentage": markup_pct,
-            "bundle_applied": bundle_applied
-        }
+    # Distinct facilities and codes across the batch, resolved in one lookup
+    valid_claims = [claim for claim in claims if isinstance(claim, FHIRClaim)]
+    facility_ids = [claim.facility_id for claim in valid_claims]
+    sbs_codes = [sbs_code for claim in valid_claims for _, sbs_code, _ in coded_items(claim.item)]
+    try:
+        pricing, pricing_version = await run_in_threadpool(lookup_claim_pricing, facility_ids, sbs_codes)
+    except Exception as e:
+        print(f"Error fetching batch pricing: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Pricing lookup failed: {str(e)}"
+        )
+    
+    def price_chunk(chunk: List[Any]) -> List[Any]:
+        valid = [claim for claim in chunk if isinstance(claim, FHIRClaim)]
+        try:
+            priced = iter(price_validated_claims(valid, pricing, pricing_version))
+        except Exception as e:
+            if len(valid) > 1:
+                # Isolate the failing claim
+                return [result for claim in chunk for result in price_chunk([claim])]
+            print(f"Error pricing batch claim: {e}")
+            priced = iter([ClaimPricingError(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))])
+        return [claim if isinstance(claim, ClaimPricingError) else next(priced) for claim in chunk]
+    
+    def results():
+        # Claims are priced VALIDATE_BATCH_CHUNK at a time, one pricing kernel call per chunk
+        for start in range(0, len(claims), VALIDATE_BATCH_CHUNK):
+            for index, result in enumerate(price_chunk(claims[start:start + VALIDATE_BATCH_CHUNK]), start=start):
+                if isinstance(result, ClaimPricingError):
+                    line = {"index": index, "status": "error",
+                            "error": {"status_code": result.status_code, "message": result.message}}
+                else:
+                    line = {"index": index, "status": "ok", "claim": result}
+                yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        headers={"X-Pricing-Version": pricing_version}
     )
 
 
+@app.on_event("startup")
+def startup_event():
+    """Load the pricing snapshot and start its loader and NOTIFY listener"""
+    global pricing_store, pricing_listener
+    if not PRICING_SNAPSHOT_ENABLED:
+        return
+    pricing_store = PricingSnapshotStore(get_db_connection, refresh_interval=PRICING_SNAPSHOT_REFRESH_SECONDS)
+    try:
+        pricing_store.reload()
+    except Exception as e:
+        # Claims are priced from the live tables until the loader succeeds
+        print(f"✗ Pricing snapshot not loaded yet: {e}")
+    pricing_store.start()
+    pricing_listener = PricingChangeListener(connect=db_pool.connect, store=pricing_store)
+    pricing_listener.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Cleanup on shutdown"""
+    if pricing_listener:
+        pricing_listener.stop()
+    if pricing_store:
+        pricing_store.stop()
+    db_pool.close()
+    service_metrics.mark_process_dead()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -0,0 +1,144 @@
+"""
+Pricing Kernel
+Exact markup, rounding and totals in integer halalas (1/100 SAR).
+
+A tier markup is turned into an exact fraction once, from its shortest
+decimal form (Decimal(str(markup_pct)), so a 10% markup is exactly 11/10
+and not 1.1000000000000000888 as via float), and a price in halalas is
+marked up as round(price * numerator / denominator) with integer division.
+Ties are rounded half-even (banker's, the Decimal.quantize default) or
+half-up (away from zero), giving the same result as quantizing the exact
+Decimal product to 0.01 with that rounding.
+
+Batches are NumPy int64 arrays, grouped by markup; a group whose products
+would overflow int64 is computed with Python integers instead.
+"""
+
+from decimal import ROUND_HALF_EVEN as DECIMAL_HALF_EVEN, ROUND_HALF_UP as DECIMAL_HALF_UP, Decimal
+from fractions import Fraction
+from functools import lru_cache
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+ROUND_HALF_EVEN = "half_even"
+ROUND_HALF_UP = "half_up"
+ROUNDING_MODES = {ROUND_HALF_EVEN: DECIMAL_HALF_EVEN, ROUND_HALF_UP: DECIMAL_HALF_UP}
+
+INT64_MAX = np.iinfo(np.int64).max
+
+Number = Union[Decimal, float, int, str]
+
+
+def check_rounding(rounding: str) -> str:
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Unknown rounding mode {rounding!r}; expected one of {sorted(ROUNDING_MODES)}")
+    return rounding
+
+
+def to_halalas(amount: Number, rounding: str = ROUND_HALF_EVEN) -> int:
+    """Amount in SAR (exact for up to 2 decimals, otherwise rounded) as integer halalas"""
+    value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    scaled = value * 100
+    halalas = int(scaled)
+    if halalas == scaled:
+        return halalas
+    return int(scaled.to_integral_value(rounding=ROUNDING_MODES[check_rounding(rounding)]))
+
+
+def to_halalas_array(amounts: Sequence[Number], rounding: str = ROUND_HALF_EVEN) -> np.ndarray:
+    """Many amounts as an int64 array of halalas; repeated amounts (catalogue prices) are converted once"""
+    memo = {}
+    for amount in amounts:
+        if amount not in memo:
+            memo[amount] = to_halalas(amount, rounding)
+    return np.fromiter((memo[amount] for amount in amounts), dtype=np.int64, count=len(amounts))
+
+
+def from_halalas(halalas: int) -> Decimal:
+    """Integer halalas as a 2-decimal SAR amount"""
+    return Decimal(int(halalas)).scaleb(-2).quantize(Decimal('0.01'))
+
+
+@lru_cache(maxsize=256)
+def markup_ratio(markup_pct: Number) -> Tuple[int, int]:
+    """Exact multiplier 1 + markup_pct/100 as a reduced (numerator, denominator)"""
+    value = markup_pct if isinstance(markup_pct, Decimal) else Decimal(str(markup_pct))
+    ratio = 1 + Fraction(value) / 100
+    return ratio.numerator, ratio.denominator
+
+
+def _round_quotient(quotient: int, remainder: int, denominator: int, negative: bool, rounding: str) -> int:
+    twice = 2 * remainder
+    if twice > denominator:
+        return quotient + 1
+    if twice == denominator:
+        if rounding == ROUND_HALF_EVEN:
+            return quotient + (quotient & 1)
+        # Half-up rounds away from zero; with floor division a negative tie is already there
+        return quotient if negative else quotient + 1
+    return quotient
+
+
+def apply_markup(halalas: int, markup_pct: Number, rounding: str = ROUND_HALF_EVEN) -> int:
+    """Marked-up price of one amount in halalas"""
+    numerator, denominator = markup_ratio(markup_pct)
+    product = int(halalas) * numerator
+    quotient, remainder = divmod(product, denominator)
+    return _round_quotient(quotient, remainder, denominator, product < 0, check_rounding(rounding))
+
+
+def _round_divide(products: np.ndarray, denominator: int, rounding: str) -> np.ndarray:
+    """Vectorized round(products / denominator); floor divmod keeps remainders >= 0"""
+    quotients, remainders = np.divmod(products, denominator)
+    twice = 2 * remainders
+    up = twice > denominator
+    ties = twice == denominator
+    if rounding == ROUND_HALF_EVEN:
+        up |= ties & ((quotients & 1) == 1)
+    else:
+        up |= ties & (products >= 0)
+    return quotients + up
+
+
+def apply_markup_batch(halalas: Sequence[int], markup_pct: Union[Number, Sequence[Number]],
+                       rounding: str = ROUND_HALF_EVEN) -> np.ndarray:
+    """
+    Marked-up prices of many amounts in halalas, as an int64 array.
+
+    markup_pct is one markup for every amount or one per amount; amounts
+    sharing a markup are computed together.
+    """
+    check_rounding(rounding)
+    prices = np.asarray(halalas, dtype=np.int64)
+    result = np.empty_like(prices)
+    if prices.size == 0:
+        return result
+
+    if np.ndim(markup_pct) == 0:
+        groups = [(markup_pct, slice(None))]
+    else:
+        markups = np.asarray(markup_pct, dtype=object if isinstance(markup_pct[0], Decimal) else None)
+        if markups.shape != prices.shape:
+            raise ValueError(f"Expected {prices.size} markups, got {markups.size}")
+        distinct, inverse = np.unique(markups, return_inverse=True)
+        groups = [(markup, inverse == i) for i, markup in enumerate(distinct)]
+
+    largest = int(np.abs(prices).max())
+    for markup, selection in groups:
+        numerator, denominator = markup_ratio(markup.item() if isinstance(markup, np.generic) else markup)
+        if largest * numerator > INT64_MAX:
+            result[selection] = [apply_markup(int(price), markup, rounding) for price in prices[selection]]
+        else:
+            result[selection] = _round_divide(prices[selection] * numerator, denominator, rounding)
+    return result
+
+
+def claim_totals(halalas: np.ndarray, offsets: Sequence[int]) -> np.ndarray:
+    """
+    Per-claim sums of a flat array of line amounts, where claim i owns
+    halalas[offsets[i]:offsets[i + 1]] (len(offsets) == claims + 1).
+    """
+    running = np.concatenate(([0], np.cumsum(halalas, dtype=np.int64)))
+    bounds = np.asarray(offsets, dtype=np.intp)
+    return running[bounds[1:]] - running[bounds[:-1]]
@@ -0,0 +1,98 @@
+"""
+Claim Pricing Lookups
+Reference data a claim needs before it can be priced: the facility's tier
+and markup, the standard price of every SBS code on the claim, the
+definitions of the bundles those codes could form, and the CHI claim rules
+(with the coverage limits and code categories they use). Used when the
+in-memory pricing snapshot is not loaded; the rules are then compiled per
+call.
+
+fetch_batch_pricing gets all of it in a single round trip, so a claim (or a
+whole batch of claims) costs one query regardless of how many items it
+carries. Prices travel as text through the JSON aggregates so they come
+back as exact Decimals.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+from bundle_index import BundleIndex
+from chi_rules import COVERAGE_LIMITS_QUERY, RULES_QUERY, RuleSet
+
+FACILITY_QUERY = """
+SELECT
+    f.facility_id,
+    f.accreditation_tier,
+    ptr.markup_pct,
+    ptr.tier_description
+FROM facilities f
+JOIN pricing_tier_rules ptr ON f.accreditation_tier = ptr.tier_level
+WHERE f.facility_id = ANY(%(facility_ids)s::int[]) AND f.is_active = TRUE
+"""
+
+PRICES_QUERY = """
+SELECT sbs_id, standard_price::text
+FROM sbs_master_catalogue
+WHERE sbs_id = ANY(%(codes)s::text[])
+  AND is_active = TRUE
+  AND standard_price IS NOT NULL
+"""
+
+# Every item of each active bundle that uses at least one of the claim's codes
+BUNDLE_ITEMS_QUERY = """
+SELECT
+    sb.bundle_id,
+    sb.bundle_code,
+    sb.bundle_name,
+    sb.total_allowed_price::text AS total_allowed_price,
+    bi.sbs_code,
+    bi.quantity,
+    bi.is_mandatory
+FROM service_bundles sb
+JOIN bundle_items bi ON sb.bundle_id = bi.bundle_id
+WHERE sb.is_active = TRUE
+  AND sb.bundle_id IN (SELECT bundle_id FROM bundle_items WHERE sbs_code = ANY(%(codes)s::text[]))
+"""
+
+CLAIM_PRICING_QUERY = f"""
+SELECT
+    (SELECT json_object_agg(f.facility_id, row_to_json(f)) FROM ({FACILITY_QUERY}) f) AS facilities,
+    (SELECT json_object_agg(p.sbs_id, p.standard_price) FROM ({PRICES_QUERY}) p) AS prices,
+    (SELECT json_agg(row_to_json(b)) FROM ({BUNDLE_ITEMS_QUERY}) b) AS bundle_items,
+    (SELECT json_agg(row_to_json(r)) FROM ({RULES_QUERY}) r) AS rules,
+    (SELECT json_agg(row_to_json(c)) FROM ({COVERAGE_LIMITS_QUERY}) c) AS coverage_limits,
+    (SELECT json_object_agg(sbs_id, category) FROM sbs_master_catalogue
+     WHERE sbs_id = ANY(%(codes)s::text[])) AS categories
+"""
+
+
+def _distinct(codes: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(codes))
+
+
+def fetch_batch_pricing(conn, facility_ids: Iterable[int], codes: Iterable[str]) -> Dict[str, Any]:
+    """
+    Facility tiers, standard prices and candidate bundles for any number of
+    claims in one query.
+
+    Returns {"facilities": {facility_id: dict}, "prices": {sbs_code: Decimal},
+    "bundles": BundleIndex, "rules": RuleSet}; inactive or unknown
+    facilities are absent.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CLAIM_PRICING_QUERY, {
+            "facility_ids": sorted(set(facility_ids)),
+            "codes": _distinct(codes)
+        })
+        facilities, prices, bundle_items, rules, coverage_limits, categories = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    return {
+        # JSON object keys arrive as strings
+        "facilities": {int(facility_id): row for facility_id, row in (facilities or {}).items()},
+        "prices": {code: Decimal(price) for code, price in (prices or {}).items()},
+        "bundles": BundleIndex.from_rows(bundle_items or ()),
+        "rules": RuleSet.from_rows(rules or (), coverage_limits or (), categories or {}),
+    }
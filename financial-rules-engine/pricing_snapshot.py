@@ -0,0 +1,263 @@
+"""
+Pricing Snapshot
+In-memory copy of the reference data every claim is priced from:
+sbs_master_catalogue.standard_price, pricing_tier_rules,
+facilities.accreditation_tier, the active service bundles (as a
+BundleIndex) and the CHI claim rules (compiled into a RuleSet, with the
+tier coverage limits and catalogue categories they depend on).
+
+Snapshots are immutable and carry a content version (a hash of the rows),
+so identical tables give the same version on every worker and after every
+restart. Reloads build a new snapshot and swap it in atomically; readers
+take store.current once per claim and never see a half-applied reload. The
+previous snapshot keeps serving until its replacement is ready.
+
+Reloads are triggered by POST /admin/pricing/reload, by a NOTIFY on
+PRICING_CHANNEL (sent by notify_pricing_change() in database/schema.sql)
+and by a periodic safety-net refresh.
+"""
+
+from decimal import Decimal
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import sys
+import threading
+import time
+
+from sbs_common.notify import NotificationListener
+
+from bundle_index import BundleIndex
+from chi_rules import COVERAGE_LIMITS_QUERY, RULES_QUERY, RuleSet
+
+PRICING_CHANNEL = "sbs_pricing_changed"
+
+PRICES_QUERY = """
+SELECT sbs_id, standard_price
+FROM sbs_master_catalogue
+WHERE is_active = TRUE AND standard_price IS NOT NULL
+ORDER BY sbs_id
+"""
+
+TIERS_QUERY = """
+SELECT tier_level, markup_pct, tier_description
+FROM pricing_tier_rules
+ORDER BY tier_level
+"""
+
+FACILITIES_QUERY = """
+SELECT facility_id, accreditation_tier
+FROM facilities
+WHERE is_active = TRUE AND accreditation_tier IS NOT NULL
+ORDER BY facility_id
+"""
+
+BUNDLES_QUERY = """
+SELECT
+    sb.bundle_id,
+    sb.bundle_code,
+    sb.bundle_name,
+    sb.total_allowed_price,
+    bi.sbs_code,
+    bi.quantity,
+    bi.is_mandatory
+FROM service_bundles sb
+JOIN bundle_items bi ON sb.bundle_id = bi.bundle_id
+WHERE sb.is_active = TRUE
+ORDER BY sb.bundle_id, bi.sbs_code
+"""
+
+CATEGORIES_QUERY = """
+SELECT sbs_id, category
+FROM sbs_master_catalogue
+WHERE is_active = TRUE
+ORDER BY sbs_id
+"""
+
+
+class PricingSnapshot:
+    """Immutable standard prices, tier markups, facility tiers, bundles and claim rules"""
+
+    __slots__ = ("prices", "tiers", "facilities", "bundles", "rules", "version", "loaded_at")
+
+    def __init__(self, prices: Dict[str, Decimal], tiers: Dict[int, tuple],
+                 facilities: Dict[int, int], bundles: Optional[BundleIndex] = None,
+                 rules: Optional[RuleSet] = None):
+        self.prices = prices
+        # tier_level -> (markup_pct, tier_description)
+        self.tiers = tiers
+        # facility_id -> accreditation_tier
+        self.facilities = facilities
+        self.bundles = bundles if bundles is not None else BundleIndex(())
+        self.rules = rules if rules is not None else RuleSet()
+        self.version = content_version(prices, tiers, facilities, self.bundles, self.rules)
+        self.loaded_at = time.time()
+
+    def facility_tier(self, facility_id: int) -> Optional[Dict[str, Any]]:
+        """Same shape as the facility rows of pricing_repository.fetch_batch_pricing"""
+        tier_level = self.facilities.get(facility_id)
+        tier = self.tiers.get(tier_level)
+        if tier is None:
+            return None
+        return {
+            "facility_id": facility_id,
+            "accreditation_tier": tier_level,
+            "markup_pct": tier[0],
+            "tier_description": tier[1],
+        }
+
+    def price(self, sbs_code: str) -> Optional[Decimal]:
+        return self.prices.get(sbs_code)
+
+
+def content_version(prices: Dict[str, Decimal], tiers: Dict[int, tuple],
+                    facilities: Dict[int, int], bundles: BundleIndex, rules: Optional[RuleSet] = None) -> str:
+    """Short hash of the snapshot contents"""
+    digest = hashlib.sha256()
+    for code in sorted(prices):
+        digest.update(f"p|{code}|{prices[code]}\n".encode())
+    for level in sorted(tiers):
+        digest.update(f"t|{level}|{tiers[level][0]!r}\n".encode())
+    for facility_id in sorted(facilities):
+        digest.update(f"f|{facility_id}|{facilities[facility_id]}\n".encode())
+    for bundle in bundles.bundles:
+        items = ",".join(f"{i.sbs_code}:{i.quantity}:{int(i.is_mandatory)}" for i in bundle.items)
+        digest.update(f"b|{bundle.bundle_id}|{bundle.bundle_code}|{bundle.price}|{items}\n".encode())
+    if rules is not None and len(rules):
+        digest.update(f"r|{rules.version}\n".encode())
+        for code in sorted(rules.categories):
+            digest.update(f"c|{code}|{rules.categories[code]}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_snapshot(conn) -> PricingSnapshot:
+    """Read the reference tables in one consistent (repeatable read) transaction and compile the rules"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute(PRICES_QUERY)
+        prices = {sys.intern(code): Decimal(price) for code, price in cursor.fetchall()}
+        cursor.execute(TIERS_QUERY)
+        tiers = {level: (float(markup), description) for level, markup, description in cursor.fetchall()}
+        cursor.execute(FACILITIES_QUERY)
+        facilities = dict(cursor.fetchall())
+        cursor.execute(BUNDLES_QUERY)
+        bundles = BundleIndex.from_rows(_dict_rows(cursor))
+        cursor.execute(RULES_QUERY)
+        rule_rows = list(_dict_rows(cursor))
+        cursor.execute(COVERAGE_LIMITS_QUERY)
+        coverage_rows = list(_dict_rows(cursor))
+        cursor.execute(CATEGORIES_QUERY)
+        categories = {sys.intern(code): sys.intern(category) for code, category in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.rollback()
+    rules = RuleSet.from_rows(rule_rows, coverage_rows, categories)
+    return PricingSnapshot(prices, tiers, facilities, bundles, rules)
+
+
+def _dict_rows(cursor):
+    columns = [desc[0] for desc in cursor.description]
+    return (dict(zip(columns, row)) for row in cursor.fetchall())
+
+
+class PricingSnapshotStore(threading.Thread):
+    """
+    Holds the current PricingSnapshot and reloads it in a background thread.
+
+    - request_reload() (NOTIFY listener) queues a reload and returns at once
+    - reload() loads synchronously and swaps the result in (admin endpoint)
+    - a full reload runs every refresh_interval seconds as a safety net
+    """
+
+    def __init__(self, connection_factory: Callable, refresh_interval: float = 3600.0):
+        super().__init__(name="pricing-snapshot-loader", daemon=True)
+        self.connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self.current: Optional[PricingSnapshot] = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self.last_load_seconds: Optional[float] = None
+        self._reload_lock = Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+    def request_reload(self) -> None:
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            if self.current is not None:
+                self._wakeup.wait(self.refresh_interval)
+                self._wakeup.clear()
+                if self._stop_event.is_set():
+                    break
+            try:
+                self.reload()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Pricing snapshot reload error: {e}")
+                self._stop_event.wait(5.0)
+
+    def reload(self) -> PricingSnapshot:
+        """Load a fresh snapshot and swap it in; concurrent reloads are serialized"""
+        with self._reload_lock:
+            started = time.time()
+            with self.connection_factory() as conn:
+                snapshot = load_snapshot(conn)
+            previous = self.current
+            self.current = snapshot
+            self.reloads += 1
+            self.last_error = None
+            self.last_load_seconds = round(time.time() - started, 3)
+        if previous is None or previous.version != snapshot.version:
+            print(f"✓ Pricing snapshot {snapshot.version} loaded: {len(snapshot.prices)} prices, "
+                  f"{len(snapshot.tiers)} tiers, {len(snapshot.facilities)} facilities, "
+                  f"{len(snapshot.bundles)} bundles, {len(snapshot.rules)} rules")
+        return snapshot
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self.current
+        return {
+            "enabled": True,
+            "loaded": snapshot is not None,
+            "version": snapshot.version if snapshot else None,
+            "prices": len(snapshot.prices) if snapshot else 0,
+            "tiers": len(snapshot.tiers) if snapshot else 0,
+            "facilities": len(snapshot.facilities) if snapshot else 0,
+            "bundles": len(snapshot.bundles) if snapshot else 0,
+            "rules": len(snapshot.rules) if snapshot else 0,
+            "rule_errors": snapshot.rules.errors if snapshot else [],
+            "snapshot_age_seconds": round(time.time() - snapshot.loaded_at, 1) if snapshot else None,
+            "last_load_seconds": self.last_load_seconds,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+class PricingChangeListener(NotificationListener):
+    """
+    Queues a snapshot reload on every NOTIFY on PRICING_CHANNEL, and on every
+    (re)connect since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, connect, store: PricingSnapshotStore, channel: str = PRICING_CHANNEL,
+                 poll_interval: float = 5.0, retry_interval: float = 5.0):
+        super().__init__(
+            connect,
+            channel,
+            name="pricing-change-listener",
+            poll_interval=poll_interval,
+            retry_interval=retry_interval
+        )
+        self.store = store
+
+    def on_connect(self) -> None:
+        self.store.request_reload()
+
+    def handle_payload(self, payload: str) -> None:
+        self.store.request_reload()
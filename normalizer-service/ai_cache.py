@@ -0,0 +1,191 @@
+"""
+AI Normalization Cache
+Two-level cache for fallback suggestions: an in-memory LRU in front of the
+ai_normalization_cache table, keyed by the description hash.
+
+Cache hits no longer issue one `UPDATE ... hit_count + 1` each. Hits are
+counted in memory by HitCountBuffer and flushed periodically with a single
+set-based UPDATE, so reads stay reads.
+"""
+
+from threading import Lock
+from typing import Dict, Optional
+import hashlib
+import threading
+
+from psycopg2.extras import execute_values
+
+from mapping_cache import LRUCache, MISSING
+
+LOOKUP_QUERY = """
+SELECT
+    anc.suggested_sbs_code as sbs_code,
+    anc.confidence_score as confidence,
+    smc.description_en,
+    smc.description_ar
+FROM ai_normalization_cache anc
+JOIN sbs_master_catalogue smc ON anc.suggested_sbs_code = smc.sbs_id
+WHERE anc.description_hash = %s
+"""
+
+INSERT_QUERY = """
+INSERT INTO ai_normalization_cache
+(description_hash, original_description, suggested_sbs_code, confidence_score)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (description_hash) DO UPDATE
+SET hit_count = ai_normalization_cache.hit_count + 1,
+    last_accessed = NOW()
+"""
+
+FLUSH_QUERY = """
+UPDATE ai_normalization_cache AS anc
+SET hit_count = anc.hit_count + v.hits,
+    last_accessed = NOW()
+FROM (VALUES %s) AS v(description_hash, hits)
+WHERE anc.description_hash = v.description_hash
+"""
+
+
+def generate_description_hash(description: str) -> str:
+    """Generate SHA-256 hash of description for caching"""
+    return hashlib.sha256(description.lower().strip().encode()).hexdigest()
+
+
+class HitCountBuffer(threading.Thread):
+    """
+    Accumulates cache hit counts in memory and flushes them in one statement
+    every flush_interval seconds, or early once max_pending keys are waiting.
+    """
+
+    def __init__(self, connection_factory, flush_interval: float = 5.0, max_pending: int = 1000):
+        super().__init__(name="ai-cache-hit-flusher", daemon=True)
+        self.connection_factory = connection_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flushes = 0
+        self.flush_errors = 0
+        self._pending: Dict[str, int] = {}
+        self.lock = Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+    def record(self, description_hash: str) -> None:
+        with self.lock:
+            self._pending[description_hash] = self._pending.get(description_hash, 0) + 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write all buffered hit counts; returns the number of keys flushed"""
+        with self.lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            with self.connection_factory() as conn:
+                cursor = conn.cursor()
+                execute_values(cursor, FLUSH_QUERY, sorted(batch.items()))
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"AI cache hit flush error: {e}")
+            # Put the counts back so they are retried with the next flush
+            with self.lock:
+                for key, hits in batch.items():
+                    self._pending[key] = self._pending.get(key, 0) + hits
+            return 0
+        self.flushes += 1
+        return len(batch)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+
+class AINormalizationCache:
+    """In-memory LRU over the ai_normalization_cache table"""
+
+    def __init__(self, connection_factory, max_entries: int = 10000,
+                 flush_interval: float = 5.0, max_pending: int = 1000):
+        self.connection_factory = connection_factory
+        self.memory = LRUCache(max_entries)
+        self.hit_buffer = HitCountBuffer(connection_factory, flush_interval, max_pending)
+        self.stats_counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0}
+
+    def start(self) -> None:
+        self.hit_buffer.start()
+
+    def stop(self) -> None:
+        self.hit_buffer.stop()
+
+    def lookup(self, description: str) -> Optional[dict]:
+        """Return the cached suggestion for a description, or None"""
+        desc_hash = generate_description_hash(description)
+
+        cached = self.memory.get(desc_hash)
+        if cached is not MISSING:
+            self.stats_counters["memory_hits"] += 1
+            self.hit_buffer.record(desc_hash)
+            return dict(cached)
+
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            cursor.execute(LOOKUP_QUERY, (desc_hash,))
+            row = cursor.fetchone()
+            columns = [desc[0] for desc in cursor.description] if row else None
+            cursor.close()
+
+        if not row:
+            self.stats_counters["misses"] += 1
+            return None
+
+        result = dict(zip(columns, row))
+        self.memory.put(desc_hash, result)
+        self.stats_counters["db_hits"] += 1
+        self.hit_buffer.record(desc_hash)
+        return dict(result)
+
+    def store(self, description: str, sbs_code: str, confidence: float,
+              description_en: Optional[str] = None, description_ar: Optional[str] = None) -> None:
+        """Persist a fresh suggestion and keep it in memory"""
+        desc_hash = generate_description_hash(description)
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_QUERY, (desc_hash, description, sbs_code, confidence))
+            conn.commit()
+            cursor.close()
+        self.memory.put(desc_hash, {
+            "sbs_code": sbs_code,
+            "confidence": confidence,
+            "description_en": description_en,
+            "description_ar": description_ar,
+        })
+        self.stats_counters["stores"] += 1
+
+    def invalidate_all(self) -> None:
+        """Catalogue edits may retire suggested codes; drop the memory level"""
+        self.memory.clear()
+
+    def invalidate_facility(self, facility_id: int) -> None:
+        """Suggestions are not facility specific"""
+
+    def stats(self) -> dict:
+        stats = dict(self.stats_counters)
+        stats["memory_size"] = len(self.memory)
+        stats["pending_hit_updates"] = self.hit_buffer.pending()
+        stats["hit_flushes"] = self.hit_buffer.flushes
+        stats["hit_flush_errors"] = self.hit_buffer.flush_errors
+        return stats
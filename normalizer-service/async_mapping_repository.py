@@ -0,0 +1,91 @@
+"""
+Async Mapping Repository
+asyncpg pool-backed implementation of the local mapping lookups, selected
+with NORMALIZER_DB_DRIVER=asyncpg.
+
+Unlike the psycopg2 path it never blocks the event loop, so a single uvicorn
+worker can keep hundreds of lookups in flight. Queries go through asyncpg's
+per-connection statement cache, so each statement is prepared once per
+pooled connection and then only bound and executed.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+
+from sbs_common.db import AsyncDatabasePool
+
+# v_active_mappings: the same active filter as the mapping snapshot
+LOOKUP_QUERY = """
+SELECT
+    sbs_code,
+    confidence,
+    mapping_source,
+    sbs_description AS description_en,
+    sbs_description_ar AS description_ar
+FROM v_active_mappings
+WHERE facility_id = $1
+  AND internal_code = $2
+ORDER BY confidence DESC NULLS LAST
+LIMIT 1
+"""
+
+BATCH_LOOKUP_QUERY = """
+SELECT DISTINCT ON (q.facility_id, q.internal_code)
+    q.facility_id,
+    q.internal_code,
+    vam.sbs_code,
+    vam.confidence,
+    vam.mapping_source,
+    vam.sbs_description AS description_en,
+    vam.sbs_description_ar AS description_ar
+FROM unnest($1::int[], $2::text[]) AS q(facility_id, internal_code)
+JOIN v_active_mappings vam
+  ON vam.facility_id = q.facility_id AND vam.internal_code = q.internal_code
+ORDER BY q.facility_id, q.internal_code, vam.confidence DESC NULLS LAST
+"""
+
+
+class AsyncMappingRepository:
+    """Mapping lookups over a shared asyncpg pool (sbs_common.db.AsyncDatabasePool)"""
+
+    def __init__(self, pool: AsyncDatabasePool,
+                 query_observer: Optional[Callable[[str, float], None]] = None):
+        self.pool = pool
+        # Optional latency hook: seconds spent in a query (checkout is observed by the pool)
+        self.query_observer = query_observer
+
+    async def start(self) -> None:
+        await self.pool.start()
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def _observe(self, query: str, started: float) -> None:
+        if self.query_observer:
+            self.query_observer(query, time.perf_counter() - started)
+
+    async def fetch_mapping(self, facility_id: int, internal_code: str) -> Optional[dict]:
+        async with self.pool.acquire() as conn:
+            started = time.perf_counter()
+            row = await conn.fetchrow(LOOKUP_QUERY, facility_id, internal_code)
+            self._observe("mapping", started)
+        return dict(row) if row else None
+
+    async def fetch_mappings(self, keys: List[Tuple[int, str]]) -> Dict[Tuple[int, str], dict]:
+        async with self.pool.acquire() as conn:
+            started = time.perf_counter()
+            rows = await conn.fetch(
+                BATCH_LOOKUP_QUERY,
+                [k[0] for k in keys],
+                [k[1] for k in keys]
+            )
+            self._observe("mappings_batch", started)
+        mappings = {}
+        for row in rows:
+            mapping = dict(row)
+            key = (mapping.pop('facility_id'), mapping.pop('internal_code'))
+            mappings[key] = mapping
+        return mappings
+
+    def stats(self) -> Dict[str, int]:
+        return self.pool.stats()
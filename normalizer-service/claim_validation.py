@@ -0,0 +1,53 @@
+"""
+Claim Item Validation
+Input checks used by InternalClaimItem, built on module-level precompiled
+patterns.
+
+validate_internal_code rejects injection/XSS/traversal fragments and anything
+outside [a-zA-Z0-9_-.]. Every fragment except "--" contains a character the
+allow-list rejects, so the common case is one allow-list match plus a
+substring test; the combined fragment pattern only runs for rejected codes,
+to pick the same error message as before.
+
+sanitize_description strips script tags, javascript: URLs, inline event
+handlers and traversal sequences. A single combined pre-check skips the
+sequential substitutions for clean text, which is almost all of it.
+"""
+
+import re
+
+_CODE_ALLOWED = re.compile(r'^[a-zA-Z0-9_\-\.]+$')
+_CODE_DANGEROUS = re.compile(
+    r';|--|/\*|\*/|\\|\x00'               # SQL injection
+    r'|\$\(|`|\||&&|\|\|'                 # Command injection
+    r'|<script|javascript:|data:'         # XSS
+    r'|\.\./|\.\.\\'                      # Path traversal
+)
+
+# Applied in this order; a removal can expose a later match, as before
+_DESCRIPTION_STRIP = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'<script.*?>.*?</script>', r'javascript:', r'on\w+\s*=',  # XSS
+    r'\.\./', r'\.\.\\',  # Path traversal
+))
+_DESCRIPTION_HAZARD = re.compile(
+    r'<script|javascript:|on\w+\s*=|\.\./|\.\.\\', re.IGNORECASE
+)
+
+
+def validate_internal_code(v: str) -> str:
+    """Return the stripped code or raise ValueError"""
+    if _CODE_ALLOWED.match(v):
+        if '--' in v:
+            raise ValueError('Invalid characters in code')
+        return v.strip()
+    if _CODE_DANGEROUS.search(v.lower()):
+        raise ValueError('Invalid characters in code')
+    raise ValueError('Code must contain only alphanumeric characters, hyphens, underscores, and periods')
+
+
+def sanitize_description(v: str) -> str:
+    """Remove potentially dangerous content and surrounding whitespace"""
+    if _DESCRIPTION_HAZARD.search(v):
+        for pattern in _DESCRIPTION_STRIP:
+            v = pattern.sub('', v)
+    return v.strip()
@@ -0,0 +1,205 @@
+"""
+Description Matcher
+Offline lexical matcher from free-text service descriptions to SBS codes.
+
+Catalogue descriptions (English and Arabic) are folded, split into padded
+character n-grams and weighted with TF-IDF. An inverted index from n-gram to
+(entry, weight) postings answers top-k cosine-similarity queries by touching
+only the entries that share an n-gram with the query; postings are NumPy
+arrays, so each query n-gram costs one vectorized add.
+
+For bulk work (backfills) top_k_batch encodes all queries and the catalogue
+as SciPy sparse matrices and scores them with one matrix product per chunk.
+
+Arabic normalization folds alef variants (أ إ آ ٱ -> ا), alef maqsura
+(ى -> ي) and ta marbuta (ة -> ه), and strips diacritics and tatweel, so
+spelling variants common in HIS exports still match.
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+import re
+
+import numpy as np
+
+# Harakat, Quranic annotation marks, superscript alef and tatweel
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_NON_WORD = re.compile("[^0-9a-z\u0621-\u064a]+")
+_ARABIC_FOLDING = str.maketrans({
+    "\u0623": "\u0627",  # alef with hamza above -> alef
+    "\u0625": "\u0627",  # alef with hamza below -> alef
+    "\u0622": "\u0627",  # alef with madda -> alef
+    "\u0671": "\u0627",  # alef wasla -> alef
+    "\u0649": "\u064a",  # alef maqsura -> ya
+    "\u0629": "\u0647",  # ta marbuta -> ha
+})
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lower-case, fold Arabic letter variants, drop marks and punctuation"""
+    text = (text or "").lower().translate(_ARABIC_FOLDING)
+    text = _ARABIC_MARKS.sub("", text)
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def char_ngrams(text: str, n: int = 3) -> Counter:
+    """Character n-grams of each word, padded with spaces at the word edges"""
+    grams: Counter = Counter()
+    for word in normalize_text(text).split():
+        padded = f" {word} "
+        if len(padded) <= n:
+            grams[padded] += 1
+            continue
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    return grams
+
+
+class DescriptionMatcher:
+    """Immutable TF-IDF n-gram index over catalogue entries"""
+
+    def __init__(self, entries: Iterable[dict], ngram_size: int = 3):
+        self.ngram_size = ngram_size
+        entries = sorted(entries, key=lambda e: e["sbs_id"])
+        self.codes: List[str] = [e["sbs_id"] for e in entries]
+
+        term_counts = [
+            char_ngrams(f"{e.get('description_en') or ''} {e.get('description_ar') or ''}", ngram_size)
+            for e in entries
+        ]
+        document_frequency: Counter = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+
+        total = len(entries)
+        # Smoothed IDF; n-grams unseen in the catalogue get the maximum weight
+        self.idf: Dict[str, float] = {
+            gram: math.log((1 + total) / (1 + df)) + 1.0
+            for gram, df in document_frequency.items()
+        }
+        self.unseen_idf = math.log(1 + total) + 1.0
+        self.vocabulary: Dict[str, int] = {gram: i for i, gram in enumerate(sorted(self.idf))}
+
+        postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for doc, counts in enumerate(term_counts):
+            for gram, weight in self._weigh(counts).items():
+                postings[gram].append((doc, weight))
+        # Postings as (entry indices, weights) arrays so a query is one vector add per n-gram
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            gram: (
+                np.fromiter((doc for doc, _ in items), dtype=np.int32, count=len(items)),
+                np.fromiter((weight for _, weight in items), dtype=np.float64, count=len(items))
+            )
+            for gram, items in postings.items()
+        }
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _weigh(self, counts: Counter) -> Dict[str, float]:
+        """Sublinear TF * IDF, L2-normalized"""
+        vector = {
+            gram: (1.0 + math.log(tf)) * self.idf.get(gram, self.unseen_idf)
+            for gram, tf in counts.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if not norm:
+            return {}
+        return {gram: w / norm for gram, w in vector.items()}
+
+    def vectorize(self, description: str) -> Dict[str, float]:
+        return self._weigh(char_ngrams(description, self.ngram_size))
+
+    def top_k(self, description: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Best k (sbs_code, cosine score) candidates, highest first.
+        Ties are broken by sbs_id so results are deterministic.
+        """
+        scores = np.zeros(len(self.codes))
+        for gram, weight in self.vectorize(description).items():
+            posting = self.postings.get(gram)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weight * weights
+
+        candidates = np.flatnonzero(scores)
+        return self._select(candidates, scores[candidates], k)
+
+    def _select(self, docs: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Top k of parallel (entry index, score) arrays, ties broken by sbs_id"""
+        if len(docs) > k:
+            # Keep everything tied with the k-th best so the tie-break stays exact
+            threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= threshold
+            docs, scores = docs[keep], scores[keep]
+        order = np.lexsort((docs, -scores))[:k]
+        return [
+            (self.codes[doc], round(min(float(score), 1.0), 4))
+            for doc, score in zip(docs[order], scores[order])
+        ]
+
+    def catalogue_matrix(self):
+        """Catalogue TF-IDF vectors as a sparse (entries x vocabulary) CSR matrix"""
+        if self._matrix is None:
+            # Imported lazily; only bulk scoring needs SciPy
+            from scipy import sparse
+
+            rows, cols, data = [np.zeros(0, dtype=np.int32)], [np.zeros(0, dtype=np.int32)], [np.zeros(0)]
+            for gram, (docs, weights) in self.postings.items():
+                rows.append(docs)
+                cols.append(np.full(len(docs), self.vocabulary[gram], dtype=np.int32))
+                data.append(weights)
+            self._matrix = sparse.csr_matrix(
+                (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                shape=(len(self.codes), len(self.vocabulary))
+            )
+        return self._matrix
+
+    def encode(self, descriptions: List[str]):
+        """
+        Query TF-IDF vectors as a sparse (queries x vocabulary) CSR matrix.
+        N-grams outside the vocabulary count towards each row's norm but
+        cannot match, exactly as in top_k.
+        """
+        from scipy import sparse
+
+        indptr, indices, data = [0], [], []
+        for description in descriptions:
+            for gram, weight in self.vectorize(description).items():
+                col = self.vocabulary.get(gram)
+                if col is not None:
+                    indices.append(col)
+                    data.append(weight)
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(descriptions), len(self.vocabulary))
+        )
+
+    def top_k_batch(self, descriptions: List[str], k: int = 1,
+                    chunk_size: int = 2000) -> List[List[Tuple[str, float]]]:
+        """
+        top_k for many descriptions at once: queries are scored against the
+        whole catalogue with one sparse matrix product per chunk, and the k-th
+        best score of every row is found with one partition over the block.
+        Chunks are sized so the dense score block stays bounded.
+        """
+        catalogue_t = self.catalogue_matrix().T.tocsr()
+        entries = max(len(self.codes), 1)
+        k = min(k, entries)
+        # Bound the dense (chunk x entries) score block to ~32 MB
+        chunk_size = max(1, min(chunk_size, (1 << 22) // entries))
+        results: List[List[Tuple[str, float]]] = []
+        for start in range(0, len(descriptions), chunk_size):
+            scores = (self.encode(descriptions[start:start + chunk_size]) @ catalogue_t).toarray()
+            if not len(self.codes):
+                results.extend([] for _ in range(scores.shape[0]))
+                continue
+            # k-th best score per row, found for the whole block at once
+            thresholds = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+            for row, threshold in zip(scores, thresholds):
+                docs = np.flatnonzero((row >= threshold) & (row > 0))
+                results.append(self._select(docs, row[docs], k))
+        return results
@@ -0,0 +1,267 @@
+"""
+Facility Code Import
+Streaming bulk load of a facility's internal codes (CSV or NDJSON) into
+facility_internal_codes, followed by rule_based auto-mapping of the rows
+that have no active mapping.
+
+Input is consumed line by line and processed in fixed-size chunks. Each
+chunk is COPYed into a temporary staging table, upserted in one statement
+and scored with DescriptionMatcher.top_k_batch, so memory use depends on the
+chunk size, not on the file size.
+
+Accepted columns / keys: internal_code, local_description (or description),
+local_description_ar, price_gross, department.
+
+Usage:
+    python facility_import.py --facility-id 1 codes.csv
+    python facility_import.py --facility-id 1 --format ndjson codes.ndjson
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+import time
+
+from description_matcher import DescriptionMatcher
+from mapping_backfill import env_connection_factory, load_matcher, propose_mappings, write_proposals
+
+STAGING_TABLE_DDL = """
+CREATE TEMP TABLE facility_code_import_staging (
+    line_no INT NOT NULL,
+    internal_code VARCHAR(100) NOT NULL,
+    local_description TEXT NOT NULL,
+    local_description_ar TEXT,
+    price_gross DECIMAL(10,2),
+    department VARCHAR(100)
+) ON COMMIT DROP
+"""
+
+COPY_STAGING = """
+COPY facility_code_import_staging
+(line_no, internal_code, local_description, local_description_ar, price_gross, department)
+FROM STDIN WITH (FORMAT csv)
+"""
+
+# Last occurrence of a code within the chunk wins
+UPSERT_FROM_STAGING = """
+INSERT INTO facility_internal_codes
+(facility_id, internal_code, local_description, local_description_ar, price_gross, department, is_active)
+SELECT DISTINCT ON (internal_code)
+    %s, internal_code, local_description, local_description_ar, price_gross, department, TRUE
+FROM facility_code_import_staging
+ORDER BY internal_code, line_no DESC
+ON CONFLICT (facility_id, internal_code) DO UPDATE
+SET local_description = EXCLUDED.local_description,
+    local_description_ar = EXCLUDED.local_description_ar,
+    price_gross = EXCLUDED.price_gross,
+    department = EXCLUDED.department,
+    is_active = TRUE,
+    updated_at = CURRENT_TIMESTAMP
+RETURNING internal_code_id, local_description, local_description_ar, (xmax = 0) AS inserted
+"""
+
+MAPPED_IDS_QUERY = """
+SELECT DISTINCT internal_code_id
+FROM sbs_normalization_map
+WHERE internal_code_id = ANY(%s) AND is_active = TRUE
+"""
+
+_CODE_PATTERN = re.compile(r"^[a-zA-Z0-9_\-\.]+$")
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Split a stream of byte chunks into decoded lines (newline kept)"""
+    pending = b""
+    first = True
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig" if first else "utf-8") + "\n"
+            first = False
+    if pending:
+        yield pending.decode("utf-8-sig" if first else "utf-8")
+
+
+def parse_records(lines: Iterable[str], fmt: str = "csv") -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw record) from CSV (with header) or NDJSON lines"""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(lines, start=1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield line_no, record if isinstance(record, dict) else {"_invalid": line.strip()[:100]}
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def clean_record(record: dict) -> tuple:
+    """Validate one raw record; returns the staging column values or raises ValueError"""
+    if "_invalid" in record:
+        raise ValueError("Invalid JSON object")
+    code = str(record.get("internal_code") or "").strip()
+    if not code or len(code) > 100 or not _CODE_PATTERN.match(code):
+        raise ValueError("internal_code must be 1-100 alphanumeric characters, hyphens, underscores or periods")
+    description = str(record.get("local_description") or record.get("description") or "").strip()
+    if not description:
+        raise ValueError("local_description is required")
+
+    price = record.get("price_gross")
+    if price in (None, ""):
+        price = None
+    else:
+        try:
+            # Round like a NUMERIC(10,2) column would
+            price = Decimal(str(price)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        except InvalidOperation:
+            raise ValueError(f"Invalid price_gross: {price}")
+        if price.is_nan() or abs(price) >= Decimal("100000000"):
+            raise ValueError(f"Invalid price_gross: {price}")
+
+    department = (str(record.get("department") or "").strip() or None)
+    if department and len(department) > 100:
+        raise ValueError("department longer than 100 characters")
+    description_ar = (str(record.get("local_description_ar") or "").strip() or None)
+    return code, description, description_ar, price, department
+
+
+class FacilityCodeImporter:
+    """Chunked COPY -> upsert -> auto-map pipeline for one facility"""
+
+    def __init__(self, connection_factory, facility_id: int,
+                 matcher: Optional[DescriptionMatcher] = None, auto_map: bool = True,
+                 min_score: float = 0.5, activate: bool = False, chunk_size: int = 5000,
+                 max_reported_errors: int = 100, progress: Optional[Callable[[dict], None]] = None):
+        self.connection_factory = connection_factory
+        self.facility_id = facility_id
+        self.matcher = matcher
+        self.auto_map = auto_map
+        self.min_score = min_score
+        self.activate = activate
+        self.chunk_size = chunk_size
+        self.max_reported_errors = max_reported_errors
+        self.progress = progress
+        self.summary = {
+            "facility_id": facility_id,
+            "rows_read": 0,
+            "rows_invalid": 0,
+            "inserted": 0,
+            "updated": 0,
+            "unmapped": 0,
+            "mappings_proposed": 0,
+            "mappings_inserted": 0,
+            "chunks": 0,
+            "errors": [],
+        }
+
+    def run(self, records: Iterable[Tuple[int, dict]]) -> dict:
+        started = time.time()
+        if self.auto_map and self.matcher is None:
+            self.matcher = load_matcher(self.connection_factory)
+
+        with self.connection_factory() as conn:
+            chunk: List[tuple] = []
+            for line_no, record in records:
+                self.summary["rows_read"] += 1
+                try:
+                    chunk.append((line_no,) + clean_record(record))
+                except ValueError as e:
+                    self.summary["rows_invalid"] += 1
+                    if len(self.summary["errors"]) < self.max_reported_errors:
+                        self.summary["errors"].append({"line": line_no, "error": str(e)})
+                if len(chunk) >= self.chunk_size:
+                    self.load_chunk(conn, chunk)
+                    chunk = []
+            if chunk:
+                self.load_chunk(conn, chunk)
+
+        self.summary["elapsed_seconds"] = round(time.time() - started, 2)
+        return self.summary
+
+    def load_chunk(self, conn, rows: List[tuple]) -> None:
+        """Stage, upsert and auto-map one chunk in a single transaction"""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(STAGING_TABLE_DDL)
+            cursor.copy_expert(COPY_STAGING, buffer)
+            cursor.execute(UPSERT_FROM_STAGING, (self.facility_id,))
+            upserted = cursor.fetchall()
+
+            inserted = sum(1 for row in upserted if row[3])
+            self.summary["inserted"] += inserted
+            self.summary["updated"] += len(upserted) - inserted
+
+            if self.auto_map and upserted:
+                cursor.execute(MAPPED_IDS_QUERY, ([row[0] for row in upserted],))
+                mapped = {row[0] for row in cursor.fetchall()}
+                unmapped = [row[:3] for row in upserted if row[0] not in mapped]
+                self.summary["unmapped"] += len(unmapped)
+                if unmapped:
+                    proposals, _ = propose_mappings(
+                        self.matcher, unmapped, self.min_score, activate=self.activate
+                    )
+                    self.summary["mappings_proposed"] += len(proposals)
+                    self.summary["mappings_inserted"] += write_proposals(cursor, proposals)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        self.summary["chunks"] += 1
+        if self.progress:
+            self.progress({k: v for k, v in self.summary.items() if k != "errors"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream internal codes into facility_internal_codes and auto-map them")
+    parser.add_argument("path", help="CSV or NDJSON file ('-' for stdin)")
+    parser.add_argument("--facility-id", type=int, required=True)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                        help="Input format (default: from file extension, else csv)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--min-score", type=float, default=0.5)
+    parser.add_argument("--no-auto-map", action="store_true", help="Load codes only")
+    parser.add_argument("--activate", action="store_true", help="Insert proposed mappings as active")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+    try:
+        importer = FacilityCodeImporter(
+            env_connection_factory(),
+            args.facility_id,
+            auto_map=not args.no_auto_map,
+            min_score=args.min_score,
+            activate=args.activate,
+            chunk_size=args.chunk_size,
+            progress=lambda s: print(
+                f"rows={s['rows_read']} inserted={s['inserted']} updated={s['updated']} "
+                f"mapped={s['mappings_inserted']}", file=sys.stderr
+            )
+        )
+        summary = importer.run(parse_records(stream, fmt))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
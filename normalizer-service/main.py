@@ -8,23 +8,38 @@ Improvements:
 - Request ID tracking
 """
 
-from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, validator
-from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError, validator
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import os
 from dotenv import load_dotenv
 import hashlib
 import time
 from datetime import datetime
-import uuid
-from contextlib import contextmanager
-import psycopg2
-from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
-from collections import deque
 from threading import Lock
+import threading
+from sbs_common.db import AsyncDatabasePool, DatabasePool
+from sbs_common.middleware import RateLimiter, install_middleware
+from mapping_cache import MappingCache, MappingInvalidationListener, MISSING
+from mapping_snapshot import MappingSnapshotStore
+from async_mapping_repository import AsyncMappingRepository
+from ai_cache import AINormalizationCache, generate_description_hash
+from singleflight import SingleFlight
+from mapping_backfill import run_backfill
+from facility_import import FacilityCodeImporter, iter_lines, parse_records
+from claim_validation import sanitize_description, validate_internal_code
+import service_metrics
+from suggestion_providers import (
+    CatalogueStore,
+    GeminiSuggestionProvider,
+    LocalSuggestionProvider,
+    SuggestionProvider,
+    build_suggestion_provider
+)
 
 load_dotenv()
 
@@ -34,100 +49,66 @@ app = FastAPI(
     version="2.0.0"
 )
 
-# CORS middleware - Restrict to allowed origins
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-Request-ID"],
+# Shared middleware: CORS, request IDs + latency metrics, rate limiting (100 requests per minute per IP)
+# Health and metrics scrapes are never rate limited
+install_middleware(
+    app,
+    service_metrics.metrics,
+    rate_limiter=RateLimiter(max_requests=100, time_window=60),
+    exempt_paths=("/health", "/metrics", "/metrics/json")
 )
 
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+
+# Driver for hot-path mapping lookups: "psycopg2" (pool + threadpool) or "asyncpg"
+NORMALIZER_DB_DRIVER = os.getenv("NORMALIZER_DB_DRIVER", "psycopg2").lower()
+async_repository: Optional[AsyncMappingRepository] = None
+
 # Database connection pool
-try:
-    db_pool = pool.ThreadedConnectionPool(
-        minconn=1,
-        maxconn=20,
-        host=os.getenv("DB_HOST", "localhost"),
-        database=os.getenv("DB_NAME", "sbs_integration"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT", "5432")
-    )
-    print("✓ Database connection pool created")
-except Exception as e:
-    print(f"✗ Failed to create connection pool: {e}")
-    db_pool = None
-
-# Rate limiter implementation
-class RateLimiter:
-    """Token bucket rate limiter"""
-    def __init__(self, max_requests: int = 100, time_window: int = 60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = {}
-        self.lock = Lock()
-    
-    def is_allowed(self, identifier: str) -> bool:
-        """Check if request is allowed for given identifier"""
-        with self.lock:
-            now = time.time()
-            
-            if identifier not in self.requests:
-                self.requests[identifier] = deque()
-            
-            # Remove old requests outside time window
-            while self.requests[identifier] and self.requests[identifier][0] < now - self.time_window:
-                self.requests[identifier].popleft()
-            
-            # Check if under limit
-            if len(self.requests[identifier]) < self.max_requests:
-                self.requests[identifier].append(now)
-                return True
-            
-            return False
-
-# Initialize rate limiter (100 requests per minute per IP)
-rate_limiter = RateLimiter(max_requests=100, time_window=60)
-
-# Metrics storage (in production, use Prometheus)
-metrics = {
-    "requests_total": 0,
-    "requests_success": 0,
-    "requests_failed": 0,
-    "rate_limited": 0,
-    "cache_hits": 0,
-    "cache_misses": 0,
-    "ai_calls": 0
-}
-
-@contextmanager
-def get_db_connection():
-    """Get database connection from pool"""
-    conn = None
-    try:
-        if db_pool:
-            conn = db_pool.getconn()
-            yield conn
-        else:
-            # Fallback to direct connection
-            conn = psycopg2.connect(
-                host=os.getenv("DB_HOST", "localhost"),
-                database=os.getenv("DB_NAME", "sbs_integration"),
-                user=os.getenv("DB_USER", "postgres"),
-                password=os.getenv("DB_PASSWORD"),
-                port=os.getenv("DB_PORT", "5432")
-            )
-            yield conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        raise
-    finally:
-        if conn and db_pool:
-            db_pool.putconn(conn)
-        elif conn:
-            conn.close()
+db_pool = DatabasePool(
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    checkout_observer=service_metrics.POOL_CHECKOUT_WAIT.labels(driver="psycopg2").observe
+)
+db_pool.open()
+get_db_connection = db_pool.connection
+
+# Upper bound on items accepted by /normalize/batch
+MAX_BATCH_ITEMS = int(os.getenv("NORMALIZE_MAX_BATCH_ITEMS", "500"))
+
+# In-process mapping cache (LRU + negative caching), invalidated via LISTEN/NOTIFY
+MAPPING_CACHE_SIZE = int(os.getenv("MAPPING_CACHE_SIZE", "50000"))
+MAPPING_CACHE_NEGATIVE = os.getenv("MAPPING_CACHE_NEGATIVE", "true").lower() == "true"
+mapping_cache = MappingCache(max_entries=MAPPING_CACHE_SIZE, cache_misses=MAPPING_CACHE_NEGATIVE)
+mapping_listener: Optional[MappingInvalidationListener] = None
+
+# Full-facility mapping snapshot: "" (disabled), "all", or a comma-separated facility list
+MAPPING_SNAPSHOT_FACILITIES = os.getenv("MAPPING_SNAPSHOT_FACILITIES", "").strip().lower()
+MAPPING_SNAPSHOT_REFRESH_SECONDS = float(os.getenv("MAPPING_SNAPSHOT_REFRESH_SECONDS", "300"))
+mapping_snapshot: Optional[MappingSnapshotStore] = None
+
+# Fallback tier for unmapped codes: AI_SUGGESTION_PROVIDER selects gemini, local or none
+AI_FALLBACK_ENABLED = os.getenv("AI_FALLBACK_ENABLED", "true").lower() == "true"
+AI_CACHE_MEMORY_SIZE = int(os.getenv("AI_CACHE_MEMORY_SIZE", "10000"))
+AI_HIT_FLUSH_SECONDS = float(os.getenv("AI_HIT_FLUSH_SECONDS", "5"))
+AI_HIT_FLUSH_MAX_PENDING = int(os.getenv("AI_HIT_FLUSH_MAX_PENDING", "1000"))
+catalogue_store: Optional[CatalogueStore] = None
+ai_cache: Optional[AINormalizationCache] = None
+suggestion_provider: Optional[SuggestionProvider] = None
+# Offline description matcher tried before any AI call; 0 disables it. With
+# AI_SUGGESTION_PROVIDER=local it is the provider itself (one index, one scoring per miss)
+RULE_MATCH_MIN_SCORE = float(os.getenv("RULE_MATCH_MIN_SCORE", "0.6"))
+rule_matcher: Optional[LocalSuggestionProvider] = None
+# Last/current rule_based mapping backfill started via /admin/backfill
+backfill_status: Dict[str, object] = {"state": "idle"}
+backfill_lock = Lock()
+# Last/current streaming facility code import started via /admin/import
+import_status: Dict[str, object] = {"state": "idle"}
+import_lock = Lock()
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Concurrent misses for the same description share one fallback computation
+fallback_flight = SingleFlight(observer=service_metrics.record_fallback_call)
 
 
 class InternalClaimItem(BaseModel):
@@ -137,35 +118,13 @@ class InternalClaimItem(BaseModel):
     
     @validator('internal_code')
     def validate_code(cls, v):
-        import re
-        # Prevent SQL injection and command injection attempts
-        dangerous_patterns = [
-            r';', r'--', r'/\*', r'\*/', r'\\', r'\x00',  # SQL injection
-            r'\$\(', r'`', r'\|', r'&&', r'\|\|',  # Command injection
-            r'<script', r'javascript:', r'data:',  # XSS
-            r'\.\./', r'\.\.\\',  # Path traversal
-        ]
-        v_lower = v.lower()
-        for pattern in dangerous_patterns:
-            if re.search(pattern, v_lower):
-                raise ValueError('Invalid characters in code')
-        # Only allow alphanumeric, hyphen, underscore, and period
-        if not re.match(r'^[a-zA-Z0-9_\-\.]+$', v):
-            raise ValueError('Code must contain only alphanumeric characters, hyphens, underscores, and periods')
-        return v.strip()
+        # Prevent SQL/command injection, XSS and path traversal; allow-list only
+        return validate_internal_code(v)
     
     @validator('description')
     def validate_description(cls, v):
-        import re
         # Sanitize description - remove potentially dangerous content
-        dangerous_patterns = [
-            r'<script.*?>.*?</script>', r'javascript:', r'on\w+\s*=',  # XSS
-            r'\.\./', r'\.\.\\',  # Path traversal
-        ]
-        v_clean = v
-        for pattern in dangerous_patterns:
-            v_clean = re.sub(pattern, '', v_clean, flags=re.IGNORECASE)
-        return v_clean.strip()
+        return sanitize_description(v)
 
 
 class NormalizedResponse(BaseModel):
@@ -179,49 +138,57 @@ class NormalizedResponse(BaseModel):
     processing_time_ms: Optional[float] = None
 
 
-@app.middleware("http")
-async def add_request_id(request: Request, call_next):
-    """Add request ID to all requests"""
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
-    request.state.start_time = time.time()
-    
-    response = await call_next(request)
-    
-    response.headers["X-Request-ID"] = request_id
-    processing_time = (time.time() - request.state.start_time) * 1000
-    response.headers["X-Processing-Time-MS"] = f"{processing_time:.2f}"
-    
-    return response
+class BatchItemResult(BaseModel):
+    index: int
+    facility_id: Optional[int] = None
+    internal_code: Optional[str] = None
+    status: str = Field(..., description="mapped, not_found or error")
+    sbs_mapped_code: Optional[str] = None
+    official_description: Optional[str] = None
+    confidence: Optional[float] = None
+    mapping_source: Optional[str] = None
+    description_en: Optional[str] = None
+    description_ar: Optional[str] = None
+    error: Optional[str] = None
 
 
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting middleware"""
-    # Skip rate limiting for health check
-    if request.url.path == "/health" or request.url.path == "/metrics":
-        return await call_next(request)
-    
-    # Get client identifier (IP address)
-    client_ip = request.client.host
-    
-    if not rate_limiter.is_allowed(client_ip):
-        metrics["rate_limited"] += 1
-        return JSONResponse(
-            status_code=429,
-            content={
-                "error": "Rate limit exceeded",
-                "message": "Too many requests. Please try again later.",
-                "retry_after_seconds": 60
-            }
-        )
-    
-    return await call_next(request)
+class BatchNormalizedResponse(BaseModel):
+    request_id: Optional[str] = None
+    total: int
+    mapped: int
+    not_found: int
+    errors: int
+    results: List[BatchItemResult]
+    processing_time_ms: Optional[float] = None
+
+
+class BackfillRequest(BaseModel):
+    facility_id: Optional[int] = Field(None, ge=1)
+    min_score: float = Field(0.5, ge=0, le=1)
+    top_k: int = Field(1, ge=1, le=10)
+    activate: bool = False
+    dry_run: bool = False
+
+
+class MatchRequest(BaseModel):
+    description: str = Field(..., description="Service description", min_length=1, max_length=500)
+    top_k: int = Field(5, ge=1, le=50)
+
+
+class MatchCandidate(BaseModel):
+    sbs_code: str
+    score: float
+
+
+class MatchResponse(BaseModel):
+    request_id: Optional[str] = None
+    candidates: List[MatchCandidate]
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     """Enhanced health check with database connectivity"""
+    # Sync route (threadpool): a pool checkout can wait up to DB_POOL_TIMEOUT
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
@@ -231,7 +198,10 @@ async def health_check():
         return {
             "status": "healthy",
             "database": "connected",
-            "pool_available": db_pool is not None,
+            "pool_available": db_pool.pool is not None,
+            "pool": db_pool.stats(),
+            "db_driver": "asyncpg" if async_repository else "psycopg2",
+            "async_pool": async_repository.stats() if async_repository else None,
             "version": "2.0.0",
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -248,32 +218,190 @@ async def health_check():
 
 @app.get("/metrics")
 async def get_metrics():
-    """Prometheus-style metrics endpoint"""
+    """Prometheus text exposition (aggregated over workers in multiprocess mode)"""
+    body, content_type = service_metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/metrics/json")
+async def get_metrics_json():
+    """Counter values plus this worker's cache, listener and fallback state"""
     return {
         "service": "normalizer",
-        "metrics": metrics,
-        "uptime_seconds": time.time(),
+        "counters": service_metrics.counter_values(),
+        "mapping_cache": mapping_cache.stats(),
+        "mapping_listener_connected": bool(mapping_listener and mapping_listener.connected),
+        "suggestion_provider": suggestion_provider.name if suggestion_provider else None,
+        "ai_cache": ai_cache.stats() if ai_cache else None,
+        "fallback_coalescing": fallback_flight.stats(),
+        "uptime_seconds": round(service_metrics.uptime_seconds(), 3),
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+@app.get("/admin/snapshot")
+async def get_snapshot_status():
+    """Mapping snapshot entry counts, memory footprint and age"""
+    if not mapping_snapshot:
+        return {"enabled": False}
+    return mapping_snapshot.status()
+
+
+@app.post("/admin/backfill", status_code=status.HTTP_202_ACCEPTED)
+async def start_backfill(backfill_request: BackfillRequest, request: Request):
+    """Start a background job proposing rule_based mappings for unmapped internal codes"""
+    with backfill_lock:
+        if backfill_status.get("state") == "running":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"error": "Backfill already running", "request_id": request.state.request_id}
+            )
+        backfill_status.clear()
+        backfill_status.update({
+            "state": "running",
+            "request": backfill_request.dict(),
+            "started_at": datetime.utcnow().isoformat()
+        })
+
+    def job():
+        try:
+            matcher = rule_matcher.matcher() if rule_matcher else None
+            summary = run_backfill(
+                get_db_connection,
+                matcher=matcher,
+                progress=lambda s: backfill_status.update({"progress": s}),
+                **backfill_request.dict()
+            )
+            backfill_status.update({"state": "completed", "summary": summary})
+        except Exception as e:
+            print(f"Backfill error: {e}")
+            backfill_status.update({"state": "failed", "error": str(e)})
+        backfill_status["finished_at"] = datetime.utcnow().isoformat()
+
+    threading.Thread(target=job, name="mapping-backfill", daemon=True).start()
+    return dict(backfill_status)
+
+
+@app.get("/admin/backfill")
+async def get_backfill_status():
+    """State, progress and summary of the last backfill job"""
+    return dict(backfill_status)
+
+
+@app.post("/admin/import")
+async def import_facility_codes(
+    request: Request,
+    facility_id: int = Query(..., ge=1),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    auto_map: bool = True,
+    min_score: float = Query(0.5, ge=0, le=1),
+    activate: bool = False
+):
+    """
+    Stream a CSV or NDJSON body of internal codes into facility_internal_codes.
+    The body is read incrementally and loaded chunk by chunk (COPY into a
+    staging table, upsert, rule_based auto-mapping of unmapped rows), so the
+    upload size does not affect memory use. Progress: GET /admin/import.
+    """
+    request_id = request.state.request_id
+    with import_lock:
+        if import_status.get("state") == "running":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"error": "Import already running", "request_id": request_id}
+            )
+        import_status.clear()
+        import_status.update({
+            "state": "running",
+            "facility_id": facility_id,
+            "format": format,
+            "started_at": datetime.utcnow().isoformat()
+        })
+
+    loop = asyncio.get_running_loop()
+    body = request.stream()
+
+    def body_chunks():
+        # Pull the request body from the event loop one chunk at a time
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(body.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+
+    def job():
+        importer = FacilityCodeImporter(
+            get_db_connection,
+            facility_id,
+            matcher=rule_matcher.matcher() if (auto_map and rule_matcher) else None,
+            auto_map=auto_map,
+            min_score=min_score,
+            activate=activate,
+            chunk_size=IMPORT_CHUNK_SIZE,
+            progress=lambda s: import_status.update({"progress": s})
+        )
+        return importer.run(parse_records(iter_lines(body_chunks()), format))
+
+    try:
+        summary = await run_in_threadpool(job)
+    except Exception as e:
+        import_status.update({"state": "failed", "error": str(e), "finished_at": datetime.utcnow().isoformat()})
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "Import failed", "message": str(e), "request_id": request_id}
+        )
+    import_status.update({"state": "completed", "summary": summary, "finished_at": datetime.utcnow().isoformat()})
+    return {"request_id": request_id, **summary}
+
+
+@app.get("/admin/import")
+async def get_import_status():
+    """State and per-chunk progress of the last facility code import"""
+    return dict(import_status)
+
+
+@app.post("/match", response_model=MatchResponse)
+async def match_description(match_request: MatchRequest, request: Request):
+    """Top-k SBS candidates for a free-text description from the offline matcher"""
+    if not rule_matcher:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": "Description matcher disabled", "request_id": request.state.request_id}
+        )
+    try:
+        candidates = await run_in_threadpool(
+            rule_matcher.candidates, match_request.description, match_request.top_k
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Internal server error",
+                "message": str(e),
+                "request_id": request.state.request_id
+            }
+        )
+    return MatchResponse(
+        request_id=request.state.request_id,
+        candidates=[MatchCandidate(**c) for c in candidates]
+    )
+
+
 @app.post("/normalize", response_model=NormalizedResponse)
 async def normalize_code(claim_item: InternalClaimItem, request: Request):
     """
     Enhanced normalization endpoint with metrics and error handling
     """
     start_time = time.time()
-    metrics["requests_total"] += 1
     
     request_id = request.state.request_id
     
     try:
         # Step 1: Check local mapping database
-        result = lookup_local_mapping(claim_item.facility_id, claim_item.internal_code)
+        result = await lookup_local_mapping(claim_item.facility_id, claim_item.internal_code)
         
         if result:
-            metrics["requests_success"] += 1
-            metrics["cache_hits"] += 1
+            service_metrics.NORMALIZATIONS.labels(endpoint="normalize", outcome="success").inc()
             
             processing_time = (time.time() - start_time) * 1000
             
@@ -288,9 +416,27 @@ async def normalize_code(claim_item: InternalClaimItem, request: Request):
                 processing_time_ms=round(processing_time, 2)
             )
         
+        # Step 2: AI cache, then the configured suggestion provider
+        if ai_cache:
+            result = await resolve_fallback_coalesced(claim_item.description)
+            if result:
+                service_metrics.NORMALIZATIONS.labels(endpoint="normalize", outcome="success").inc()
+
+                processing_time = (time.time() - start_time) * 1000
+
+                return NormalizedResponse(
+                    sbs_mapped_code=result['sbs_code'],
+                    official_description=result['description_en'],
+                    confidence=result['confidence'],
+                    mapping_source=result['mapping_source'],
+                    description_en=result.get('description_en'),
+                    description_ar=result.get('description_ar'),
+                    request_id=request_id,
+                    processing_time_ms=round(processing_time, 2)
+                )
+
         # If not found, return appropriate error
-        metrics["cache_misses"] += 1
-        metrics["requests_failed"] += 1
+        service_metrics.NORMALIZATIONS.labels(endpoint="normalize", outcome="failed").inc()
         
         raise HTTPException(
             status_code=404,
@@ -304,7 +450,7 @@ async def normalize_code(claim_item: InternalClaimItem, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        metrics["requests_failed"] += 1
+        service_metrics.NORMALIZATIONS.labels(endpoint="normalize", outcome="failed").inc()
         raise HTTPException(
             status_code=500,
             detail={
@@ -315,49 +461,426 @@ async def normalize_code(claim_item: InternalClaimItem, request: Request):
         )
 
 
-def lookup_local_mapping(facility_id: int, internal_code: str) -> Optional[dict]:
+@app.post("/normalize/batch", response_model=BatchNormalizedResponse)
+async def normalize_batch(entries: List[Dict[str, Any]], request: Request):
     """
-    Optimized database lookup with connection pooling
+    Normalize all line items of a claim in one call.
+
+    Each entry is validated on its own, so a malformed item is reported as an
+    error without rejecting the rest. Cached items are answered from
+    mapping_cache; the rest are resolved with a single set-based query.
+    Results are returned in input order with a per-item status (mapped,
+    not_found, error).
+    """
+    start_time = time.time()
+    request_id = request.state.request_id
+
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"error": "Empty batch", "request_id": request_id}
+        )
+    if len(entries) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail={
+                "error": "Batch too large",
+                "message": f"At most {MAX_BATCH_ITEMS} items per batch",
+                "request_id": request_id
+            }
+        )
+
+    service_metrics.BATCH_ITEMS.observe(len(entries))
+
+    claim_items: List[Optional[InternalClaimItem]] = []
+    invalid: Dict[int, str] = {}
+    for index, entry in enumerate(entries):
+        try:
+            claim_items.append(InternalClaimItem(**entry))
+        except (ValidationError, TypeError) as e:
+            claim_items.append(None)
+            invalid[index] = f"Invalid claim item: {str(e)}"
+
+    keys = [(item.facility_id, item.internal_code) for item in claim_items if item]
+    mappings, lookup_error = await lookup_local_mappings(keys)
+
+    # Unmapped items go through the fallback tier once per distinct description
+    fallbacks: Dict[str, Optional[dict]] = {}
+    if ai_cache:
+        descriptions = list(dict.fromkeys(
+            item.description for item in claim_items
+            if item and mappings.get((item.facility_id, item.internal_code), MISSING) is None
+        ))
+        if descriptions:
+            resolved = await asyncio.gather(
+                *(resolve_fallback_coalesced(d) for d in descriptions)
+            )
+            fallbacks = dict(zip(descriptions, resolved))
+
+    results = []
+    for index, item in enumerate(claim_items):
+        if item is None:
+            entry = entries[index]
+            facility_id = entry.get("facility_id")
+            internal_code = entry.get("internal_code")
+            results.append(BatchItemResult(
+                index=index,
+                facility_id=facility_id if isinstance(facility_id, int) and not isinstance(facility_id, bool) else None,
+                internal_code=internal_code if isinstance(internal_code, str) else None,
+                status="error",
+                error=invalid[index]
+            ))
+            continue
+        facility_id, internal_code = item.facility_id, item.internal_code
+        key = (facility_id, internal_code)
+        mapping = mappings.get(key) or fallbacks.get(item.description)
+        if mapping:
+            results.append(BatchItemResult(
+                index=index,
+                facility_id=facility_id,
+                internal_code=internal_code,
+                status="mapped",
+                sbs_mapped_code=mapping['sbs_code'],
+                official_description=mapping['description_en'],
+                confidence=mapping['confidence'],
+                mapping_source=mapping['mapping_source'],
+                description_en=mapping.get('description_en'),
+                description_ar=mapping.get('description_ar')
+            ))
+        elif key in mappings:
+            results.append(BatchItemResult(
+                index=index,
+                facility_id=facility_id,
+                internal_code=internal_code,
+                status="not_found",
+                error=f"No mapping found for facility {facility_id}, code {internal_code}"
+            ))
+        else:
+            results.append(BatchItemResult(
+                index=index,
+                facility_id=facility_id,
+                internal_code=internal_code,
+                status="error",
+                error=lookup_error or "Lookup failed"
+            ))
+
+    mapped = sum(1 for r in results if r.status == "mapped")
+    not_found = sum(1 for r in results if r.status == "not_found")
+    service_metrics.NORMALIZATIONS.labels(endpoint="batch", outcome="success").inc(mapped)
+    service_metrics.NORMALIZATIONS.labels(endpoint="batch", outcome="failed").inc(len(results) - mapped)
+
+    return BatchNormalizedResponse(
+        request_id=request_id,
+        total=len(results),
+        mapped=mapped,
+        not_found=not_found,
+        errors=len(results) - mapped - not_found,
+        results=results,
+        processing_time_ms=round((time.time() - start_time) * 1000, 2)
+    )
+
+
+def resolve_fallback(description: str) -> Optional[dict]:
+    """
+    Fallback tier for codes without a local mapping.
+    Tries the offline description matcher first, then the AI cache (memory,
+    then ai_normalization_cache), and otherwise asks the suggestion provider.
+    When the provider is the local matcher, its answer is the matcher's best
+    candidate already scored for the first step, at the provider's threshold.
+    Suggestions must name an active catalogue code; cacheable ones are stored
+    for the next request.
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            query = """
-            SELECT 
-                snm.sbs_code,
-                snm.confidence,
-                snm.mapping_source,
-                smc.description_en,
-                smc.description_ar
-            FROM sbs_normalization_map snm
-            JOIN facility_internal_codes fic ON snm.internal_code_id = fic.internal_code_id
-            JOIN sbs_master_catalogue smc ON snm.sbs_code = smc.sbs_id
-            WHERE fic.facility_id = %s 
-              AND fic.internal_code = %s 
-              AND snm.is_active = TRUE
-              AND fic.is_active = TRUE
-            LIMIT 1
-            """
-            
-            cursor.execute(query, (facility_id, internal_code))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            
-            return dict(result) if result else None
-            
+        match = rule_matcher.best(description) if rule_matcher else None
+        if match and 0 < RULE_MATCH_MIN_SCORE <= match["confidence"]:
+            entry = catalogue_store.get(match["sbs_code"])
+            if entry:
+                service_metrics.FALLBACK_MAPPED.labels(source=rule_matcher.mapping_source).inc()
+                return {
+                    "sbs_code": match["sbs_code"],
+                    "confidence": match["confidence"],
+                    "mapping_source": rule_matcher.mapping_source,
+                    "description_en": entry["description_en"],
+                    "description_ar": entry["description_ar"]
+                }
+
+        if ai_cache:
+            cached = ai_cache.lookup(description)
+            service_metrics.record_cache_lookup("ai_cache", bool(cached))
+            if cached:
+                service_metrics.FALLBACK_MAPPED.labels(source="ai_cached").inc()
+                return {**cached, "mapping_source": "ai_cached"}
+
+        if not suggestion_provider:
+            return None
+
+        if suggestion_provider is rule_matcher:
+            suggestion = match if match and match["confidence"] >= rule_matcher.min_score else None
+        else:
+            if isinstance(suggestion_provider, GeminiSuggestionProvider):
+                service_metrics.AI_CALLS.inc()
+            suggestion = suggestion_provider.suggest(description)
+        entry = catalogue_store.get(suggestion["sbs_code"]) if suggestion else None
+        if not entry:
+            return None
+
+        if ai_cache and suggestion_provider.cacheable:
+            ai_cache.store(
+                description,
+                suggestion["sbs_code"],
+                suggestion["confidence"],
+                entry["description_en"],
+                entry["description_ar"]
+            )
+    except Exception as e:
+        print(f"Fallback lookup error: {e}")
+        return None
+
+    service_metrics.FALLBACK_MAPPED.labels(source=suggestion_provider.mapping_source).inc()
+    return {
+        "sbs_code": suggestion["sbs_code"],
+        "confidence": suggestion["confidence"],
+        "mapping_source": suggestion_provider.mapping_source,
+        "description_en": entry["description_en"],
+        "description_ar": entry["description_ar"]
+    }
+
+
+async def resolve_fallback_coalesced(description: str) -> Optional[dict]:
+    """resolve_fallback, coalesced per description hash across concurrent requests"""
+    return await fallback_flight.do(
+        generate_description_hash(description),
+        lambda: run_in_threadpool(resolve_fallback, description)
+    )
+
+
+def lookup_in_memory(facility_id: int, internal_code: str):
+    """
+    Answer a lookup from the snapshot or the LRU cache.
+    Returns the mapping, None for a known miss, or MISSING if the database
+    has to be asked.
+    """
+    if mapping_snapshot:
+        snapshot_result = mapping_snapshot.lookup(facility_id, internal_code)
+        service_metrics.record_cache_lookup("snapshot", snapshot_result is not MISSING)
+        if snapshot_result is not MISSING:
+            return snapshot_result
+    cached = mapping_cache.get(facility_id, internal_code)
+    service_metrics.record_cache_lookup("mapping_cache", cached is not MISSING)
+    return cached
+
+
+async def lookup_local_mapping(facility_id: int, internal_code: str) -> Optional[dict]:
+    """
+    Cached lookup of the local mapping.
+    Snapshotted facilities are answered from mapping_snapshot without a
+    database call. Other hits (and misses) are served from mapping_cache;
+    only cache misses go to the database. Database errors are not cached.
+    """
+    cached = lookup_in_memory(facility_id, internal_code)
+    if cached is not MISSING:
+        return cached
+
+    generation = mapping_cache.generation
+    try:
+        if async_repository:
+            result = await async_repository.fetch_mapping(facility_id, internal_code)
+        else:
+            result = await run_in_threadpool(fetch_local_mapping, facility_id, internal_code)
     except Exception as e:
         print(f"Database lookup error: {e}")
         return None
 
+    mapping_cache.put(facility_id, internal_code, result, generation)
+    return result
+
+
+async def lookup_local_mappings(
+    keys: List[Tuple[int, str]]
+) -> Tuple[Dict[Tuple[int, str], Optional[dict]], Optional[str]]:
+    """
+    Batch variant of lookup_local_mapping.
+    Returns a dict with an entry (mapping or None) for every resolved key and
+    the database error message, if any. Keys that could not be resolved
+    because of that error are absent from the dict.
+    """
+    results: Dict[Tuple[int, str], Optional[dict]] = {}
+    pending = []
+    for key in dict.fromkeys(keys):
+        cached = lookup_in_memory(*key)
+        if cached is MISSING:
+            pending.append(key)
+        else:
+            results[key] = cached
+
+    if pending:
+        generation = mapping_cache.generation
+        try:
+            if async_repository:
+                fetched = await async_repository.fetch_mappings(pending)
+            else:
+                fetched = await run_in_threadpool(fetch_local_mappings, pending)
+        except Exception as e:
+            print(f"Batch lookup error: {e}")
+            return results, str(e)
+        for key in pending:
+            results[key] = fetched.get(key)
+            mapping_cache.put(key[0], key[1], results[key], generation)
+
+    return results, None
+
+
+def fetch_local_mappings(keys: List[Tuple[int, str]]) -> Dict[Tuple[int, str], dict]:
+    """
+    Set-based lookup of many (facility_id, internal_code) pairs in one query
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        query = """
+        SELECT DISTINCT ON (q.facility_id, q.internal_code)
+            q.facility_id,
+            q.internal_code,
+            vam.sbs_code,
+            vam.confidence,
+            vam.mapping_source,
+            vam.sbs_description AS description_en,
+            vam.sbs_description_ar AS description_ar
+        FROM unnest(%s::int[], %s::text[]) AS q(facility_id, internal_code)
+        JOIN v_active_mappings vam
+          ON vam.facility_id = q.facility_id AND vam.internal_code = q.internal_code
+        ORDER BY q.facility_id, q.internal_code, vam.confidence DESC NULLS LAST
+        """
+
+        with service_metrics.DB_QUERY_LATENCY.labels(query="mappings_batch", driver="psycopg2").time():
+            cursor.execute(query, ([k[0] for k in keys], [k[1] for k in keys]))
+            rows = cursor.fetchall()
+
+        cursor.close()
+
+        mappings = {}
+        for row in rows:
+            key = (row.pop('facility_id'), row.pop('internal_code'))
+            mappings[key] = dict(row)
+        return mappings
+
+
+def fetch_local_mapping(facility_id: int, internal_code: str) -> Optional[dict]:
+    """
+    Optimized database lookup with connection pooling
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        # v_active_mappings: the same active filter as the mapping snapshot
+        query = """
+        SELECT
+            sbs_code,
+            confidence,
+            mapping_source,
+            sbs_description AS description_en,
+            sbs_description_ar AS description_ar
+        FROM v_active_mappings
+        WHERE facility_id = %s
+          AND internal_code = %s
+        ORDER BY confidence DESC NULLS LAST
+        LIMIT 1
+        """
+        
+        with service_metrics.DB_QUERY_LATENCY.labels(query="mapping", driver="psycopg2").time():
+            cursor.execute(query, (facility_id, internal_code))
+            result = cursor.fetchone()
+        
+        cursor.close()
+        
+        return dict(result) if result else None
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Open the async pool, start the snapshot loader, the fallback tier and the mapping invalidation listener"""
+    global mapping_listener, mapping_snapshot, async_repository
+    global catalogue_store, ai_cache, suggestion_provider, rule_matcher
+    if NORMALIZER_DB_DRIVER == "asyncpg":
+        repository = AsyncMappingRepository(
+            AsyncDatabasePool(
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                checkout_observer=service_metrics.POOL_CHECKOUT_WAIT.labels(driver="asyncpg").observe
+            ),
+            query_observer=lambda query, seconds: service_metrics.DB_QUERY_LATENCY.labels(
+                query=query, driver="asyncpg"
+            ).observe(seconds)
+        )
+        try:
+            await repository.start()
+            async_repository = repository
+            print("✓ asyncpg connection pool created")
+        except Exception as e:
+            print(f"✗ Failed to create asyncpg pool, using psycopg2: {e}")
+
+    targets = []
+    if MAPPING_CACHE_SIZE > 0:
+        targets.append(mapping_cache)
+    if MAPPING_SNAPSHOT_FACILITIES:
+        mapping_snapshot = MappingSnapshotStore(
+            connection_factory=get_db_connection,
+            facility_ids=None if MAPPING_SNAPSHOT_FACILITIES == "all" else {
+                int(fid) for fid in MAPPING_SNAPSHOT_FACILITIES.split(",") if fid.strip()
+            },
+            refresh_interval=MAPPING_SNAPSHOT_REFRESH_SECONDS
+        )
+        mapping_snapshot.start()
+        targets.append(mapping_snapshot)
+    if AI_FALLBACK_ENABLED:
+        catalogue_store = CatalogueStore(get_db_connection)
+        try:
+            suggestion_provider = build_suggestion_provider(catalogue_store)
+        except ValueError as e:
+            print(f"✗ Suggestion provider disabled: {e}")
+        ai_cache = AINormalizationCache(
+            get_db_connection,
+            max_entries=AI_CACHE_MEMORY_SIZE,
+            flush_interval=AI_HIT_FLUSH_SECONDS,
+            max_pending=AI_HIT_FLUSH_MAX_PENDING
+        )
+        ai_cache.start()
+        targets.extend([ai_cache, catalogue_store])
+        if isinstance(suggestion_provider, LocalSuggestionProvider):
+            rule_matcher = suggestion_provider
+        elif RULE_MATCH_MIN_SCORE > 0:
+            rule_matcher = LocalSuggestionProvider(catalogue_store, min_score=RULE_MATCH_MIN_SCORE)
+        if rule_matcher:
+            try:
+                # Build the n-gram index now rather than on the first miss
+                await run_in_threadpool(rule_matcher.matcher)
+                print(f"✓ Description matcher indexed {len(rule_matcher.matcher())} catalogue entries")
+            except Exception as e:
+                print(f"✗ Description matcher not indexed yet: {e}")
+        print(f"✓ Fallback tier: {suggestion_provider.name if suggestion_provider else 'cache only'}")
+    if targets:
+        mapping_listener = MappingInvalidationListener(
+            connect=db_pool.connect,
+            targets=targets
+        )
+        mapping_listener.start()
+
 
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     """Cleanup on shutdown"""
-    if db_pool:
-        db_pool.closeall()
-        print("✓ Database connection pool closed")
+    if async_repository:
+        await async_repository.close()
+    if mapping_listener:
+        mapping_listener.stop()
+    if mapping_snapshot:
+        mapping_snapshot.stop()
+    if ai_cache:
+        # Final flush of buffered hit counts happens before the pool closes
+        ai_cache.stop()
+        ai_cache.hit_buffer.join(timeout=5)
+    db_pool.close()
+    service_metrics.mark_process_dead()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+"""
+Mapping Backfill
+Proposes sbs_normalization_map rows for facility_internal_codes that have no
+active mapping, scoring their descriptions against the catalogue in bulk
+with DescriptionMatcher.top_k_batch.
+
+Proposals are written with mapping_source='rule_based' and the match score
+as confidence. By default they are inserted inactive, for review; pass
+--activate to make the best proposal of each code live (with --top-k > 1
+the others are still inserted inactive). Existing (internal_code_id, sbs_code) rows are
+never overwritten.
+
+Usage:
+    python mapping_backfill.py --facility-id 1 --min-score 0.5 --dry-run
+"""
+
+from typing import Callable, List, Optional, Tuple
+import argparse
+import json
+import time
+
+from psycopg2.extras import execute_values
+
+from sbs_common.db import DatabasePool
+from description_matcher import DescriptionMatcher
+from suggestion_providers import CATALOGUE_QUERY
+
+UNMAPPED_QUERY = """
+SELECT fic.internal_code_id, fic.local_description, fic.local_description_ar
+FROM facility_internal_codes fic
+WHERE fic.is_active = TRUE
+  AND (%(facility_id)s IS NULL OR fic.facility_id = %(facility_id)s)
+  AND NOT EXISTS (
+      SELECT 1 FROM sbs_normalization_map snm
+      WHERE snm.internal_code_id = fic.internal_code_id
+        AND snm.is_active = TRUE
+  )
+ORDER BY fic.internal_code_id
+"""
+
+INSERT_QUERY = """
+INSERT INTO sbs_normalization_map
+(internal_code_id, sbs_code, confidence, mapping_source, is_active)
+VALUES %s
+ON CONFLICT (internal_code_id, sbs_code) DO NOTHING
+RETURNING 1
+"""
+
+
+def env_connection_factory():
+    """Connection factory for the command-line jobs: a small DatabasePool on the shared DB_* settings"""
+    # run_backfill streams unmapped rows on one connection while writing proposals on another
+    return DatabasePool(min_size=1, max_size=2).connection
+
+
+def load_matcher(connection_factory) -> DescriptionMatcher:
+    with connection_factory() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CATALOGUE_QUERY)
+        columns = [desc[0] for desc in cursor.description]
+        entries = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.close()
+    return DescriptionMatcher(entries)
+
+
+def propose_mappings(matcher: DescriptionMatcher, rows: List[tuple], min_score: float = 0.5,
+                     top_k: int = 1, activate: bool = False) -> Tuple[List[tuple], int]:
+    """
+    Score (internal_code_id, local_description, local_description_ar) rows.
+    Returns the sbs_normalization_map rows to insert and the number of
+    internal codes with no candidate at or above min_score. With activate,
+    only the top candidate of each code is inserted active.
+    """
+    descriptions = [f"{row[1] or ''} {row[2] or ''}" for row in rows]
+    proposals, below_threshold = [], 0
+    for row, candidates in zip(rows, matcher.top_k_batch(descriptions, top_k)):
+        accepted = [(code, score) for code, score in candidates if score >= min_score]
+        if not accepted:
+            below_threshold += 1
+        # Only the best candidate goes live; the others stay inactive for review
+        proposals.extend(
+            (row[0], code, score, "rule_based", activate and rank == 0)
+            for rank, (code, score) in enumerate(accepted)
+        )
+    return proposals, below_threshold
+
+
+def write_proposals(cursor, proposals: List[tuple]) -> int:
+    """Insert proposals, skipping existing (internal_code_id, sbs_code) rows; returns the rows inserted"""
+    if not proposals:
+        return 0
+    # execute_values sends pages of 100 rows and rowcount only covers the last one, so count RETURNING rows
+    return len(execute_values(cursor, INSERT_QUERY, proposals, fetch=True))
+
+
+def run_backfill(connection_factory, matcher: Optional[DescriptionMatcher] = None,
+                 facility_id: Optional[int] = None, min_score: float = 0.5, top_k: int = 1,
+                 activate: bool = False, dry_run: bool = False, batch_size: int = 1000,
+                 progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Score all unmapped internal codes and insert proposals batch by batch.
+    Unmapped rows are streamed with a server-side cursor; proposals are
+    written on a second connection and committed per batch.
+    """
+    started = time.time()
+    matcher = matcher or load_matcher(connection_factory)
+    summary = {
+        "facility_id": facility_id,
+        "catalogue_entries": len(matcher),
+        "scanned": 0,
+        "proposed": 0,
+        "inserted": 0,
+        "below_threshold": 0,
+        "dry_run": dry_run,
+    }
+
+    with connection_factory() as read_conn, connection_factory() as write_conn:
+        cursor = read_conn.cursor(name="mapping_backfill_unmapped")
+        cursor.itersize = batch_size
+        cursor.execute(UNMAPPED_QUERY, {"facility_id": facility_id})
+        write_cursor = write_conn.cursor()
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            proposals, below_threshold = propose_mappings(matcher, rows, min_score, top_k, activate)
+
+            summary["scanned"] += len(rows)
+            summary["proposed"] += len(proposals)
+            summary["below_threshold"] += below_threshold
+            if proposals and not dry_run:
+                summary["inserted"] += write_proposals(write_cursor, proposals)
+                write_conn.commit()
+            if progress:
+                progress(dict(summary))
+
+        write_cursor.close()
+        cursor.close()
+        read_conn.commit()
+
+    summary["elapsed_seconds"] = round(time.time() - started, 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose rule_based mappings for unmapped internal codes")
+    parser.add_argument("--facility-id", type=int, default=None, help="Limit to one facility")
+    parser.add_argument("--min-score", type=float, default=0.5, help="Minimum match score (0-1)")
+    parser.add_argument("--top-k", type=int, default=1, help="Proposals per internal code")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--activate", action="store_true", help="Insert the best proposal of each code as an active mapping")
+    parser.add_argument("--dry-run", action="store_true", help="Score only, write nothing")
+    args = parser.parse_args()
+
+    summary = run_backfill(
+        env_connection_factory(),
+        facility_id=args.facility_id,
+        min_score=args.min_score,
+        top_k=args.top_k,
+        activate=args.activate,
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+        progress=lambda s: print(f"scanned={s['scanned']} proposed={s['proposed']} inserted={s['inserted']}")
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
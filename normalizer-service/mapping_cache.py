@@ -0,0 +1,204 @@
+"""
+In-Process Mapping Cache
+Bounded LRU cache in front of lookup_local_mapping, keyed by
+(facility_id, internal_code). Misses are cached too (negative caching) so
+unmapped codes do not hit Postgres on every request.
+
+Entries are dropped by MappingInvalidationListener as soon as Postgres
+sends a NOTIFY for the mapping tables (see database/schema.sql). The same
+listener also drives other in-process copies such as the mapping snapshot.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+import json
+
+from sbs_common.notify import NotificationListener
+
+# Sentinel returned by MappingCache.get when a key is not cached at all.
+# A cached miss is returned as None.
+MISSING = object()
+
+MAPPING_CHANNEL = "sbs_mapping_changed"
+
+
+class LRUCache:
+    """Minimal thread-safe LRU map"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, default: Any = MISSING) -> Any:
+        with self.lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MappingCache:
+    """Thread-safe LRU cache with negative caching and per-facility invalidation"""
+
+    def __init__(self, max_entries: int = 50000, cache_misses: bool = True):
+        self.max_entries = max_entries
+        self.cache_misses = cache_misses
+        self._entries: "OrderedDict[Tuple[int, str], Optional[dict]]" = OrderedDict()
+        self._by_facility: Dict[int, Set[str]] = {}
+        self._generation = 0
+        self.lock = Lock()
+        self.stats_counters = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "stale_puts_dropped": 0,
+        }
+
+    @property
+    def generation(self) -> int:
+        """
+        Invalidation generation. Read it before querying the database and pass
+        it to put() so a result fetched before an invalidation is not cached.
+        """
+        return self._generation
+
+    def get(self, facility_id: int, internal_code: str) -> Any:
+        """Return the cached mapping, None for a cached miss, or MISSING"""
+        key = (facility_id, internal_code)
+        with self.lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.stats_counters["misses"] += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            if value is None:
+                self.stats_counters["negative_hits"] += 1
+                return None
+            self.stats_counters["hits"] += 1
+            return dict(value)
+
+    def put(self, facility_id: int, internal_code: str, value: Optional[dict], generation: int) -> None:
+        """Store a lookup result unless the cache was invalidated since `generation`"""
+        if self.max_entries <= 0 or (value is None and not self.cache_misses):
+            return
+        key = (facility_id, internal_code)
+        with self.lock:
+            if generation != self._generation:
+                self.stats_counters["stale_puts_dropped"] += 1
+                return
+            self._entries[key] = dict(value) if value is not None else None
+            self._entries.move_to_end(key)
+            self._by_facility.setdefault(facility_id, set()).add(internal_code)
+            while len(self._entries) > self.max_entries:
+                (old_facility, old_code), _ = self._entries.popitem(last=False)
+                self._forget(old_facility, old_code)
+                self.stats_counters["evictions"] += 1
+
+    def invalidate_facility(self, facility_id: int) -> int:
+        """Drop every entry (positive and negative) for one facility"""
+        with self.lock:
+            self._generation += 1
+            self.stats_counters["invalidations"] += 1
+            codes = self._by_facility.pop(facility_id, set())
+            for code in codes:
+                self._entries.pop((facility_id, code), None)
+            return len(codes)
+
+    def invalidate_all(self) -> int:
+        """Drop every entry"""
+        with self.lock:
+            self._generation += 1
+            self.stats_counters["invalidations"] += 1
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._by_facility.clear()
+            return dropped
+
+    def _forget(self, facility_id: int, internal_code: str) -> None:
+        codes = self._by_facility.get(facility_id)
+        if codes is not None:
+            codes.discard(internal_code)
+            if not codes:
+                del self._by_facility[facility_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats_counters)
+            stats["size"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            return stats
+
+
+class MappingInvalidationListener(NotificationListener):
+    """
+    Background thread that LISTENs on the mapping channel and invalidates
+    every target (objects with invalidate_facility/invalidate_all, e.g.
+    MappingCache) on each NOTIFY.
+
+    Payload format (sent by notify_mapping_change() in schema.sql):
+        {"table": "<table name>", "facility_id": <int or null>}
+    A null facility_id (e.g. a catalogue edit) invalidates everything.
+
+    Targets are also fully invalidated on every (re)connect, since
+    notifications sent while we were disconnected are lost.
+    """
+
+    def __init__(self, connect, targets: List[Any], channel: str = MAPPING_CHANNEL,
+                 poll_interval: float = 5.0, retry_interval: float = 5.0):
+        super().__init__(
+            connect,
+            channel,
+            name="mapping-invalidation-listener",
+            poll_interval=poll_interval,
+            retry_interval=retry_interval
+        )
+        self.targets = targets
+
+    def on_connect(self) -> None:
+        self.invalidate_all()
+
+    def on_disconnect(self) -> None:
+        self.invalidate_all()
+
+    def invalidate_all(self) -> None:
+        for target in self.targets:
+            target.invalidate_all()
+
+    def handle_payload(self, payload: str) -> None:
+        """Apply a single NOTIFY payload to every target"""
+        try:
+            facility_id = json.loads(payload).get("facility_id") if payload else None
+        except (ValueError, AttributeError):
+            facility_id = None
+
+        if facility_id is None:
+            self.invalidate_all()
+        else:
+            for target in self.targets:
+                target.invalidate_facility(int(facility_id))
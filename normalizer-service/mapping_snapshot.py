@@ -0,0 +1,308 @@
+"""
+Mapping Snapshot
+Full-facility preload of active mappings (from v_active_mappings, which the
+database lookups read too) into a compact in-memory index, so hot-path lookups for snapshotted facilities are
+O(1) dict lookups with no database call.
+
+Layout:
+- records: one shared tuple of mapping records
+  (sbs_code, confidence, mapping_source, description_en, description_ar).
+  Identical records are stored once; most manual mappings of the same SBS
+  code collapse into a single slot.
+- facilities: one dict per facility, internal_code -> slot in records.
+
+Snapshots are immutable. Reloads build a new snapshot in the background and
+swap it in atomically; readers never take a lock.
+"""
+
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import sys
+import threading
+import time
+
+from mapping_cache import MISSING
+
+RECORD_FIELDS = ("sbs_code", "confidence", "mapping_source", "description_en", "description_ar")
+
+SNAPSHOT_QUERY = """
+SELECT
+    facility_id,
+    internal_code,
+    sbs_code,
+    confidence,
+    mapping_source,
+    sbs_description AS description_en,
+    sbs_description_ar AS description_ar
+FROM v_active_mappings
+WHERE (%(all_facilities)s OR facility_id = ANY(%(facility_ids)s))
+ORDER BY facility_id, internal_code, confidence DESC NULLS LAST
+"""
+
+
+class MappingSnapshot:
+    """Immutable facility -> internal_code -> record index"""
+
+    __slots__ = ("records", "facilities", "facility_loaded_at", "loaded_at", "memory_bytes")
+
+    def __init__(self, records: Tuple[tuple, ...] = (), facilities: Optional[Dict[int, Dict[str, int]]] = None,
+                 facility_loaded_at: Optional[Dict[int, float]] = None):
+        self.records = records
+        self.facilities = facilities or {}
+        self.facility_loaded_at = facility_loaded_at or {}
+        self.loaded_at = time.time()
+        self.memory_bytes: Optional[int] = None
+
+    def lookup(self, facility_id: int, internal_code: str) -> Any:
+        """
+        Return the mapping dict, None if the facility is snapshotted but has
+        no mapping for the code, or MISSING if the facility is not snapshotted.
+        """
+        codes = self.facilities.get(facility_id)
+        if codes is None:
+            return MISSING
+        slot = codes.get(internal_code)
+        if slot is None:
+            return None
+        return dict(zip(RECORD_FIELDS, self.records[slot]))
+
+    def without(self, facility_ids: Iterable[int]) -> "MappingSnapshot":
+        """Copy of this snapshot that no longer serves the given facilities"""
+        drop = set(facility_ids)
+        return MappingSnapshot(
+            self.records,
+            {fid: codes for fid, codes in self.facilities.items() if fid not in drop},
+            {fid: ts for fid, ts in self.facility_loaded_at.items() if fid not in drop}
+        )
+
+    def entry_count(self) -> int:
+        return sum(len(codes) for codes in self.facilities.values())
+
+    def memory_footprint(self) -> int:
+        """Approximate bytes held by this snapshot (computed once, on demand)"""
+        if self.memory_bytes is None:
+            self.memory_bytes = _deep_size(self)
+        return self.memory_bytes
+
+
+class SnapshotBuilder:
+    """Accumulates rows into a new MappingSnapshot, optionally extending a base snapshot"""
+
+    def __init__(self, base: Optional[MappingSnapshot] = None, replace: Iterable[int] = ()):
+        replace = set(replace)
+        self.records = list(base.records) if base else []
+        self.slots: Dict[tuple, int] = {record: slot for slot, record in enumerate(self.records)}
+        self.facilities: Dict[int, Dict[str, int]] = {}
+        self.facility_loaded_at: Dict[int, float] = {}
+        if base:
+            for fid, codes in base.facilities.items():
+                if fid not in replace:
+                    self.facilities[fid] = codes
+                    self.facility_loaded_at[fid] = base.facility_loaded_at.get(fid, base.loaded_at)
+
+    def start_facility(self, facility_id: int) -> None:
+        """Register a facility even if it ends up with no rows (so misses stay off the DB)"""
+        self.facilities.setdefault(facility_id, {})
+        self.facility_loaded_at[facility_id] = time.time()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        facility_id = row["facility_id"]
+        codes = self.facilities.get(facility_id)
+        if codes is None:
+            self.start_facility(facility_id)
+            codes = self.facilities[facility_id]
+
+        internal_code = sys.intern(row["internal_code"])
+        if internal_code in codes:
+            return  # rows are ordered by confidence, keep the best mapping
+
+        record = (
+            sys.intern(row["sbs_code"]),
+            float(row["confidence"]) if row["confidence"] is not None else None,
+            sys.intern(row["mapping_source"]) if row["mapping_source"] else row["mapping_source"],
+            row["description_en"],
+            row["description_ar"],
+        )
+        slot = self.slots.get(record)
+        if slot is None:
+            slot = len(self.records)
+            self.records.append(record)
+            self.slots[record] = slot
+        codes[internal_code] = slot
+
+    def build(self) -> MappingSnapshot:
+        return MappingSnapshot(tuple(self.records), self.facilities, self.facility_loaded_at)
+
+
+class MappingSnapshotStore(threading.Thread):
+    """
+    Holds the current snapshot and keeps it fresh in a background thread.
+
+    - facility_ids=None snapshots every facility, otherwise only the given ones
+    - invalidate_facility/invalidate_all (called by the NOTIFY listener) stop
+      serving the affected facilities immediately and queue a reload
+    - a full refresh runs every refresh_interval seconds as a safety net
+    """
+
+    def __init__(self, connection_factory, facility_ids: Optional[Set[int]] = None,
+                 refresh_interval: float = 300.0, fetch_size: int = 10000):
+        super().__init__(name="mapping-snapshot-loader", daemon=True)
+        self.connection_factory = connection_factory
+        self.facility_ids = facility_ids
+        self.refresh_interval = refresh_interval
+        self.fetch_size = fetch_size
+        self.current = MappingSnapshot()
+        self.lock = Lock()
+        self.last_error: Optional[str] = None
+        self.last_load_seconds: Optional[float] = None
+        self._generation = 0
+        self._pending: Set[int] = set()
+        self._pending_all = True
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+
+    def lookup(self, facility_id: int, internal_code: str) -> Any:
+        return self.current.lookup(facility_id, internal_code)
+
+    def serves(self, facility_id: int) -> bool:
+        return self.facility_ids is None or facility_id in self.facility_ids
+
+    def invalidate_facility(self, facility_id: int) -> None:
+        if not self.serves(facility_id):
+            return
+        with self.lock:
+            self._generation += 1
+            self.current = self.current.without([facility_id])
+            self._pending.add(facility_id)
+        self._wakeup.set()
+
+    def invalidate_all(self) -> None:
+        with self.lock:
+            self._generation += 1
+            self.current = MappingSnapshot()
+            self._pending_all = True
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            with self.lock:
+                reload_all, pending = self._pending_all, set(self._pending)
+            try:
+                if reload_all:
+                    self.reload(None)
+                elif pending:
+                    self.reload(pending)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Mapping snapshot reload error: {e}")
+                self._stop_event.wait(5.0)
+                continue
+
+            with self.lock:
+                idle = not self._pending_all and not self._pending
+            if idle:
+                if not self._wakeup.wait(self.refresh_interval):
+                    with self.lock:
+                        self._pending_all = True
+                self._wakeup.clear()
+
+    def reload(self, facility_ids: Optional[Set[int]]) -> bool:
+        """
+        Reload the given facilities (None = full reload) and swap the result in.
+        Returns False if an invalidation raced with the load; the work stays
+        queued and is retried.
+        """
+        started = time.time()
+        with self.lock:
+            generation = self._generation
+            base = None if facility_ids is None else self.current
+
+        if facility_ids is None:
+            targets = self.facility_ids
+        else:
+            targets = {fid for fid in facility_ids if self.serves(fid)}
+        builder = SnapshotBuilder(base, replace=facility_ids or ())
+        for fid in targets or ():
+            builder.start_facility(fid)
+
+        with self.connection_factory() as conn:
+            cursor = conn.cursor(name="mapping_snapshot")
+            cursor.itersize = self.fetch_size
+            cursor.execute(SNAPSHOT_QUERY, {
+                "all_facilities": targets is None,
+                "facility_ids": sorted(targets or ())
+            })
+            columns = None
+            for row in cursor:
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
+                builder.add(dict(zip(columns, row)))
+            cursor.close()
+            conn.commit()
+
+        snapshot = builder.build()
+        with self.lock:
+            if generation != self._generation:
+                return False
+            self.current = snapshot
+            if facility_ids is None:
+                self._pending_all = False
+                self._pending.clear()
+            else:
+                self._pending.difference_update(facility_ids)
+        self.last_error = None
+        self.last_load_seconds = round(time.time() - started, 3)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self.current
+        now = time.time()
+        with self.lock:
+            pending_all, pending = self._pending_all, sorted(self._pending)
+        return {
+            "enabled": True,
+            "scope": "all" if self.facility_ids is None else sorted(self.facility_ids),
+            "facilities": {
+                str(fid): {
+                    "entries": len(codes),
+                    "age_seconds": round(now - snapshot.facility_loaded_at.get(fid, snapshot.loaded_at), 1)
+                }
+                for fid, codes in snapshot.facilities.items()
+            },
+            "total_entries": snapshot.entry_count(),
+            "distinct_records": len(snapshot.records),
+            "memory_bytes": snapshot.memory_footprint(),
+            "snapshot_age_seconds": round(now - snapshot.loaded_at, 1),
+            "last_load_seconds": self.last_load_seconds,
+            "reload_pending": pending_all or bool(pending),
+            "pending_facilities": "all" if pending_all else pending,
+            "last_error": self.last_error,
+        }
+
+
+def _deep_size(snapshot: MappingSnapshot) -> int:
+    """Approximate memory footprint of a snapshot (shared objects counted once)"""
+    seen: Set[int] = set()
+    total = 0
+
+    def add(obj) -> None:
+        nonlocal total
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+
+    add(snapshot.records)
+    for record in snapshot.records:
+        add(record)
+        for value in record:
+            add(value)
+    add(snapshot.facilities)
+    for codes in snapshot.facilities.values():
+        add(codes)
+        for code in codes:
+            add(code)
+    return total
@@ -0,0 +1,51 @@
+"""
+Normalizer Metrics
+The shared sbs_common instruments (normalizer_*) plus the normalizer's own
+counters. Cache lookups are labelled snapshot, mapping_cache or ai_cache.
+"""
+
+from prometheus_client import Counter, Histogram
+
+from sbs_common.metrics import ServiceMetrics
+
+metrics = ServiceMetrics("normalizer")
+
+REQUEST_LATENCY = metrics.request_latency
+DB_QUERY_LATENCY = metrics.db_query_latency
+POOL_CHECKOUT_WAIT = metrics.pool_checkout_wait
+CACHE_LOOKUPS = metrics.cache_lookups
+RATE_LIMITED = metrics.rate_limited
+
+NORMALIZATIONS = Counter(
+    "normalizer_normalizations_total",
+    "Normalized items by outcome (success or failed)",
+    ["endpoint", "outcome"]
+)
+FALLBACK_MAPPED = Counter(
+    "normalizer_fallback_mapped_total",
+    "Unmapped codes resolved by the fallback tier, by mapping source",
+    ["source"]
+)
+AI_CALLS = Counter("normalizer_ai_calls_total", "Gemini suggestion provider calls")
+FALLBACK_CALLS = Counter("normalizer_fallback_calls_total", "Fallback lookups for unmapped codes")
+FALLBACK_COALESCED = Counter(
+    "normalizer_fallback_coalesced_total",
+    "Fallback lookups that joined an in-flight lookup for the same description"
+)
+BATCH_ITEMS = Histogram(
+    "normalizer_batch_items",
+    "Items per /normalize/batch request",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500)
+)
+
+record_cache_lookup = metrics.record_cache_lookup
+uptime_seconds = metrics.uptime_seconds
+render_latest = metrics.render_latest
+counter_values = metrics.counter_values
+mark_process_dead = metrics.mark_process_dead
+
+
+def record_fallback_call(coalesced: bool) -> None:
+    FALLBACK_CALLS.inc()
+    if coalesced:
+        FALLBACK_COALESCED.inc()
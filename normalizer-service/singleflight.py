@@ -0,0 +1,49 @@
+"""
+Single-Flight Request Coalescing
+Concurrent calls for the same key share one in-flight computation: the first
+caller starts it, everyone else awaits the same result (or exception).
+
+Used in front of the normalizer fallback tier so a burst of identical
+unmapped descriptions costs one AI cache lookup / provider call per process.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+
+
+class SingleFlight:
+    """Per-key coalescing of concurrent async computations"""
+
+    def __init__(self, observer: Optional[Callable[[bool], None]] = None):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats_counters = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+        # Optional metrics hook: called once per do() with whether the call was coalesced
+        self.observer = observer
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats_counters["calls"] += 1
+        task = self._inflight.get(key)
+        if self.observer:
+            self.observer(task is not None)
+        if task is not None:
+            self.stats_counters["coalesced"] += 1
+        else:
+            self.stats_counters["executions"] += 1
+            # Run as its own task so a cancelled caller does not cancel the others
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats_counters["errors"] += 1
+
+    def stats(self) -> dict:
+        stats = dict(self.stats_counters)
+        stats["in_flight"] = len(self._inflight)
+        calls = stats["calls"]
+        stats["coalesce_rate"] = round(stats["coalesced"] / calls, 4) if calls else 0.0
+        return stats
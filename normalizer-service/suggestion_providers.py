@@ -0,0 +1,203 @@
+"""
+Suggestion Providers
+Pluggable back ends for the AI fallback tier: given a free-text service
+description, suggest the best matching SBS code from the active catalogue.
+
+Providers:
+- GeminiSuggestionProvider: asks Gemini to pick a code (network, cached)
+- LocalSuggestionProvider: deterministic n-gram TF-IDF matching, works offline
+"""
+
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import Dict, List, Optional
+import os
+
+from description_matcher import DescriptionMatcher
+
+CATALOGUE_QUERY = """
+SELECT sbs_id, description_en, description_ar, category
+FROM sbs_master_catalogue
+WHERE is_active = TRUE
+ORDER BY sbs_id
+"""
+
+
+class CatalogueStore:
+    """
+    Lazily loaded copy of the active sbs_master_catalogue.
+    Registered with the mapping invalidation listener, so a catalogue edit
+    drops the copy and the next access reloads it.
+    """
+
+    def __init__(self, connection_factory):
+        self.connection_factory = connection_factory
+        self.version = 0
+        self._entries: Optional[Dict[str, dict]] = None
+        self.lock = Lock()
+
+    def entries(self) -> Dict[str, dict]:
+        entries = self._entries
+        if entries is not None:
+            return entries
+        with self.lock:
+            if self._entries is None:
+                with self.connection_factory() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(CATALOGUE_QUERY)
+                    columns = [desc[0] for desc in cursor.description]
+                    rows = cursor.fetchall()
+                    cursor.close()
+                self._entries = {row[0]: dict(zip(columns, row)) for row in rows}
+                self.version += 1
+            return self._entries
+
+    def get(self, sbs_id: str) -> Optional[dict]:
+        return self.entries().get(sbs_id)
+
+    def invalidate_all(self) -> None:
+        with self.lock:
+            self._entries = None
+
+    def invalidate_facility(self, facility_id: int) -> None:
+        """Facility-level mapping edits do not touch the catalogue"""
+
+
+class SuggestionProvider(ABC):
+    """
+    Interface for fallback suggestion back ends.
+
+    suggest() returns {"sbs_code": ..., "confidence": ...} or None. The code
+    must exist in the catalogue; callers re-check it anyway.
+    """
+
+    name = "none"
+    mapping_source = "ai"
+    # Whether results are worth persisting in ai_normalization_cache
+    cacheable = False
+
+    @abstractmethod
+    def suggest(self, description: str) -> Optional[dict]:
+        """Best catalogue match for a description, or None"""
+
+
+class GeminiSuggestionProvider(SuggestionProvider):
+    """Ask Gemini for the closest SBS code, using catalogue rows as context"""
+
+    name = "gemini"
+    mapping_source = "ai"
+    cacheable = True
+
+    def __init__(self, catalogue: CatalogueStore, api_key: str, model_name: str = "gemini-pro",
+                 context_limit: int = 100, confidence: float = 0.85):
+        self.catalogue = catalogue
+        self.api_key = api_key
+        self.model_name = model_name
+        self.context_limit = context_limit
+        self.confidence = confidence
+        self._model = None
+
+    def model(self):
+        if self._model is None:
+            # Imported lazily so offline deployments do not need the SDK configured
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def suggest(self, description: str) -> Optional[dict]:
+        entries = list(self.catalogue.entries().values())[:self.context_limit]
+        sbs_context = "\n".join([
+            f"- {entry['sbs_id']}: {entry['description_en']} ({entry['category']})"
+            for entry in entries
+        ])
+
+        prompt = f"""
+You are a medical billing expert. Given the following service description from a hospital:
+
+"{description}"
+
+And the available SBS codes:
+{sbs_context}
+
+Return ONLY the most appropriate SBS code ID (e.g., SBS-LAB-001) that matches this service.
+If no exact match exists, return the closest match.
+Return ONLY the code ID, nothing else.
+"""
+
+        response = self.model().generate_content(prompt)
+        suggested_code = response.text.strip()
+        if not self.catalogue.get(suggested_code):
+            return None
+        return {"sbs_code": suggested_code, "confidence": self.confidence}
+
+
+class LocalSuggestionProvider(SuggestionProvider):
+    """
+    Deterministic offline provider backed by DescriptionMatcher (character
+    n-gram TF-IDF over English and Arabic descriptions). The index is rebuilt
+    whenever the catalogue copy is reloaded.
+    """
+
+    name = "local"
+    mapping_source = "rule_based"
+    cacheable = False
+
+    def __init__(self, catalogue: CatalogueStore, min_score: float = 0.3):
+        self.catalogue = catalogue
+        self.min_score = min_score
+        self._matcher_version = None
+        self._matcher: Optional[DescriptionMatcher] = None
+        self.lock = Lock()
+
+    def matcher(self) -> DescriptionMatcher:
+        entries = self.catalogue.entries()
+        with self.lock:
+            if self._matcher_version != self.catalogue.version:
+                self._matcher = DescriptionMatcher(entries.values())
+                self._matcher_version = self.catalogue.version
+            return self._matcher
+
+    def candidates(self, description: str, k: int = 5) -> List[dict]:
+        return [
+            {"sbs_code": code, "score": score}
+            for code, score in self.matcher().top_k(description, k)
+        ]
+
+    def best(self, description: str) -> Optional[dict]:
+        """Highest-scoring code regardless of min_score, or None without any overlap"""
+        best = self.matcher().top_k(description, 1)
+        if not best:
+            return None
+        return {"sbs_code": best[0][0], "confidence": best[0][1]}
+
+    def suggest(self, description: str) -> Optional[dict]:
+        best = self.best(description)
+        if not best or best["confidence"] < self.min_score:
+            return None
+        return best
+
+
+def build_suggestion_provider(catalogue: CatalogueStore, name: Optional[str] = None) -> Optional[SuggestionProvider]:
+    """
+    Create the provider selected by AI_SUGGESTION_PROVIDER (gemini, local, none).
+    Defaults to gemini when GEMINI_API_KEY is set, local otherwise.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    name = (name or os.getenv("AI_SUGGESTION_PROVIDER") or ("gemini" if api_key else "local")).lower()
+
+    if name == "gemini":
+        if not api_key:
+            raise ValueError("AI_SUGGESTION_PROVIDER=gemini requires GEMINI_API_KEY")
+        return GeminiSuggestionProvider(
+            catalogue,
+            api_key=api_key,
+            model_name=os.getenv("GEMINI_MODEL", "gemini-pro"),
+            context_limit=int(os.getenv("AI_CATALOGUE_CONTEXT_LIMIT", "100"))
+        )
+    if name == "local":
+        return LocalSuggestionProvider(catalogue, min_score=float(os.getenv("LOCAL_SUGGESTION_MIN_SCORE", "0.3")))
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown AI_SUGGESTION_PROVIDER: {name}")
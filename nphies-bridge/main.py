@@ -4,23 +4,21 @@ Manages all API communications with NPHIES platform
 Port: 8003
 """
 
-from fastapi import FastAPI, HTTPException, status, BackgroundTasks, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, status, BackgroundTasks
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
 import httpx
 import json
 import os
 from dotenv import load_dotenv
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from sbs_common.db import DatabasePool
+from sbs_common.metrics import ServiceMetrics
+from sbs_common.middleware import RateLimiter, install_middleware
 from datetime import datetime
 import asyncio
 import uuid
-from collections import deque
-from threading import Lock
-import time
 
 load_dotenv()
 
@@ -30,51 +28,17 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware - Restrict to allowed origins
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-Request-ID"],
-)
+service_metrics = ServiceMetrics("nphies_bridge")
 
-# Rate limiter implementation
-class RateLimiter:
-    """Token bucket rate limiter"""
-    def __init__(self, max_requests: int = 100, time_window: int = 60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = {}
-        self.lock = Lock()
-
-    def is_allowed(self, identifier: str) -> bool:
-        with self.lock:
-            now = time.time()
-            if identifier not in self.requests:
-                self.requests[identifier] = deque()
-            while self.requests[identifier] and self.requests[identifier][0] < now - self.time_window:
-                self.requests[identifier].popleft()
-            if len(self.requests[identifier]) < self.max_requests:
-                self.requests[identifier].append(now)
-                return True
-            return False
-
-rate_limiter = RateLimiter(max_requests=100, time_window=60)
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting middleware"""
-    if request.url.path in ["/health", "/"]:
-        return await call_next(request)
-    client_ip = request.client.host if request.client else "unknown"
-    if not rate_limiter.is_allowed(client_ip):
-        return JSONResponse(
-            status_code=429,
-            content={"error": "Rate limit exceeded", "retry_after_seconds": 60}
-        )
-    return await call_next(request)
+# Shared middleware: CORS, request IDs + latency metrics, rate limiting (100 requests per minute per IP)
+install_middleware(app, service_metrics, rate_limiter=RateLimiter(max_requests=100, time_window=60))
+
+# Database connection pool
+db_pool = DatabasePool(
+    checkout_observer=service_metrics.pool_checkout_wait.labels(driver="psycopg2").observe
+)
+db_pool.open()
+get_db_connection = db_pool.connection
 
 # NPHIES API Configuration
 NPHIES_BASE_URL = os.getenv("NPHIES_BASE_URL", "https://nphies.sa/api/v1")
@@ -82,16 +46,6 @@ NPHIES_TIMEOUT = int(os.getenv("NPHIES_TIMEOUT", "30"))
 MAX_RETRIES = int(os.getenv("NPHIES_MAX_RETRIES", "3"))
 
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        database=os.getenv("DB_NAME", "sbs_integration"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT", "5432")
-    )
-
-
 class ClaimSubmission(BaseModel):
     facility_id: int = Field(..., description="Facility identifier")
     fhir_payload: Dict[str, Any] = Field(..., description="FHIR Claim payload")
@@ -123,45 +77,44 @@ def log_transaction(
     Returns transaction UUID
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        txn_uuid = str(uuid.uuid4())
-        txn_status = "submitted" if http_status and http_status < 400 else "error"
+            txn_uuid = str(uuid.uuid4())
+            txn_status = "submitted" if http_status and http_status < 400 else "error"
         
-        if http_status and http_status >= 200 and http_status < 300:
-            txn_status = "accepted"
-        elif http_status and http_status >= 400:
-            txn_status = "rejected"
+            if http_status and http_status >= 200 and http_status < 300:
+                txn_status = "accepted"
+            elif http_status and http_status >= 400:
+                txn_status = "rejected"
         
-        cursor.execute("""
-            INSERT INTO nphies_transactions 
-            (facility_id, transaction_uuid, request_type, fhir_payload, signature,
-             nphies_transaction_id, http_status_code, response_payload, status, 
-             error_message, submission_timestamp, response_timestamp)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING transaction_id
-        """, (
-            facility_id,
-            txn_uuid,
-            request_type,
-            json.dumps(fhir_payload),
-            signature,
-            nphies_txn_id,
-            http_status,
-            json.dumps(response_data) if response_data else None,
-            txn_status,
-            error_msg,
-            datetime.utcnow(),
-            datetime.utcnow() if response_data else None
-        ))
+            cursor.execute("""
+                INSERT INTO nphies_transactions 
+                (facility_id, transaction_uuid, request_type, fhir_payload, signature,
+                 nphies_transaction_id, http_status_code, response_payload, status, 
+                 error_message, submission_timestamp, response_timestamp)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING transaction_id
+            """, (
+                facility_id,
+                txn_uuid,
+                request_type,
+                json.dumps(fhir_payload),
+                signature,
+                nphies_txn_id,
+                http_status,
+                json.dumps(response_data) if response_data else None,
+                txn_status,
+                error_msg,
+                datetime.utcnow(),
+                datetime.utcnow() if response_data else None
+            ))
         
-        result = cursor.fetchone()
-        transaction_id = result['transaction_id']
+            result = cursor.fetchone()
+            transaction_id = result['transaction_id']
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+            conn.commit()
+            cursor.close()
         
         return txn_uuid
         
@@ -239,8 +192,10 @@ def root():
 def health_check():
     """Health check endpoint"""
     try:
-        conn = get_db_connection()
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
         return {
             "status": "healthy",
             "database": "connected",
@@ -357,28 +312,27 @@ def get_transaction_status(transaction_uuid: str):
     Retrieve transaction status and details
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
-            SELECT 
-                transaction_id,
-                transaction_uuid,
-                request_type,
-                nphies_transaction_id,
-                http_status_code,
-                status,
-                error_message,
-                submission_timestamp,
-                response_timestamp
-            FROM nphies_transactions
-            WHERE transaction_uuid = %s
-        """, (transaction_uuid,))
+            cursor.execute("""
+                SELECT 
+                    transaction_id,
+                    transaction_uuid,
+                    request_type,
+                    nphies_transaction_id,
+                    http_status_code,
+                    status,
+                    error_message,
+                    submission_timestamp,
+                    response_timestamp
+                FROM nphies_transactions
+                WHERE transaction_uuid = %s
+            """, (transaction_uuid,))
         
-        result = cursor.fetchone()
+            result = cursor.fetchone()
         
-        cursor.close()
-        conn.close()
+            cursor.close()
         
         if not result:
             raise HTTPException(
@@ -403,27 +357,26 @@ def get_facility_transactions(facility_id: int, limit: int = 50):
     Get recent transactions for a facility
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
-            SELECT 
-                transaction_uuid,
-                request_type,
-                status,
-                nphies_transaction_id,
-                http_status_code,
-                submission_timestamp
-            FROM nphies_transactions
-            WHERE facility_id = %s
-            ORDER BY submission_timestamp DESC
-            LIMIT %s
-        """, (facility_id, limit))
+            cursor.execute("""
+                SELECT 
+                    transaction_uuid,
+                    request_type,
+                    status,
+                    nphies_transaction_id,
+                    http_status_code,
+                    submission_timestamp
+                FROM nphies_transactions
+                WHERE facility_id = %s
+                ORDER BY submission_timestamp DESC
+                LIMIT %s
+            """, (facility_id, limit))
         
-        results = cursor.fetchall()
+            results = cursor.fetchall()
         
-        cursor.close()
-        conn.close()
+            cursor.close()
         
         return [dict(row) for row in results]
         
@@ -434,6 +387,20 @@ def get_facility_transactions(facility_id: int, limit: int = 50):
         )
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition"""
+    body, content_type = service_metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Cleanup on shutdown"""
+    db_pool.close()
+    service_metrics.mark_process_dead()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
@@ -0,0 +1,26 @@
+"""
+SBS Common
+Infrastructure shared by the Python services: pooled Postgres access (sync
+and async), the HTTP middleware stack (CORS, request IDs, rate limiting,
+latency metrics), Prometheus instruments and the LISTEN/NOTIFY thread.
+
+The package lives at the repository root; services import it with the root
+on PYTHONPATH (the Dockerfiles copy it next to each service's main.py).
+"""
+
+from sbs_common.db import AsyncDatabasePool, DatabasePool, db_params_from_env
+from sbs_common.metrics import CacheHitRatioCollector, ServiceMetrics
+from sbs_common.middleware import RateLimiter, allowed_origins_from_env, install_middleware
+from sbs_common.notify import NotificationListener
+
+__all__ = [
+    "AsyncDatabasePool",
+    "CacheHitRatioCollector",
+    "DatabasePool",
+    "NotificationListener",
+    "RateLimiter",
+    "ServiceMetrics",
+    "allowed_origins_from_env",
+    "db_params_from_env",
+    "install_middleware",
+]
@@ -0,0 +1,220 @@
+"""
+Pooled Postgres Access
+One psycopg2 ThreadedConnectionPool per process for blocking handlers and
+threadpool work, and an asyncpg pool for services that query from the event
+loop. Connection settings come from the DB_* environment variables shared
+by every service.
+"""
+
+from contextlib import asynccontextmanager, contextmanager
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Dict, Optional
+import os
+import time
+
+import psycopg2
+from psycopg2 import pool
+
+
+def db_params_from_env() -> Dict[str, Any]:
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "database": os.getenv("DB_NAME", "sbs_integration"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD"),
+        "port": os.getenv("DB_PORT", "5432")
+    }
+
+
+class PoolTimeout(pool.PoolError):
+    """No connection became free within the checkout timeout"""
+
+
+class DatabasePool:
+    """
+    psycopg2 connection pool with a connection() context manager.
+
+    The pool is created on first use (or by open()), so a database that is
+    down at import time does not leave the service on unpooled connections
+    for good. Connections are always returned to the pool; psycopg2 rolls
+    back any open transaction on return and drops closed connections.
+
+    When all max_size connections are in use, callers wait up to
+    checkout_timeout seconds instead of failing at once. A connection that
+    sat idle for health_check_idle seconds or more is pinged before it is
+    handed out; dead ones (server restart, idle timeout) are discarded and
+    replaced transparently.
+    """
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None,
+                 min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 checkout_observer: Optional[Callable[[float], None]] = None,
+                 checkout_timeout: Optional[float] = None,
+                 health_check_idle: Optional[float] = None):
+        self.params = params if params is not None else db_params_from_env()
+        self.min_size = min_size if min_size is not None else int(os.getenv("DB_POOL_MIN", "1"))
+        self.max_size = max_size if max_size is not None else int(os.getenv("DB_POOL_MAX", "20"))
+        self.checkout_timeout = (checkout_timeout if checkout_timeout is not None
+                                 else float(os.getenv("DB_POOL_TIMEOUT", "10")))
+        self.health_check_idle = (health_check_idle if health_check_idle is not None
+                                  else float(os.getenv("DB_POOL_HEALTH_CHECK_IDLE", "30")))
+        # Optional latency hook: seconds spent obtaining a connection
+        self.checkout_observer = checkout_observer
+        self.pool: Optional[pool.ThreadedConnectionPool] = None
+        self.lock = Lock()
+        self._slots = BoundedSemaphore(self.max_size)
+        self._idle_since: Dict[int, float] = {}
+        self.counters = {"checkouts": 0, "checkout_timeouts": 0, "health_checks": 0, "discarded": 0}
+        self._counters_lock = Lock()
+
+    def _count(self, name: str) -> None:
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def open(self) -> bool:
+        """Create the pool now; returns False (and retries on first use) if Postgres is unreachable"""
+        try:
+            self._get_pool()
+            print("✓ Database connection pool created")
+            return True
+        except Exception as e:
+            print(f"✗ Failed to create connection pool: {e}")
+            return False
+
+    def _get_pool(self) -> pool.ThreadedConnectionPool:
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = pool.ThreadedConnectionPool(
+                        minconn=self.min_size,
+                        maxconn=self.max_size,
+                        **self.params
+                    )
+        return self.pool
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block"""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            self._count("checkout_timeouts")
+            raise PoolTimeout(f"No database connection free after {self.checkout_timeout}s")
+        try:
+            db_pool = self._get_pool()
+            conn = self._checkout(db_pool)
+        except Exception:
+            self._slots.release()
+            raise
+        self._count("checkouts")
+        if self.checkout_observer:
+            self.checkout_observer(time.perf_counter() - started)
+        try:
+            yield conn
+        except Exception as e:
+            print(f"Database connection error: {e}")
+            raise
+        finally:
+            if not conn.closed:
+                self._idle_since[id(conn)] = time.monotonic()
+            db_pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def _checkout(self, db_pool: pool.ThreadedConnectionPool):
+        # Bounded: every discarded connection is replaced by a fresh one
+        for _ in range(self.max_size + 1):
+            conn = db_pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._count("discarded")
+            db_pool.putconn(conn, close=True)
+        raise pool.PoolError("No healthy database connection available")
+
+    def _is_healthy(self, conn) -> bool:
+        idle_since = self._idle_since.pop(id(conn), None)
+        if conn.closed:
+            return False
+        if idle_since is None or time.monotonic() - idle_since < self.health_check_idle:
+            return True
+        self._count("health_checks")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def connect(self):
+        """A dedicated, unpooled connection (e.g. for LISTEN)"""
+        return psycopg2.connect(**self.params)
+
+    def close(self) -> None:
+        with self.lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+                self._idle_since.clear()
+                print("✓ Database connection pool closed")
+
+    def stats(self) -> Dict[str, Any]:
+        db_pool = self.pool
+        stats = {"open": False, "min_size": self.min_size, "max_size": self.max_size}
+        if db_pool is not None:
+            stats.update({
+                "open": not db_pool.closed,
+                "in_use": len(db_pool._used),
+                "idle": len(db_pool._pool),
+            })
+        with self._counters_lock:
+            stats.update(self.counters)
+        return stats
+
+
+class AsyncDatabasePool:
+    """asyncpg pool with the same settings and checkout hook as DatabasePool"""
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None,
+                 min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 statement_cache_size: int = 100,
+                 checkout_observer: Optional[Callable[[float], None]] = None):
+        params = params if params is not None else db_params_from_env()
+        self.connect_kwargs = dict(params, port=int(params["port"]))
+        self.min_size = min_size if min_size is not None else int(os.getenv("DB_POOL_MIN", "1"))
+        self.max_size = max_size if max_size is not None else int(os.getenv("DB_POOL_MAX", "20"))
+        self.statement_cache_size = statement_cache_size
+        self.checkout_observer = checkout_observer
+        self.pool = None
+
+    async def start(self) -> None:
+        # Imported lazily so psycopg2-only services do not need asyncpg
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+            **self.connect_kwargs
+        )
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            if self.checkout_observer:
+                self.checkout_observer(time.perf_counter() - started)
+            yield conn
+
+    def stats(self) -> Dict[str, int]:
+        if self.pool is None:
+            return {"size": 0, "idle": 0, "max_size": self.max_size}
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "max_size": self.max_size,
+        }
@@ -0,0 +1,143 @@
+"""
+Service Metrics
+Prometheus instruments every service exposes, named <service>_*, plus the
+/metrics exposition.
+
+Counters and histograms are thread-safe, so request handlers, threadpool
+workers and background threads can all record into them. With several
+uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty, writable
+directory (wiped before each start): every worker then writes its samples
+to files there and /metrics aggregates them, whichever worker serves the
+scrape.
+
+Cache hit ratios are derived from <service>_cache_lookups_total at scrape
+time, so they are also correct across workers.
+"""
+
+from typing import Dict, Iterable, Tuple
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Read by prometheus_client itself when it is first imported
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+PROCESS_START_TIME = time.time()
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class CacheHitRatioCollector:
+    """Derives <service>_cache_hit_ratio{cache} from the lookup counter samples of a source collector"""
+
+    def __init__(self, source, service: str):
+        self.source = source
+        self.service = service
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        totals: Dict[str, Tuple[float, float]] = {}
+        for family in self.source.collect():
+            if family.name != f"{self.service}_cache_lookups":
+                continue
+            for sample in family.samples:
+                if not sample.name.endswith("_total"):
+                    continue
+                hits, lookups = totals.get(sample.labels["cache"], (0.0, 0.0))
+                if sample.labels["result"] == "hit":
+                    hits += sample.value
+                totals[sample.labels["cache"]] = (hits, lookups + sample.value)
+
+        ratio = GaugeMetricFamily(
+            f"{self.service}_cache_hit_ratio",
+            "Cache hits / lookups since start",
+            labels=["cache"]
+        )
+        for cache, (hits, lookups) in sorted(totals.items()):
+            if lookups:
+                ratio.add_metric([cache], hits / lookups)
+        yield ratio
+
+
+class ServiceMetrics:
+    """The common instruments of one service; create once per process"""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.request_latency = Histogram(
+            f"{service}_http_request_duration_seconds",
+            "HTTP request latency by route template",
+            ["method", "route", "status"],
+            buckets=LATENCY_BUCKETS
+        )
+        self.db_query_latency = Histogram(
+            f"{service}_db_query_duration_seconds",
+            "Database query latency (checkout excluded)",
+            ["query", "driver"],
+            buckets=LATENCY_BUCKETS
+        )
+        self.pool_checkout_wait = Histogram(
+            f"{service}_db_pool_checkout_seconds",
+            "Time spent obtaining a pooled database connection",
+            ["driver"],
+            buckets=LATENCY_BUCKETS
+        )
+        self.cache_lookups = Counter(
+            f"{service}_cache_lookups_total",
+            "In-memory and database cache lookups by result (hit or miss)",
+            ["cache", "result"]
+        )
+        self.rate_limited = Counter(
+            f"{service}_rate_limited_total",
+            "Requests rejected by the rate limiter"
+        )
+
+        if MULTIPROCESS_DIR:
+            # Only the per-worker files are exposed; collectors registered on
+            # the default registry would report a single worker's state
+            self.registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(self.registry)
+            self.registry.register(CacheHitRatioCollector(multiprocess.MultiProcessCollector(None), service))
+            self._counter_source = multiprocess.MultiProcessCollector(None)
+        else:
+            self.registry = REGISTRY
+            REGISTRY.register(CacheHitRatioCollector(self.cache_lookups, service))
+            self._counter_source = REGISTRY
+
+    def record_cache_lookup(self, cache: str, hit: bool) -> None:
+        self.cache_lookups.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+    def uptime_seconds(self) -> float:
+        return time.time() - PROCESS_START_TIME
+
+    def render_latest(self) -> Tuple[bytes, str]:
+        """Text exposition body and content type for /metrics"""
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+    def counter_values(self) -> Dict[str, float]:
+        """Current counter values of this service (all workers), keyed like exposition samples"""
+        values: Dict[str, float] = {}
+        for family in self._counter_source.collect():
+            if family.type != "counter" or not family.name.startswith(f"{self.service}_"):
+                continue
+            for sample in family.samples:
+                if sample.name.endswith("_total"):
+                    labels = ",".join(f'{k}="{v}"' for k, v in sorted(sample.labels.items()))
+                    values[f"{sample.name}{{{labels}}}" if labels else sample.name] = sample.value
+        return values
+
+    def mark_process_dead(self) -> None:
+        """Remove this worker's live-gauge files on shutdown (multiprocess mode only)"""
+        if MULTIPROCESS_DIR:
+            multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,131 @@
+"""
+HTTP Middleware Stack
+CORS, request IDs, per-route latency metrics and per-client rate limiting,
+installed the same way in every service.
+
+Order, outermost first: CORS -> request ID + latency -> rate limit, so 429
+responses still carry CORS headers and an X-Request-ID and are counted in
+the latency histogram.
+"""
+
+from collections import deque
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from sbs_common.metrics import ServiceMetrics
+
+DEFAULT_ALLOWED_ORIGINS = "http://localhost:3000,http://localhost:3001"
+# Paths a service never rate limits unless it passes its own exempt_paths
+RATE_LIMIT_EXEMPT_PATHS = ("/", "/health")
+
+
+class RateLimiter:
+    """Sliding-window rate limiter: at most max_requests per time_window seconds per identifier"""
+
+    def __init__(self, max_requests: int = 100, time_window: int = 60, sweep_interval: float = 300.0):
+        self.max_requests = max_requests
+        self.time_window = time_window
+        self.sweep_interval = sweep_interval
+        self.requests: Dict[str, deque] = {}
+        self.lock = Lock()
+        self._last_sweep = time.time()
+
+    def is_allowed(self, identifier: str) -> bool:
+        """Check if request is allowed for given identifier"""
+        with self.lock:
+            now = time.time()
+            window_start = now - self.time_window
+            if now - self._last_sweep > self.sweep_interval:
+                self._sweep(window_start)
+                self._last_sweep = now
+
+            timestamps = self.requests.get(identifier)
+            if timestamps is None:
+                timestamps = self.requests[identifier] = deque()
+            while timestamps and timestamps[0] < window_start:
+                timestamps.popleft()
+
+            if len(timestamps) < self.max_requests:
+                timestamps.append(now)
+                return True
+            return False
+
+    def _sweep(self, window_start: float) -> None:
+        # Forget clients with no requests in the current window
+        for identifier in [i for i, t in self.requests.items() if not t or t[-1] < window_start]:
+            del self.requests[identifier]
+
+
+def allowed_origins_from_env() -> List[str]:
+    return os.getenv("ALLOWED_ORIGINS", DEFAULT_ALLOWED_ORIGINS).split(",")
+
+
+def install_middleware(app: FastAPI, metrics: ServiceMetrics,
+                       rate_limiter: Optional[RateLimiter] = None,
+                       allowed_origins: Optional[List[str]] = None,
+                       exempt_paths: Iterable[str] = RATE_LIMIT_EXEMPT_PATHS) -> None:
+    """Add the common middleware stack to a service's app; requests to exempt_paths are not rate limited"""
+    rate_limiter = rate_limiter or RateLimiter()
+    exempt_paths = frozenset(exempt_paths)
+
+    @app.middleware("http")
+    async def rate_limit_middleware(request: Request, call_next):
+        """Rate limiting middleware"""
+        if request.url.path in exempt_paths:
+            return await call_next(request)
+
+        # Get client identifier (IP address)
+        client_ip = request.client.host if request.client else "unknown"
+
+        if not rate_limiter.is_allowed(client_ip):
+            metrics.rate_limited.inc()
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "error": "Rate limit exceeded",
+                    "message": "Too many requests. Please try again later.",
+                    "retry_after_seconds": rate_limiter.time_window
+                }
+            )
+
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def add_request_id(request: Request, call_next):
+        """Add request ID to all requests and record their latency"""
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        request.state.start_time = time.time()
+        started = time.perf_counter()
+
+        response = await call_next(request)
+
+        elapsed = time.perf_counter() - started
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Processing-Time-MS"] = f"{elapsed * 1000:.2f}"
+
+        # Label by route template so path parameters do not explode cardinality
+        route = request.scope.get("route")
+        metrics.request_latency.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=str(response.status_code)
+        ).observe(elapsed)
+
+        return response
+
+    # CORS middleware - Restrict to allowed origins
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins if allowed_origins is not None else allowed_origins_from_env(),
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "OPTIONS"],
+        allow_headers=["Content-Type", "Authorization", "X-Request-ID"],
+    )
@@ -0,0 +1,75 @@
+"""
+LISTEN/NOTIFY Listener
+Background thread that keeps a dedicated connection LISTENing on one
+channel and hands every payload to handle_payload(). Subclasses decide what
+a notification means (invalidate a cache, reload a snapshot, ...).
+"""
+
+from abc import ABC, abstractmethod
+import select
+import threading
+
+
+class NotificationListener(threading.Thread, ABC):
+    """
+    Reconnects after errors. on_connect() runs after every successful LISTEN
+    and on_disconnect() after every failure, since notifications sent while
+    disconnected are lost; both default to doing nothing.
+    """
+
+    def __init__(self, connect, channel: str, name: str = "notify-listener",
+                 poll_interval: float = 5.0, retry_interval: float = 5.0):
+        super().__init__(name=name, daemon=True)
+        self.connect = connect
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.connected = False
+        self.notifications_received = 0
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    @abstractmethod
+    def handle_payload(self, payload: str) -> None:
+        """Apply one notification payload"""
+
+    def on_connect(self) -> None:
+        pass
+
+    def on_disconnect(self) -> None:
+        pass
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(f"LISTEN {self.channel}")
+                cursor.close()
+                self.connected = True
+                self.on_connect()
+                print(f"✓ Listening for notifications on '{self.channel}'")
+
+                while not self._stop_event.is_set():
+                    readable, _, _ = select.select([conn], [], [], self.poll_interval)
+                    if not readable:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.notifications_received += 1
+                        self.handle_payload(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Notification listener error on '{self.channel}': {e}")
+                self.on_disconnect()
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop_event.wait(self.retry_interval)
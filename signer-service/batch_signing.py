@@ -0,0 +1,97 @@
+"""
+Batch Signing
+Signs many {facility_id, payload} items in one request: items are grouped
+by facility so each certificate and key is resolved once, the signatures
+are computed in parallel on the signing executor, and results come back in
+input order with an error entry for every item that could not be signed.
+"""
+
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence, Union
+
+
+class SigningError(Exception):
+    """Per-item failure, reported in the batch response instead of failing the request"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+    @classmethod
+    def from_exception(cls, error: Exception) -> "SigningError":
+        # HTTPException from the certificate/key helpers keeps its status and detail
+        return cls(getattr(error, "status_code", 500), str(getattr(error, "detail", error)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"status_code": self.status_code, "message": self.message}
+
+
+class SignItem(NamedTuple):
+    facility_id: int
+    payload: Dict[str, Any]
+
+
+def group_by_facility(items: Sequence[Union[SignItem, SigningError]]) -> Dict[int, List[int]]:
+    """facility_id -> indexes of its items, in first-seen order"""
+    groups: Dict[int, List[int]] = {}
+    for index, item in enumerate(items):
+        if isinstance(item, SignItem):
+            groups.setdefault(item.facility_id, []).append(index)
+    return groups
+
+
+def sign_batch(items: Sequence[Union[SignItem, SigningError]],
+               get_signing_key: Callable[[int], tuple],
+               submit: Callable[[Dict[str, Any], Dict[str, Any], Any], Future],
+               algorithm: str = "SHA256withRSA") -> List[Dict[str, Any]]:
+    """
+    One result per item, in input order:
+        {"index": i, "status": "ok", "signature": {signature, algorithm, timestamp, certificate_serial}}
+        {"index": i, "status": "error", "error": {status_code, message}}
+
+    get_signing_key(facility_id) returns (certificate row, private key) and
+    is called once per facility; submit(payload, certificate, private_key)
+    starts signing one item and returns a Future of its Base64 signature.
+    Items that are already a SigningError (e.g. failed validation) are
+    passed through.
+    """
+    outcomes: List[Union[Dict[str, Any], SigningError, None]] = [
+        item if isinstance(item, SigningError) else None for item in items
+    ]
+
+    futures = {}
+    for facility_id, indexes in group_by_facility(items).items():
+        try:
+            certificate, private_key = get_signing_key(facility_id)
+        except Exception as e:
+            error = SigningError.from_exception(e)
+            for index in indexes:
+                outcomes[index] = error
+            continue
+        for index in indexes:
+            try:
+                futures[index] = (submit(items[index].payload, certificate, private_key),
+                                  certificate["serial_number"])
+            except Exception as e:
+                outcomes[index] = SigningError.from_exception(e)
+
+    for index, (future, serial) in futures.items():
+        try:
+            outcomes[index] = {
+                "signature": future.result(),
+                "algorithm": algorithm,
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "certificate_serial": serial,
+            }
+        except Exception as e:
+            outcomes[index] = SigningError.from_exception(e)
+
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, SigningError):
+            results.append({"index": index, "status": "error", "error": outcome.to_dict()})
+        else:
+            results.append({"index": index, "status": "ok", "signature": outcome})
+    return results
@@ -0,0 +1,211 @@
+"""
+Payload Canonicalization
+The exact bytes a FHIR payload is signed over: keys sorted, no whitespace,
+non-ASCII characters kept as UTF-8.
+
+canonicalize_payload (stdlib json) defines the format. canonical_bytes
+produces the same bytes with orjson, which sorts and writes UTF-8 directly
+instead of building a str and encoding a second copy. orjson's output only
+differs from json.dumps for:
+- floats Python writes in exponent form (abs >= 1e16 or < 1e-4): 1e16 vs
+  1e+16, 0.00001 vs 1e-05
+- NaN/Infinity, which orjson writes as null
+- integers outside 64 bits and non-str keys, which orjson rejects; so are
+  datetimes, dataclasses and subclasses of builtin types (passed through to
+  a default that raises), leaving json.dumps to serialize or reject them
+so those payloads fall back to json.dumps. The float cases are found by
+scanning orjson's output (orjson_diverges); a match inside a string value
+only costs the fallback. Payloads are decoded request JSON, so orjson's
+native UUID/enum support never comes into play.
+
+iter_canonical_chunks yields the same bytes in chunks of about
+STREAM_CHUNK_SIZE, so canonical_digest can hash a payload without ever
+holding its whole canonical form: containers estimated to serialize to
+under STREAM_PIECE_SIZE bytes go through canonical_bytes in one piece (runs
+of small list items together), larger ones are walked one level at a time
+and long strings are escaped slice by slice.
+"""
+
+from json.encoder import encode_basestring
+from typing import Any, Dict, Iterator
+import hashlib
+import json
+import re
+
+import orjson
+
+ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS | \
+    orjson.OPT_PASSTHROUGH_DATACLASS
+
+# Ends of number tokens as orjson writes them: an exponent (1e16, 5e-324) or null (NaN/Infinity). Both
+# start with a literal so re scans for them quickly; the trailing delimiter skips Base64 text like "...nullA"
+ORJSON_EXPONENT = re.compile(rb'e-?\d+(?:[,}\]]|$)')
+ORJSON_NULL = re.compile(rb'null(?:[,}\]]|$)')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_PIECE_SIZE = 16 * 1024
+
+
+def canonicalize_payload(payload: Dict[str, Any]) -> str:
+    """
+    Convert FHIR JSON to canonical string format
+
+    Steps:
+    1. Sort all keys alphabetically
+    2. Remove whitespace
+    3. Ensure consistent serialization
+    """
+    return json.dumps(
+        payload,
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+
+
+def orjson_diverges(encoded: bytes) -> bool:
+    """Whether orjson output may differ from json.dumps: exponent floats, 0.0000x floats, null (NaN/Infinity)"""
+    return (b'0.0000' in encoded or ORJSON_NULL.search(encoded) is not None
+            or ORJSON_EXPONENT.search(encoded) is not None)
+
+
+def _not_json(value: Any):
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def canonical_bytes(payload: Dict[str, Any]) -> bytes:
+    """UTF-8 encoded canonical form, as passed to the signature; identical to canonicalize_payload(payload).encode()"""
+    try:
+        encoded = orjson.dumps(payload, default=_not_json, option=ORJSON_OPTIONS)
+    except TypeError:
+        # orjson.JSONEncodeError: big integers, non-str keys, other types, nesting over 255 levels
+        encoded = None
+    if encoded is None or orjson_diverges(encoded):
+        return canonicalize_payload(payload).encode('utf-8')
+    return encoded
+
+
+def _float_str(value: float) -> str:
+    # As json.encoder's floatstr with allow_nan=True
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _key_str(key: Any) -> str:
+    if isinstance(key, str):
+        return key
+    if isinstance(key, float):
+        return _float_str(key)
+    if key is True:
+        return 'true'
+    if key is False:
+        return 'false'
+    if key is None:
+        return 'null'
+    if isinstance(key, int):
+        return int.__repr__(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {key.__class__.__name__}")
+
+
+def _remaining(value: Any, budget: int) -> int:
+    """budget minus the approximate serialized size of value; stops early once negative"""
+    if isinstance(value, str):
+        return budget - len(value) - 2
+    if isinstance(value, dict):
+        budget -= 2
+        for key, item in value.items():
+            budget = _remaining(item, budget - (len(key) if isinstance(key, str) else 24) - 4)
+            if budget < 0:
+                break
+        return budget
+    if isinstance(value, (list, tuple)):
+        budget -= 2
+        for item in value:
+            budget = _remaining(item, budget - 1)
+            if budget < 0:
+                break
+        return budget
+    return budget - 24
+
+
+def _iter_pieces(value: Any) -> Iterator[bytes]:
+    """Canonical form of value as a sequence of small byte strings, in json.dumps's type order"""
+    if isinstance(value, str):
+        if len(value) <= STREAM_PIECE_SIZE:
+            yield encode_basestring(value).encode('utf-8')
+            return
+        yield b'"'
+        for start in range(0, len(value), STREAM_PIECE_SIZE):
+            yield encode_basestring(value[start:start + STREAM_PIECE_SIZE])[1:-1].encode('utf-8')
+        yield b'"'
+    elif value is None:
+        yield b'null'
+    elif value is True:
+        yield b'true'
+    elif value is False:
+        yield b'false'
+    elif isinstance(value, int):
+        yield int.__repr__(value).encode('ascii')
+    elif isinstance(value, float):
+        yield _float_str(value).encode('ascii')
+    elif isinstance(value, (list, tuple, dict)) and _remaining(value, STREAM_PIECE_SIZE) >= 0:
+        yield canonical_bytes(value)
+    elif isinstance(value, (list, tuple)):
+        yield from _iter_list(value)
+    elif isinstance(value, dict):
+        yield b'{'
+        for index, (key, item) in enumerate(sorted(value.items())):
+            yield (b',"' if index else b'"') + encode_basestring(_key_str(key))[1:].encode('utf-8') + b':'
+            yield from _iter_pieces(item)
+        yield b'}'
+    else:
+        raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+def _iter_list(value) -> Iterator[bytes]:
+    """Canonical form of a large list; runs of small items go through canonical_bytes together"""
+    yield b'['
+    separator = b''
+    run, budget = [], STREAM_PIECE_SIZE
+    for item in value:
+        left = _remaining(item, budget - 1)
+        if left < 0 and run:
+            yield separator + canonical_bytes(run)[1:-1]
+            separator = b','
+            run, budget = [], STREAM_PIECE_SIZE
+            left = _remaining(item, budget - 1)
+        if left >= 0:
+            run.append(item)
+            budget = left
+            continue
+        yield separator
+        separator = b','
+        yield from _iter_pieces(item)
+    if run:
+        yield separator + canonical_bytes(run)[1:-1]
+    yield b']'
+
+
+def iter_canonical_chunks(payload: Dict[str, Any], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """canonical_bytes(payload) as consecutive chunks of about chunk_size bytes"""
+    buffer = bytearray()
+    for piece in _iter_pieces(payload):
+        buffer += piece
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def canonical_digest(payload: Dict[str, Any]) -> bytes:
+    """SHA-256 of the canonical form, hashed chunk by chunk"""
+    hasher = hashlib.sha256()
+    for chunk in iter_canonical_chunks(payload):
+        hasher.update(chunk)
+    return hasher.digest()
@@ -0,0 +1,196 @@
+"""
+Signing Key Cache
+Per-facility cache of the active signing certificate row and its parsed
+RSA private key, so /sign neither queries facility_certificates nor reads
+and decrypts the PEM file on every request.
+
+An entry is identified by (cert_id, serial_number) and dropped when:
+- its facility_certificates row changes (NOTIFY on sbs_certificates_changed,
+  see notify_certificate_change() in schema.sql), or after ttl seconds as a
+  safety net for lost notifications
+- the key file's mtime or size changes (one os.stat per lookup)
+- valid_until passes
+"""
+
+from datetime import date
+from threading import Lock
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+import json
+import os
+import time
+
+from cryptography.hazmat.primitives import serialization
+
+from sbs_common.notify import NotificationListener
+
+CERTIFICATE_CHANNEL = "sbs_certificates_changed"
+
+
+class CachedKey(NamedTuple):
+    cert_id: int
+    serial_number: str
+    certificate: Dict[str, Any]
+    private_key: Any
+    key_path: str
+    file_signature: Tuple[int, int]
+    loaded_at: float
+
+
+def resolve_key_path(key_path: str) -> str:
+    """Relative key paths are relative to CERT_BASE_PATH"""
+    if not os.path.isabs(key_path):
+        return os.path.join(os.getenv("CERT_BASE_PATH", "/certs"), key_path)
+    return key_path
+
+
+def load_key_file(path: str):
+    """Parse the PEM private key at a resolved path, decrypted with CERT_PASSWORD if set"""
+    password = os.getenv("CERT_PASSWORD")
+    with open(path, "rb") as key_file:
+        return serialization.load_pem_private_key(key_file.read(), password=password.encode() if password else None)
+
+
+def file_signature(path: str) -> Tuple[int, int]:
+    """(mtime_ns, size) of a key file; a rewritten or replaced file changes it"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SigningKeyCache:
+    """
+    Thread-safe facility_id -> CachedKey map in front of the certificate
+    query (fetch_certificate) and the PEM loader (load_key). resolve_path
+    maps a stored private_key_path to the file that load_key reads;
+    lookup_observer, if given, is called with True/False per hit/miss.
+    """
+
+    def __init__(self, fetch_certificate: Callable[[int], Dict[str, Any]],
+                 load_key: Callable[[str], Any],
+                 resolve_path: Callable[[str], str] = lambda path: path,
+                 ttl: float = 300.0, today: Callable[[], date] = date.today,
+                 lookup_observer: Optional[Callable[[bool], None]] = None):
+        self.fetch_certificate = fetch_certificate
+        self.load_key = load_key
+        self.resolve_path = resolve_path
+        self.ttl = ttl
+        self.today = today
+        self.lookup_observer = lookup_observer
+        self.lock = Lock()
+        self._entries: Dict[int, CachedKey] = {}
+        self._generations: Dict[int, int] = {}
+        self._generation = 0
+        self.stats_counters = {
+            "hits": 0, "misses": 0, "key_loads": 0, "expired": 0, "file_changes": 0, "invalidations": 0
+        }
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.stats_counters[name] += 1
+
+    def _record_lookup(self, hit: bool) -> None:
+        self._count("hits" if hit else "misses")
+        if self.lookup_observer:
+            self.lookup_observer(hit)
+
+    def _usable(self, entry: CachedKey) -> bool:
+        if entry.certificate["valid_until"] <= self.today():
+            self._count("expired")
+            return False
+        if time.monotonic() - entry.loaded_at >= self.ttl:
+            return False
+        try:
+            current = file_signature(entry.key_path)
+        except OSError:
+            current = None
+        if current != entry.file_signature:
+            self._count("file_changes")
+            return False
+        return True
+
+    def get(self, facility_id: int) -> Tuple[Dict[str, Any], Any]:
+        """(certificate row, parsed private key) for a facility's active signing certificate"""
+        with self.lock:
+            entry = self._entries.get(facility_id)
+            generation = self._generation, self._generations.get(facility_id, 0)
+
+        if entry is not None and self._usable(entry):
+            self._record_lookup(True)
+            return entry.certificate, entry.private_key
+
+        self._record_lookup(False)
+        certificate = self.fetch_certificate(facility_id)
+        key_path = self.resolve_path(certificate["private_key_path"])
+        # Stat before reading, so a rewrite racing with the load is caught on the next lookup
+        signature = file_signature(key_path) if os.path.exists(key_path) else None
+
+        # Same certificate and untouched file: the row was only re-checked, keep the parsed key
+        if (entry is not None and signature == entry.file_signature and key_path == entry.key_path
+                and (entry.cert_id, entry.serial_number) == (certificate["cert_id"], certificate["serial_number"])):
+            private_key = entry.private_key
+        else:
+            private_key = self.load_key(key_path)
+            self._count("key_loads")
+
+        fresh = CachedKey(certificate["cert_id"], certificate["serial_number"], certificate, private_key,
+                          key_path, signature, time.monotonic())
+        with self.lock:
+            # An invalidation while we were loading means the row may already be stale
+            if (self._generation, self._generations.get(facility_id, 0)) == generation:
+                self._entries[facility_id] = fresh
+        return certificate, private_key
+
+    def invalidate_facility(self, facility_id: int) -> None:
+        with self.lock:
+            self._entries.pop(facility_id, None)
+            self._generations[facility_id] = self._generations.get(facility_id, 0) + 1
+            self.stats_counters["invalidations"] += 1
+
+    def invalidate_all(self) -> None:
+        with self.lock:
+            self._entries.clear()
+            self._generation += 1
+            self.stats_counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats_counters)
+            stats["size"] = len(self._entries)
+            stats["ttl_seconds"] = self.ttl
+            return stats
+
+
+class CertificateChangeListener(NotificationListener):
+    """
+    LISTENs on the certificate channel and drops the cached key of the
+    facility named in each payload ({"facility_id": <int>}); a missing or
+    unreadable facility_id clears the whole cache, as does every
+    (re)connect since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, connect, cache: SigningKeyCache, channel: str = CERTIFICATE_CHANNEL,
+                 poll_interval: float = 5.0, retry_interval: float = 5.0):
+        super().__init__(
+            connect,
+            channel,
+            name="certificate-change-listener",
+            poll_interval=poll_interval,
+            retry_interval=retry_interval
+        )
+        self.cache = cache
+
+    def on_connect(self) -> None:
+        self.cache.invalidate_all()
+
+    def on_disconnect(self) -> None:
+        self.cache.invalidate_all()
+
+    def handle_payload(self, payload: str) -> None:
+        try:
+            facility_id: Optional[int] = json.loads(payload).get("facility_id") if payload else None
+        except (ValueError, AttributeError):
+            facility_id = None
+
+        if facility_id is None:
+            self.cache.invalidate_all()
+        else:
+            self.cache.invalidate_facility(int(facility_id))
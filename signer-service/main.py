@@ -5,24 +5,25 @@ Port: 8001
 """
 
 from fastapi import FastAPI, HTTPException, status, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import Dict, Any
-import json
-import hashlib
-import base64
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import Future
+import asyncio
 import os
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
 from dotenv import load_dotenv
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from sbs_common.db import DatabasePool
+from sbs_common.metrics import ServiceMetrics
+from sbs_common.middleware import RateLimiter, install_middleware
 from datetime import datetime
-from collections import deque
-from threading import Lock
-import time
+from key_cache import CertificateChangeListener, SigningKeyCache, load_key_file, resolve_key_path
+from batch_signing import SignItem, SigningError, sign_batch
+from signing_executor import EXECUTOR_THREAD, KeyRef, SigningExecutor
 
 load_dotenv()
 
@@ -32,67 +33,34 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware - Restrict to allowed origins
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-Request-ID"],
+service_metrics = ServiceMetrics("signer")
+
+# Shared middleware: CORS, request IDs + latency metrics, rate limiting (50 requests per minute per IP)
+install_middleware(app, service_metrics, rate_limiter=RateLimiter(max_requests=50, time_window=60))
+
+# Database connection pool
+db_pool = DatabasePool(
+    checkout_observer=service_metrics.pool_checkout_wait.labels(driver="psycopg2").observe
 )
+db_pool.open()
+get_db_connection = db_pool.connection
 
-# Rate limiter implementation
-class RateLimiter:
-    """Token bucket rate limiter"""
-    def __init__(self, max_requests: int = 50, time_window: int = 60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = {}
-        self.lock = Lock()
-
-    def is_allowed(self, identifier: str) -> bool:
-        with self.lock:
-            now = time.time()
-            if identifier not in self.requests:
-                self.requests[identifier] = deque()
-            while self.requests[identifier] and self.requests[identifier][0] < now - self.time_window:
-                self.requests[identifier].popleft()
-            
-            # Clean up empty entries to prevent memory leak
-            if not self.requests[identifier]:
-                del self.requests[identifier]
-                return True
-                
-            if len(self.requests[identifier]) < self.max_requests:
-                self.requests[identifier].append(now)
-                return True
-            return False
-
-rate_limiter = RateLimiter(max_requests=50, time_window=60)
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting middleware"""
-    if request.url.path in ["/health", "/"]:
-        return await call_next(request)
-    client_ip = request.client.host if request.client else "unknown"
-    if not rate_limiter.is_allowed(client_ip):
-        return JSONResponse(
-            status_code=429,
-            content={"error": "Rate limit exceeded", "retry_after_seconds": 60}
-        )
-    return await call_next(request)
+# Parsed private keys per facility (invalidated by NOTIFY, key file changes and expiry)
+SIGNER_KEY_CACHE_ENABLED = os.getenv("SIGNER_KEY_CACHE_ENABLED", "true").lower() == "true"
+SIGNER_KEY_CACHE_TTL_SECONDS = float(os.getenv("SIGNER_KEY_CACHE_TTL_SECONDS", "300"))
 
+# Most items accepted by one POST /sign/batch
+SIGNER_MAX_BATCH_ITEMS = int(os.getenv("SIGNER_MAX_BATCH_ITEMS", "5000"))
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        database=os.getenv("DB_NAME", "sbs_integration"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT", "5432")
-    )
+# Dedicated signing pool: "thread" or "process" workers, SIGNER_WORKERS of them (default: CPU count).
+# Process workers receive a pickled copy of each payload, so streamed /sign bodies are copied anyway
+SIGNER_EXECUTOR = os.getenv("SIGNER_EXECUTOR", EXECUTOR_THREAD).lower()
+SIGNER_WORKERS = int(os.getenv("SIGNER_WORKERS", str(os.cpu_count() or 4)))
+signing_executor = SigningExecutor(SIGNER_EXECUTOR, SIGNER_WORKERS)
+
+# POST /sign bodies of at least this many bytes are hashed while canonicalizing instead of
+# canonicalized into one buffer first (0 disables streaming)
+SIGNER_STREAMING_MIN_BYTES = int(os.getenv("SIGNER_STREAMING_MIN_BYTES", str(4 * 1024 * 1024)))
 
 
 class SignRequest(BaseModel):
@@ -107,36 +75,39 @@ class SignResponse(BaseModel):
     certificate_serial: str
 
 
+class SignBatchRequest(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., description="SignRequest objects ({facility_id, payload})")
+
+
 def get_facility_certificate(facility_id: int) -> Dict:
     """
     Retrieve active signing certificate for facility
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        query = """
-        SELECT 
-            cert_id,
-            serial_number,
-            private_key_path,
-            public_cert_path,
-            valid_from,
-            valid_until
-        FROM facility_certificates
-        WHERE facility_id = %s 
-          AND cert_type IN ('signing', 'both')
-          AND is_active = TRUE
-          AND valid_until > CURRENT_DATE
-        ORDER BY valid_until DESC
-        LIMIT 1
-        """
+            query = """
+            SELECT 
+                cert_id,
+                serial_number,
+                private_key_path,
+                public_cert_path,
+                valid_from,
+                valid_until
+            FROM facility_certificates
+            WHERE facility_id = %s 
+              AND cert_type IN ('signing', 'both')
+              AND is_active = TRUE
+              AND valid_until > CURRENT_DATE
+            ORDER BY valid_until DESC
+            LIMIT 1
+            """
         
-        cursor.execute(query, (facility_id,))
-        result = cursor.fetchone()
+            cursor.execute(query, (facility_id,))
+            result = cursor.fetchone()
         
-        cursor.close()
-        conn.close()
+            cursor.close()
         
         if not result:
             raise HTTPException(
@@ -161,18 +132,8 @@ def load_private_key(key_path: str) -> rsa.RSAPrivateKey:
     Supports PEM format
     """
     try:
-        # Check if path is absolute or relative
-        if not os.path.isabs(key_path):
-            key_path = os.path.join(os.getenv("CERT_BASE_PATH", "/certs"), key_path)
-        
-        with open(key_path, "rb") as key_file:
-            private_key = serialization.load_pem_private_key(
-                key_file.read(),
-                password=os.getenv("CERT_PASSWORD", "").encode() if os.getenv("CERT_PASSWORD") else None,
-                backend=default_backend()
-            )
-        
-        return private_key
+        key_path = resolve_key_path(key_path)
+        return load_key_file(key_path)
         
     except FileNotFoundError:
         raise HTTPException(
@@ -186,49 +147,55 @@ def load_private_key(key_path: str) -> rsa.RSAPrivateKey:
         )
 
 
-def canonicalize_payload(payload: Dict[str, Any]) -> str:
-    """
-    Convert FHIR JSON to canonical string format
-    
-    Steps:
-    1. Sort all keys alphabetically
-    2. Remove whitespace
-    3. Ensure consistent serialization
-    """
-    canonical_string = json.dumps(
-        payload,
-        sort_keys=True,
-        separators=(',', ':'),
-        ensure_ascii=False
-    )
-    return canonical_string
+key_cache = SigningKeyCache(
+    get_facility_certificate,
+    load_private_key,
+    resolve_key_path,
+    ttl=SIGNER_KEY_CACHE_TTL_SECONDS,
+    lookup_observer=lambda hit: service_metrics.record_cache_lookup("signing_key", hit)
+)
+certificate_listener: Optional[CertificateChangeListener] = None
+
+
+def get_signing_key(facility_id: int) -> Tuple[Dict, rsa.RSAPrivateKey]:
+    """Active certificate row and parsed private key for a facility, cached unless disabled"""
+    if SIGNER_KEY_CACHE_ENABLED:
+        return key_cache.get(facility_id)
+    cert_info = get_facility_certificate(facility_id)
+    return cert_info, load_private_key(cert_info['private_key_path'])
 
 
-def sign_payload(canonical_string: str, private_key: rsa.RSAPrivateKey) -> str:
+def submit_signature(payload: Dict[str, Any], cert_info: Dict, private_key: rsa.RSAPrivateKey,
+                     streaming: bool = False) -> Future:
+    """Canonicalize and sign one payload on the signing executor; a Future of the Base64 signature"""
+    key_ref = KeyRef(resolve_key_path(cert_info['private_key_path']), cert_info['cert_id'], cert_info['serial_number'])
+    return signing_executor.submit(payload, private_key, key_ref, streaming)
+
+
+def should_stream(http_request: Request) -> bool:
+    """Whether the request body is large enough to sign from a streamed digest"""
+    if SIGNER_STREAMING_MIN_BYTES <= 0:
+        return False
+    try:
+        return int(http_request.headers.get("content-length", "0")) >= SIGNER_STREAMING_MIN_BYTES
+    except ValueError:
+        return False
+
+
+async def sign_payload(payload: Dict[str, Any], cert_info: Dict, private_key: rsa.RSAPrivateKey,
+                       streaming: bool = False) -> str:
     """
     Sign the canonical payload using SHA-256 with RSA
-    
-    Steps:
-    1. Hash the canonical string using SHA-256
-    2. Sign the hash using RSA private key
+
+    Steps (on the signing executor, see signing_executor.py):
+    1. Canonicalize the payload to UTF-8 bytes
+    2. Sign the SHA-256 hash with the RSA private key (PKCS#1 v1.5, NPHIES standard)
     3. Encode signature as Base64
+    With streaming, steps 1-2 hash the canonical form chunk by chunk and sign the digest
+    (Prehashed SHA-256); the signature is the same.
     """
     try:
-        # Create SHA-256 hash
-        message_bytes = canonical_string.encode('utf-8')
-        
-        # Sign using RSA with PKCS#1 v1.5 padding (NPHIES standard)
-        signature = private_key.sign(
-            message_bytes,
-            padding.PKCS1v15(),
-            hashes.SHA256()
-        )
-        
-        # Encode as Base64
-        signature_b64 = base64.b64encode(signature).decode('utf-8')
-        
-        return signature_b64
-        
+        return await asyncio.wrap_future(submit_signature(payload, cert_info, private_key, streaming))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -286,9 +253,17 @@ def root():
 def health_check():
     """Health check endpoint"""
     try:
-        conn = get_db_connection()
-        conn.close()
-        return {"status": "healthy", "database": "connected"}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "key_cache": key_cache.stats() if SIGNER_KEY_CACHE_ENABLED else None,
+            "certificate_listener_connected": bool(certificate_listener and certificate_listener.connected),
+            "signing_executor": signing_executor.stats()
+        }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -297,30 +272,26 @@ def health_check():
 
 
 @app.post("/sign", response_model=SignResponse)
-def sign_claim(request: SignRequest):
+async def sign_claim(request: SignRequest, http_request: Request):
     """
     Sign a FHIR payload with facility's digital certificate
     
     Process:
     1. Retrieve facility's signing certificate
-    2. Load private key
+    2. Load private key (both from key_cache when enabled)
     3. Canonicalize the payload
     4. Generate SHA-256 hash
     5. Sign with RSA private key
     6. Return Base64-encoded signature
+    Steps 3-6 run on the signing executor, not the request threadpool. Bodies of
+    SIGNER_STREAMING_MIN_BYTES or more are hashed while canonicalizing (streaming).
     """
     
-    # Get facility certificate
-    cert_info = get_facility_certificate(request.facility_id)
-    
-    # Load private key
-    private_key = load_private_key(cert_info['private_key_path'])
-    
-    # Canonicalize payload
-    canonical_string = canonicalize_payload(request.payload)
+    # Get facility certificate and its private key (cached after the first request)
+    cert_info, private_key = await run_in_threadpool(get_signing_key, request.facility_id)
     
-    # Sign the payload
-    signature = sign_payload(canonical_string, private_key)
+    # Canonicalize and sign the payload
+    signature = await sign_payload(request.payload, cert_info, private_key, should_stream(http_request))
     
     # Return signature with metadata
     return SignResponse(
@@ -331,6 +302,36 @@ def sign_claim(request: SignRequest):
     )
 
 
+@app.post("/sign/batch")
+def sign_claim_batch(request: SignBatchRequest):
+    """
+    Sign many FHIR payloads in one request
+
+    Items are grouped by facility so each certificate is resolved once, then
+    signed in parallel on the signing executor. Results are in input order:
+    - {"index": 0, "status": "ok", "signature": {signature, algorithm, timestamp, certificate_serial}}
+    - {"index": 1, "status": "error", "error": {"status_code": 404, "message": "..."}}
+    An item that fails does not abort the rest of the batch.
+    """
+    if len(request.items) > SIGNER_MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch has {len(request.items)} items; the limit is {SIGNER_MAX_BATCH_ITEMS}"
+        )
+
+    items = []
+    for entry in request.items:
+        try:
+            item = SignRequest(**entry)
+            items.append(SignItem(item.facility_id, item.payload))
+        except ValidationError as e:
+            items.append(SigningError(status.HTTP_422_UNPROCESSABLE_ENTITY, f"Invalid sign request: {str(e)}"))
+
+    results = sign_batch(items, get_signing_key, submit_signature)
+    signed = sum(1 for result in results if result["status"] == "ok")
+    return {"results": results, "signed": signed, "failed": len(results) - signed}
+
+
 @app.post("/generate-test-cert")
 def generate_test_certificate(facility_id: int, request: Request):
     """
@@ -355,28 +356,30 @@ def generate_test_certificate(facility_id: int, request: Request):
         private_path, public_path = generate_test_keypair(facility_id)
         
         # Insert into database
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO facility_certificates 
-            (facility_id, cert_type, serial_number, private_key_path, public_cert_path, 
-             valid_from, valid_until, is_active)
-            VALUES (%s, %s, %s, %s, %s, CURRENT_DATE, CURRENT_DATE + INTERVAL '1 year', TRUE)
-            ON CONFLICT (facility_id, cert_type, serial_number) 
-            DO UPDATE SET is_active = TRUE
-        """, (
-            facility_id,
-            'signing',
-            f'TEST-{facility_id}-{datetime.now().strftime("%Y%m%d")}',
-            private_path,
-            public_path
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+            cursor.execute("""
+                INSERT INTO facility_certificates 
+                (facility_id, cert_type, serial_number, private_key_path, public_cert_path, 
+                 valid_from, valid_until, is_active)
+                VALUES (%s, %s, %s, %s, %s, CURRENT_DATE, CURRENT_DATE + INTERVAL '1 year', TRUE)
+                ON CONFLICT (facility_id, cert_type, serial_number) 
+                DO UPDATE SET is_active = TRUE
+            """, (
+                facility_id,
+                'signing',
+                f'TEST-{facility_id}-{datetime.now().strftime("%Y%m%d")}',
+                private_path,
+                public_path
+            ))
         
+            conn.commit()
+            cursor.close()
+
+        # The NOTIFY reaches this worker asynchronously; don't sign with the old key meanwhile
+        key_cache.invalidate_facility(facility_id)
+
         return {
             "status": "success",
             "message": "Test certificate generated",
@@ -421,6 +424,32 @@ def verify_certificate(facility_id: int):
         }
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition"""
+    body, content_type = service_metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.on_event("startup")
+def startup_event():
+    """Start the certificate NOTIFY listener that invalidates key_cache"""
+    global certificate_listener
+    if SIGNER_KEY_CACHE_ENABLED:
+        certificate_listener = CertificateChangeListener(connect=db_pool.connect, cache=key_cache)
+        certificate_listener.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Cleanup on shutdown"""
+    if certificate_listener:
+        certificate_listener.stop()
+    signing_executor.shutdown(wait=False)
+    db_pool.close()
+    service_metrics.mark_process_dead()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
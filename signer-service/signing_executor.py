@@ -0,0 +1,111 @@
+"""
+Signing Executor
+Dedicated worker pool for canonicalization + RSA signing, sized by
+SIGNER_WORKERS instead of sharing Starlette's request threadpool.
+
+- thread:  workers sign with the parsed key from the service's key cache;
+           this scales with cores only as far as the RSA backend releases
+           the GIL during the private-key operation.
+- process: parsed keys cannot be pickled, so each worker process keeps its
+           own key cache keyed by KeyRef (key path, cert_id, serial_number)
+           and revalidated by the key file's mtime/size, like
+           SigningKeyCache, loading it with the same key_cache.load_key_file
+           as the service. Only the KeyRef and the payload cross the
+           process boundary, but the payload is pickled to get there: a
+           full copy of it, which streaming mode otherwise avoids. Use
+           process mode for many small payloads, thread mode for large
+           ones.
+
+With streaming=True a payload is never held in canonical form: its
+canonical chunks are fed to SHA-256 as they are produced and the digest is
+signed as Prehashed(SHA256). PKCS#1 v1.5 is deterministic, so the signature
+is byte-identical to signing the full canonical bytes.
+"""
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+import base64
+import multiprocessing
+import os
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, utils
+
+from canonical import canonical_bytes, canonical_digest
+from key_cache import file_signature, load_key_file
+
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+EXECUTOR_MODES = (EXECUTOR_THREAD, EXECUTOR_PROCESS)
+
+
+class KeyRef(NamedTuple):
+    """Identifies a facility's private key across processes"""
+    key_path: str
+    cert_id: int
+    serial_number: str
+
+
+def rsa_sign(private_key, message: bytes) -> str:
+    """SHA256withRSA (PKCS#1 v1.5) signature of message, Base64-encoded"""
+    signature = private_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+    return base64.b64encode(signature).decode('utf-8')
+
+
+def rsa_sign_digest(private_key, digest: bytes) -> str:
+    """Same signature as rsa_sign, from the SHA-256 digest of the message"""
+    signature = private_key.sign(digest, padding.PKCS1v15(), utils.Prehashed(hashes.SHA256()))
+    return base64.b64encode(signature).decode('utf-8')
+
+
+def _sign_with_key(payload: Dict[str, Any], private_key, streaming: bool = False) -> str:
+    if streaming:
+        return rsa_sign_digest(private_key, canonical_digest(payload))
+    return rsa_sign(private_key, canonical_bytes(payload))
+
+
+# Per-process key cache of a process-mode worker: key_path -> ((KeyRef, file signature), key)
+_worker_keys: Dict[str, Tuple[tuple, Any]] = {}
+
+
+def _sign_in_worker(payload: Dict[str, Any], key_ref: KeyRef, streaming: bool = False) -> str:
+    version = (key_ref, file_signature(key_ref.key_path))
+    cached = _worker_keys.get(key_ref.key_path)
+    if cached is None or cached[0] != version:
+        cached = (version, load_key_file(key_ref.key_path))
+        _worker_keys[key_ref.key_path] = cached
+    return _sign_with_key(payload, cached[1], streaming)
+
+
+class SigningExecutor:
+    """Runs signatures on a thread or process pool of a fixed size"""
+
+    def __init__(self, mode: str = EXECUTOR_THREAD, workers: Optional[int] = None):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown signing executor {mode!r}; expected one of {list(EXECUTOR_MODES)}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.submitted = 0
+        self.streamed = 0
+        if mode == EXECUTOR_PROCESS:
+            # spawn, not fork: the service process already runs threads (listener, pool)
+            self._pool: Executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="signer")
+
+    def submit(self, payload: Dict[str, Any], private_key, key_ref: KeyRef, streaming: bool = False) -> Future:
+        """Future of the Base64 signature of the canonicalized payload (hashed while canonicalizing if streaming)"""
+        self.submitted += 1
+        if streaming:
+            self.streamed += 1
+        if self.mode == EXECUTOR_PROCESS:
+            return self._pool.submit(_sign_in_worker, payload, key_ref, streaming)
+        return self._pool.submit(_sign_with_key, payload, private_key, streaming)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "workers": self.workers, "submitted": self.submitted, "streamed": self.streamed}
@@ -0,0 +1,94 @@
+"""
+Bundle Allocation Benchmark
+===========================
+
+Latency and saving of the rules engine's bundle allocation on synthetic
+claims as the item count grows (no database needed):
+
+- greedy:  allocate_bundles with exact search disabled
+- default: allocate_bundles as /validate runs it (exact search for up to
+           --max-exact candidate bundles, bounded by --budget-ms)
+
+Bundles are random 2-5 item sets over a shared code pool, so larger claims
+satisfy many overlapping bundles.
+
+Usage:
+    python tests/benchmarks/bench_bundle_allocation.py --items 10,50,100,200 --claims 200
+"""
+
+import argparse
+import random
+import time
+from collections import Counter
+from decimal import Decimal
+
+from bench_utils import add_service_path, latency_summary, print_table
+
+add_service_path("financial-rules-engine")
+
+from bundle_allocation import allocate_bundles  # noqa: E402
+from bundle_index import BundleIndex, ClaimLine  # noqa: E402
+
+
+def build_index(rng, codes, bundles):
+    rows = []
+    for bundle_id in range(1, bundles + 1):
+        members = rng.sample(codes, rng.randint(2, 5))
+        price = Decimal(rng.randint(40, 90) * len(members))
+        for position, code in enumerate(members):
+            rows.append({
+                "bundle_id": bundle_id, "bundle_code": f"BND-{bundle_id:04d}", "bundle_name": "",
+                "total_allowed_price": price, "sbs_code": code, "quantity": 1,
+                "is_mandatory": position < 2 or rng.random() < 0.5
+            })
+    return BundleIndex.from_rows(rows)
+
+
+def build_claim(rng, codes, prices, items):
+    return [ClaimLine(i, code, 1, prices[code]) for i, code in enumerate(rng.choices(codes, k=items), start=1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle allocation benchmark")
+    parser.add_argument("--items", default="10,50,100,200", help="Comma-separated claim item counts")
+    parser.add_argument("--claims", type=int, default=200, help="Claims per item count")
+    parser.add_argument("--codes", type=int, default=60, help="Distinct SBS codes in the pool")
+    parser.add_argument("--bundles", type=int, default=40, help="Bundles in the index")
+    parser.add_argument("--max-exact", type=int, default=16, help="Exact search candidate limit")
+    parser.add_argument("--budget-ms", type=float, default=20, help="Exact search time budget")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    codes = [f"SBS-{i:03d}" for i in range(args.codes)]
+    prices = {code: Decimal(rng.randint(20, 150)) for code in codes}
+    index = build_index(rng, codes, args.bundles)
+    modes = {
+        "greedy": {"max_exact_candidates": 0},
+        "default": {"max_exact_candidates": args.max_exact, "time_budget": args.budget_ms / 1000},
+    }
+
+    results = []
+    for items in (int(n) for n in args.items.split(",")):
+        claims = [build_claim(rng, codes, prices, items) for _ in range(args.claims)]
+        for name, options in modes.items():
+            samples, saving, methods = [], Decimal("0"), Counter()
+            for lines in claims:
+                started = time.perf_counter()
+                allocation = allocate_bundles(index, lines, **options)
+                samples.append((time.perf_counter() - started) * 1000)
+                saving += allocation.saving
+                methods[allocation.method] += 1
+            results.append({
+                "items": items,
+                "mode": name,
+                **latency_summary(samples),
+                "avg_saving": round(saving / len(claims), 2),
+                "methods": " ".join(f"{m}={n}" for m, n in sorted(methods.items())),
+            })
+
+    print_table(f"Bundle allocation ({args.bundles} bundles over {args.codes} codes)", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Claim Item Validation Micro-Benchmark
+=====================================
+
+Per-item cost of the InternalClaimItem field validators: the original
+implementation (import re + ~20 pattern searches/subs per call) versus the
+precompiled validators in normalizer-service/claim_validation.py, on clean
+items (the common case) and on items that trip the checks. Also times full
+pydantic model construction with each pair of validators.
+
+Usage:
+    python tests/benchmarks/bench_claim_item_validation.py --iterations 100000
+"""
+
+import argparse
+import re
+import time
+
+from bench_utils import add_service_path, print_table
+
+add_service_path("normalizer-service")
+
+from claim_validation import sanitize_description, validate_internal_code  # noqa: E402
+from pydantic import BaseModel, Field, validator  # noqa: E402
+
+
+def legacy_validate_code(v):
+    import re
+    dangerous_patterns = [
+        r';', r'--', r'/\*', r'\*/', r'\\', r'\x00',
+        r'\$\(', r'`', r'\|', r'&&', r'\|\|',
+        r'<script', r'javascript:', r'data:',
+        r'\.\./', r'\.\.\\',
+    ]
+    v_lower = v.lower()
+    for pattern in dangerous_patterns:
+        if re.search(pattern, v_lower):
+            raise ValueError('Invalid characters in code')
+    if not re.match(r'^[a-zA-Z0-9_\-\.]+$', v):
+        raise ValueError('Code must contain only alphanumeric characters, hyphens, underscores, and periods')
+    return v.strip()
+
+
+def legacy_validate_description(v):
+    import re
+    dangerous_patterns = [
+        r'<script.*?>.*?</script>', r'javascript:', r'on\w+\s*=',
+        r'\.\./', r'\.\.\\',
+    ]
+    v_clean = v
+    for pattern in dangerous_patterns:
+        v_clean = re.sub(pattern, '', v_clean, flags=re.IGNORECASE)
+    return v_clean.strip()
+
+
+def make_model(code_validator, description_validator):
+    class Item(BaseModel):
+        facility_id: int = Field(..., ge=1)
+        internal_code: str = Field(..., min_length=1, max_length=100)
+        description: str = Field(..., min_length=1, max_length=500)
+
+        @validator('internal_code')
+        def validate_code(cls, v):
+            return code_validator(v)
+
+        @validator('description')
+        def validate_description(cls, v):
+            return description_validator(v)
+
+    return Item
+
+
+ITEMS = {
+    "clean": ("LAB-CBC-01", "Complete Blood Count Test - تحليل صورة دم كاملة"),
+    "hostile": ("LAB;DROP", "<script>alert(1)</script> onclick=x ../../etc"),
+}
+
+
+def time_per_call(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim item validation micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    re.purge()
+
+    implementations = {
+        "legacy": (legacy_validate_code, legacy_validate_description),
+        "precompiled": (validate_internal_code, sanitize_description),
+    }
+    rows = []
+    for item_name, (code, description) in ITEMS.items():
+        row = {"item": item_name}
+        for impl_name, (code_fn, description_fn) in implementations.items():
+            def validate():
+                try:
+                    code_fn(code)
+                except ValueError:
+                    pass
+                description_fn(description)
+
+            row[f"{impl_name}_us"] = round(time_per_call(validate, args.iterations), 3)
+        row["speedup"] = round(row["legacy_us"] / row["precompiled_us"], 1)
+        rows.append(row)
+
+    print_table("Field validators, per item (microseconds)", rows)
+
+    model_rows = []
+    code, description = ITEMS["clean"]
+    for impl_name, validators in implementations.items():
+        model = make_model(*validators)
+        per_item = time_per_call(
+            lambda: model(facility_id=1, internal_code=code, description=description),
+            args.iterations // 2
+        )
+        model_rows.append({"validators": impl_name, "model_construction_us": round(per_item, 3)})
+    print_table("InternalClaimItem construction, clean item (microseconds)", model_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Description Matcher Benchmark
+=============================
+
+Measures index build time and top-k query latency (p50/p99) of the offline
+description matcher over a synthetic bilingual catalogue, and compares bulk
+scoring (top_k_batch, sparse matrix product) with one-at-a-time queries.
+No database needed.
+
+Usage:
+    python tests/benchmarks/bench_description_matcher.py --entries 2000,10000 --queries 2000
+"""
+
+import argparse
+import random
+import time
+
+from bench_utils import add_service_path, latency_summary, print_table
+
+add_service_path("normalizer-service")
+
+from description_matcher import DescriptionMatcher  # noqa: E402
+
+WORDS_EN = [
+    "blood", "count", "complete", "chest", "x-ray", "ultrasound", "abdomen", "consultation",
+    "general", "specialist", "mri", "brain", "contrast", "glucose", "fasting", "lipid", "panel",
+    "renal", "function", "liver", "culture", "urine", "ecg", "echo", "cardiac", "dental",
+    "extraction", "physiotherapy", "session", "vaccine", "injection", "suture", "removal",
+]
+WORDS_AR = [
+    "تحليل", "صورة", "دم", "كاملة", "أشعة", "سينية", "للصدر", "استشارة", "عامة", "طبيب",
+    "رنين", "مغناطيسي", "للدماغ", "سكر", "صائم", "دهون", "وظائف", "الكلى", "الكبد", "مزرعة",
+    "بول", "تخطيط", "القلب", "خلع", "سن", "علاج", "طبيعي", "جلسة", "لقاح", "حقنة",
+]
+
+
+def synthetic_catalogue(size: int, rng: random.Random):
+    return [
+        {
+            "sbs_id": f"SBS-SYN-{i:06d}",
+            "description_en": " ".join(rng.sample(WORDS_EN, rng.randint(2, 5))),
+            "description_ar": " ".join(rng.sample(WORDS_AR, rng.randint(2, 4))),
+        }
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Description matcher benchmark")
+    parser.add_argument("--entries", default="1000,5000,20000", help="Catalogue sizes")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rows = []
+    bulk_rows = []
+    for size in (int(s) for s in args.entries.split(",")):
+        catalogue = synthetic_catalogue(size, rng)
+        started = time.perf_counter()
+        matcher = DescriptionMatcher(catalogue)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        queries = [
+            " ".join(rng.sample(WORDS_EN, 2) + rng.sample(WORDS_AR, 1))
+            for _ in range(args.queries)
+        ]
+        samples = []
+        for query in queries:
+            started = time.perf_counter()
+            matcher.top_k(query, args.top_k)
+            samples.append((time.perf_counter() - started) * 1000)
+
+        rows.append({"entries": size, "build_ms": round(build_ms, 1), **latency_summary(samples)})
+
+        matcher.catalogue_matrix()  # one-off SciPy import and matrix build
+        started = time.perf_counter()
+        matcher.top_k_batch(queries, args.top_k)
+        batch_s = time.perf_counter() - started
+        bulk_rows.append({
+            "entries": size,
+            "queries": len(queries),
+            "loop_per_sec": round(len(queries) / (sum(samples) / 1000), 1),
+            "batch_per_sec": round(len(queries) / batch_s, 1),
+        })
+
+    print_table(f"Description matcher top-{args.top_k} query latency", rows)
+    print_table("Bulk scoring throughput (top_k loop vs top_k_batch)", bulk_rows)
+
+
+if __name__ == "__main__":
+    main()
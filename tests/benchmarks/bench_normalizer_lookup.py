@@ -0,0 +1,98 @@
+"""
+Normalizer Lookup Driver Benchmark
+==================================
+
+Compares per-lookup latency (p50/p99) and throughput of the normalizer's
+database lookup paths under many concurrent clients on one event loop:
+
+- psycopg2-blocking:   fetch_local_mapping called directly in the coroutine
+                       (the pre-asyncpg behaviour, blocks the event loop)
+- psycopg2-threadpool: fetch_local_mapping offloaded to the threadpool
+                       (default NORMALIZER_DB_DRIVER=psycopg2)
+- asyncpg:             AsyncMappingRepository (NORMALIZER_DB_DRIVER=asyncpg)
+
+Caches are bypassed so every lookup reaches Postgres. Requires a database
+loaded with database/schema.sql (DB_* environment variables).
+
+Usage:
+    python tests/benchmarks/bench_normalizer_lookup.py --clients 200 --lookups 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from bench_utils import add_service_path, latency_summary, print_table
+
+add_service_path("normalizer-service")
+
+import main as normalizer  # noqa: E402
+from async_mapping_repository import AsyncMappingRepository  # noqa: E402
+from sbs_common.db import AsyncDatabasePool  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+
+async def run_clients(lookup, clients: int, lookups: int, keys):
+    samples = []
+
+    async def client(client_id: int):
+        for i in range(lookups):
+            facility_id, internal_code = keys[(client_id + i) % len(keys)]
+            started = time.perf_counter()
+            await lookup(facility_id, internal_code)
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+async def benchmark(args):
+    keys = [(args.facility_id, code) for code in args.codes.split(",")]
+    results = []
+
+    async def blocking(facility_id, internal_code):
+        return normalizer.fetch_local_mapping(facility_id, internal_code)
+
+    async def threadpool(facility_id, internal_code):
+        return await run_in_threadpool(normalizer.fetch_local_mapping, facility_id, internal_code)
+
+    repository = AsyncMappingRepository(
+        AsyncDatabasePool(min_size=args.pool_size, max_size=args.pool_size)
+    )
+    await repository.start()
+
+    modes = {
+        "psycopg2-blocking": blocking,
+        "psycopg2-threadpool": threadpool,
+        "asyncpg": repository.fetch_mapping,
+    }
+    try:
+        for name in args.modes.split(","):
+            lookup = modes[name]
+            await run_clients(lookup, min(args.clients, 10), 5, keys)  # warm-up
+            samples, elapsed = await run_clients(lookup, args.clients, args.lookups, keys)
+            summary = latency_summary(samples)
+            summary["lookups_per_sec"] = round(len(samples) / elapsed, 1)
+            results.append({"mode": name, "clients": args.clients, **summary})
+    finally:
+        await repository.close()
+
+    print_table(f"Mapping lookup latency ({args.clients} concurrent clients)", results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalizer lookup driver benchmark")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent clients")
+    parser.add_argument("--lookups", type=int, default=50, help="Lookups per client")
+    parser.add_argument("--facility-id", type=int, default=1)
+    parser.add_argument("--codes", default="LAB-CBC-01,RAD-CXR-01,CONS-GEN-01,UNKNOWN-01",
+                        help="Comma-separated internal codes to look up")
+    parser.add_argument("--pool-size", type=int, default=20, help="asyncpg pool size")
+    parser.add_argument("--modes", default="psycopg2-blocking,psycopg2-threadpool,asyncpg")
+    asyncio.run(benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Pricing Kernel Benchmark
+========================
+
+Throughput of the rules engine's markup + rounding + claim totals on
+synthetic line items priced from a catalogue of --codes prices (no database
+needed):
+
+- decimal-float: the previous per-item path, Decimal(1 + markup_pct / 100)
+                 from a float, quantize, then float() per line and
+                 Decimal(str()) per total
+- kernel-scalar: pricing_kernel.apply_markup per item (Python integers)
+- kernel-batch:  pricing_kernel.apply_markup_batch + claim_totals over the
+                 whole batch (NumPy int64)
+
+"mismatches" counts lines whose result differs from the exact Decimal
+reference (Decimal(str(markup_pct)), quantize half-even).
+
+Usage:
+    python tests/benchmarks/bench_pricing_kernel.py --items 10000,100000,1000000
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from bench_utils import add_service_path, print_table
+
+add_service_path("financial-rules-engine")
+
+from pricing_kernel import apply_markup, apply_markup_batch, claim_totals, to_halalas, to_halalas_array  # noqa: E402
+
+MARKUPS = [10.0, 15.0, 20.0, 25.0, 30.0]
+CENT = Decimal("0.01")
+
+
+def decimal_float(prices, markups, offsets):
+    nets = [
+        float((price * Decimal(1 + (markup / 100))).quantize(CENT))
+        for price, markup in zip(prices, markups)
+    ]
+    totals = [
+        sum((Decimal(str(net)) for net in nets[start:end]), Decimal("0.00"))
+        for start, end in zip(offsets, offsets[1:])
+    ]
+    return [to_halalas(net) for net in nets], totals
+
+
+def kernel_scalar(prices, markups, offsets):
+    nets = [apply_markup(to_halalas(price), markup) for price, markup in zip(prices, markups)]
+    totals = [sum(nets[start:end]) for start, end in zip(offsets, offsets[1:])]
+    return nets, totals
+
+
+def kernel_batch(prices, markups, offsets):
+    nets = apply_markup_batch(to_halalas_array(prices), markups)
+    return nets.tolist(), claim_totals(nets, offsets).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pricing kernel benchmark")
+    parser.add_argument("--items", default="10000,100000,1000000", help="Comma-separated line item counts")
+    parser.add_argument("--items-per-claim", type=int, default=8)
+    parser.add_argument("--codes", type=int, default=5000, help="Distinct catalogue prices")
+    parser.add_argument("--skip-slow-above", type=int, default=200000,
+                        help="Run the per-item modes only up to this many items")
+    parser.add_argument("--seed", type=int, default=19)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    modes = {"decimal-float": decimal_float, "kernel-scalar": kernel_scalar, "kernel-batch": kernel_batch}
+
+    catalogue = [Decimal(rng.randint(100, 5_000_000)).scaleb(-2) for _ in range(args.codes)]
+
+    results = []
+    for items in (int(n) for n in args.items.split(",")):
+        prices = rng.choices(catalogue, k=items)
+        markups = [rng.choice(MARKUPS) for _ in range(items)]
+        offsets = list(range(0, items, args.items_per_claim)) + [items]
+        reference = [
+            to_halalas((price * (1 + Decimal(str(markup)) / 100)).quantize(CENT))
+            for price, markup in zip(prices, markups)
+        ]
+
+        for name, run in modes.items():
+            if name != "kernel-batch" and items > args.skip_slow_above:
+                continue
+            started = time.perf_counter()
+            nets, _ = run(prices, markups, offsets)
+            elapsed = time.perf_counter() - started
+            results.append({
+                "items": items,
+                "mode": name,
+                "seconds": round(elapsed, 3),
+                "items_per_sec": int(items / elapsed),
+                "mismatches": sum(1 for net, expected in zip(nets, reference) if net != expected),
+            })
+
+        # Kernel alone, on prices already in halalas
+        halalas = np.array([to_halalas(price) for price in prices], dtype=np.int64)
+        tiers = np.array(markups)
+        started = time.perf_counter()
+        claim_totals(apply_markup_batch(halalas, tiers), offsets)
+        elapsed = time.perf_counter() - started
+        results.append({
+            "items": items,
+            "mode": "kernel-only",
+            "seconds": round(elapsed, 3),
+            "items_per_sec": int(items / elapsed),
+            "mismatches": "",
+        })
+
+    print_table("Pricing kernel (markup + rounding + claim totals)", results)
+
+
+if __name__ == "__main__":
+    main()
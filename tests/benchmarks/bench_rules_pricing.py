@@ -0,0 +1,112 @@
+"""
+Rules Engine Pricing Lookup Benchmark
+=====================================
+
+Latency of the database work behind one /validate call as the number of
+claim items grows:
+
+- per-item:     the original path - facility tier query, bundle query, then
+                one SELECT standard_price per item (N + 2 round trips)
+- single-query: pricing_repository.fetch_batch_pricing (1 round trip)
+
+Both run on one pooled connection, as /validate does. Requires a database
+loaded with database/schema.sql (DB_* environment variables).
+
+Usage:
+    python tests/benchmarks/bench_rules_pricing.py --items 1,5,10,25,50,100 --repeat 200
+"""
+
+import argparse
+import time
+from decimal import Decimal
+
+from bench_utils import add_service_path, latency_summary, print_table
+
+add_service_path("financial-rules-engine")
+
+from pricing_repository import FACILITY_QUERY, fetch_batch_pricing  # noqa: E402
+from sbs_common.db import DatabasePool  # noqa: E402
+
+# The original check_for_bundles query
+LEGACY_BUNDLE_QUERY = """
+SELECT sb.bundle_id, sb.bundle_code, sb.bundle_name, sb.total_allowed_price,
+       COUNT(bi.sbs_code) AS matched_items
+FROM service_bundles sb
+JOIN bundle_items bi ON sb.bundle_id = bi.bundle_id
+WHERE bi.sbs_code = ANY(%(codes)s) AND sb.is_active = TRUE
+GROUP BY sb.bundle_id, sb.bundle_code, sb.bundle_name, sb.total_allowed_price
+HAVING COUNT(bi.sbs_code) >= 2
+ORDER BY matched_items DESC
+LIMIT 1
+"""
+
+
+def per_item_pricing(conn, facility_id, codes):
+    cursor = conn.cursor()
+    cursor.execute(FACILITY_QUERY, {"facility_ids": [facility_id]})
+    facility = cursor.fetchone()
+    cursor.execute(LEGACY_BUNDLE_QUERY, {"codes": codes})
+    bundle = cursor.fetchone()
+    prices = {}
+    for code in codes:
+        cursor.execute(
+            "SELECT standard_price FROM sbs_master_catalogue WHERE sbs_id = %s AND is_active = TRUE",
+            (code,)
+        )
+        row = cursor.fetchone()
+        if row and row[0]:
+            prices[code] = Decimal(row[0])
+    cursor.close()
+    return {"facility": facility, "prices": prices, "bundle": bundle}
+
+
+def single_query_pricing(conn, facility_id, codes):
+    return fetch_batch_pricing(conn, [facility_id], codes)
+
+
+def claim_codes(conn, count):
+    """count claim codes drawn from the active catalogue (wrapping around if it is smaller)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT sbs_id FROM sbs_master_catalogue WHERE is_active = TRUE ORDER BY sbs_id")
+    catalogue = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return [catalogue[i % len(catalogue)] for i in range(count)]
+
+
+def time_mode(lookup, conn, facility_id, codes, repeat):
+    for _ in range(min(repeat, 10)):  # warm-up
+        lookup(conn, facility_id, codes)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        lookup(conn, facility_id, codes)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rules engine pricing lookup benchmark")
+    parser.add_argument("--items", default="1,5,10,25,50,100", help="Comma-separated claim item counts")
+    parser.add_argument("--repeat", type=int, default=200, help="Claims per item count and mode")
+    parser.add_argument("--facility-id", type=int, default=1)
+    args = parser.parse_args()
+
+    modes = {"per-item": per_item_pricing, "single-query": single_query_pricing}
+    db_pool = DatabasePool(min_size=1, max_size=1)
+    results = []
+    try:
+        with db_pool.connection() as conn:
+            for count in (int(n) for n in args.items.split(",")):
+                codes = claim_codes(conn, count)
+                for name, lookup in modes.items():
+                    samples = time_mode(lookup, conn, args.facility_id, codes, args.repeat)
+                    results.append({"items": count, "mode": name, **latency_summary(samples)})
+                conn.rollback()
+    finally:
+        db_pool.close()
+
+    print_table("Claim pricing lookup latency by item count", results)
+
+
+if __name__ == "__main__":
+    main()
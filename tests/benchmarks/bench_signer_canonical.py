@@ -0,0 +1,135 @@
+"""
+Signer Canonicalization Benchmark
+=================================
+
+Time and peak memory to turn a FHIR bundle into the bytes that get signed,
+for bundles of --sizes bytes built from the SampleData fixtures, in two
+shapes: "items" (many claim items) and "attachments" (mostly ~64KB Base64
+attachments, where json.dumps is close to a memory copy already):
+
+- json-encode:     canonicalize_payload(payload).encode('utf-8') (stdlib,
+                   str then a second, encoded copy)
+- canonical-bytes: canonical.canonical_bytes (orjson, straight to bytes)
+- sha256-buffered: SHA-256 of canonical_bytes, what a buffered signature hashes
+- sha256-streamed: canonical.canonical_digest (canonical form hashed chunk by
+                   chunk, as signed with SIGNER_STREAMING_MIN_BYTES)
+
+"identical" checks the byte modes produce the same bytes and the digest modes
+the SHA-256 of those bytes; compare "peak_mb" of the two digest modes.
+
+Usage:
+    python tests/benchmarks/bench_signer_canonical.py --sizes 10KB,100KB,1MB,10MB
+"""
+
+import argparse
+import base64
+import copy
+import hashlib
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from bench_utils import add_service_path, print_table
+
+add_service_path("signer-service")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from canonical import canonical_bytes, canonical_digest, canonicalize_payload  # noqa: E402
+from fixtures_data import SAMPLE_FHIR_BUNDLE_COMPLEX  # noqa: E402
+
+UNITS = {"KB": 1024, "MB": 1024 * 1024}
+
+
+def parse_size(text: str) -> int:
+    for unit, factor in UNITS.items():
+        if text.upper().endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def bundle_of_size(target: int, rng: random.Random, attachments: bool) -> dict:
+    """SAMPLE_FHIR_BUNDLE_COMPLEX grown with claim items (and attachments) until its canonical form reaches target bytes"""
+    bundle = copy.deepcopy(SAMPLE_FHIR_BUNDLE_COMPLEX)
+    claim = next(entry["resource"] for entry in bundle["entry"] if entry["resource"]["resourceType"] == "Claim")
+    template = claim["item"][0]
+    item_bytes = len(canonical_bytes(template)) + 1
+    size = len(canonical_bytes(bundle))
+    while size < target:
+        # Items alone: add about as many as still fit, then re-measure
+        count = 1 if attachments else max(1, (target - size) // item_bytes)
+        for _ in range(count):
+            item = copy.deepcopy(template)
+            item["sequence"] = len(claim["item"]) + 1
+            item["net"] = {"value": round(rng.uniform(10, 5000), 2), "currency": "SAR"}
+            claim["item"].append(item)
+        if attachments and target - size > 64 * 1024:
+            claim.setdefault("supportingInfo", []).append({
+                "sequence": len(claim["item"]),
+                "category": {"coding": [{"code": "attachment"}]},
+                "valueAttachment": {"contentType": "application/pdf", "title": f"report-{len(claim['item'])}.pdf",
+                                    "data": base64.b64encode(rng.randbytes(48 * 1024)).decode()},
+            })
+        size = len(canonical_bytes(bundle))
+    return bundle
+
+
+def measure(function, payload, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(payload)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    function(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signer canonicalization benchmark")
+    parser.add_argument("--sizes", default="10KB,100KB,1MB,10MB", help="Comma-separated canonical bundle sizes")
+    parser.add_argument("--shapes", default="items,attachments")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=24)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    modes = {
+        "json-encode": lambda payload: canonicalize_payload(payload).encode("utf-8"),
+        "canonical-bytes": canonical_bytes,
+        "sha256-buffered": lambda payload: hashlib.sha256(canonical_bytes(payload)).digest(),
+        "sha256-streamed": canonical_digest,
+    }
+
+    results = []
+    for shape, size_text in itertools.product(args.shapes.split(","), args.sizes.split(",")):
+        bundle = bundle_of_size(parse_size(size_text), rng, attachments=shape == "attachments")
+        expected = modes["json-encode"](bundle)
+        expected_digest = hashlib.sha256(expected).digest()
+        repeat = max(1, args.repeat if len(expected) < 5 * UNITS["MB"] else args.repeat // 2)
+        baseline = None
+        for name, function in modes.items():
+            seconds, peak = measure(function, bundle, repeat)
+            baseline = baseline or seconds
+            results.append({
+                "shape": shape,
+                "size": size_text,
+                "bytes": len(expected),
+                "mode": name,
+                "median_ms": round(seconds * 1000, 3),
+                "mb_per_sec": round(len(expected) / seconds / UNITS["MB"], 1),
+                "speedup": round(baseline / seconds, 2),
+                "peak_mb": round(peak / UNITS["MB"], 2),
+                "identical": function(bundle) in (expected, expected_digest),
+            })
+
+    print_table("Canonicalization (payload dict -> signed bytes)", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Signer Executor Benchmark
+=========================
+
+Signatures per second of the signer's SigningExecutor (canonicalization +
+SHA256withRSA) by executor mode, worker count and key size, on a generated
+key (no database or running service needed):
+
+- thread:  workers share the parsed key; scales with workers only as far as
+           the RSA backend releases the GIL
+- process: spawned workers with per-process key caches (the first signature
+           per worker includes loading the key; a warm-up round is excluded)
+
+Compare "sigs_per_sec" across --workers against "cores" (os.cpu_count()).
+
+Usage:
+    python tests/benchmarks/bench_signer_executor.py --workers 1,2,4,8 --signatures 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from bench_utils import add_service_path, print_table
+
+add_service_path("signer-service")
+
+from signing_executor import EXECUTOR_MODES, KeyRef, SigningExecutor  # noqa: E402
+
+
+def claim_payload(index: int) -> dict:
+    return {
+        "resourceType": "Claim",
+        "id": f"claim-{index}",
+        "patient": {"reference": "Patient/1"},
+        "item": [{"sequence": i, "productOrService": {"coding": [{"code": f"SBS-{i}"}]}, "net": {"value": 100.0 + i}}
+                 for i in range(1, 9)],
+    }
+
+
+def write_key(directory: str, key_size: int):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    path = os.path.join(directory, f"key_{key_size}.pem")
+    with open(path, "wb") as key_file:
+        key_file.write(private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return private_key, KeyRef(path, key_size, f"BENCH-{key_size}")
+
+
+def run(executor: SigningExecutor, private_key, key_ref: KeyRef, payloads) -> float:
+    started = time.perf_counter()
+    futures = [executor.submit(payload, private_key, key_ref) for payload in payloads]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - started
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Signer executor benchmark")
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, cores})),
+                        help="Comma-separated worker counts")
+    parser.add_argument("--modes", default=",".join(EXECUTOR_MODES))
+    parser.add_argument("--key-sizes", default="2048,4096")
+    parser.add_argument("--signatures", type=int, default=1000)
+    args = parser.parse_args()
+
+    payloads = [claim_payload(i) for i in range(args.signatures)]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for key_size in (int(n) for n in args.key_sizes.split(",")):
+            private_key, key_ref = write_key(directory, key_size)
+            for mode in args.modes.split(","):
+                for workers in (int(n) for n in args.workers.split(",")):
+                    executor = SigningExecutor(mode, workers)
+                    try:
+                        run(executor, private_key, key_ref, payloads[:workers * 4])  # warm-up
+                        elapsed = run(executor, private_key, key_ref, payloads)
+                    finally:
+                        executor.shutdown()
+                    results.append({
+                        "key_bits": key_size,
+                        "mode": mode,
+                        "workers": workers,
+                        "cores": cores,
+                        "seconds": round(elapsed, 3),
+                        "sigs_per_sec": int(len(payloads) / elapsed),
+                    })
+
+    print_table("Signer executor throughput (canonicalize + SHA256withRSA)", results)
+
+
+if __name__ == "__main__":
+    main()
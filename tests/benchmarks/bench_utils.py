@@ -0,0 +1,58 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Benchmarks are standalone scripts (bench_*.py), not pytest tests; run them
+against a prepared environment, e.g.:
+    python tests/benchmarks/bench_normalizer_lookup.py --clients 200
+"""
+
+import os
+import statistics
+import sys
+from typing import Dict, List
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Services import the shared sbs_common package from the repository root
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def add_service_path(service_dir: str) -> None:
+    """Make a service's modules importable (service dirs are not packages)"""
+    path = os.path.join(REPO_ROOT, service_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted sample list"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "max_ms": round(max(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+
+def print_table(title: str, rows: List[Dict[str, object]]) -> None:
+    """Print a list of dicts as an aligned text table"""
+    print(f"\n{title}")
+    print("=" * len(title))
+    if not rows:
+        print("(no results)")
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(str(c).ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
@@ -13,6 +13,8 @@ from datetime import datetime, date
 
 # Add tests directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
+# Repository root, for the shared sbs_common package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from fixtures_data import (  # noqa: E402
     SampleData,
@@ -0,0 +1,175 @@
+"""
+Test Suite for the Rules Engine Bundle Index
+============================================
+
+Tests for:
+- Inverted index matching with mandatory items and quantities
+- Non-overlapping bundle allocation minimizing the payable amount
+  (exact search, greedy fallback, time budget)
+- Leftover lines priced individually
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "financial-rules-engine"))
+
+from bundle_allocation import allocate_bundles  # noqa: E402
+from bundle_index import BundleIndex, ClaimLine, claim_units  # noqa: E402
+
+
+def bundle_rows(bundle_id, code, price, items):
+    """items: (sbs_code, quantity, is_mandatory)"""
+    return [
+        {"bundle_id": bundle_id, "bundle_code": code, "bundle_name": code, "total_allowed_price": price,
+         "sbs_code": sbs_code, "quantity": quantity, "is_mandatory": mandatory}
+        for sbs_code, quantity, mandatory in items
+    ]
+
+
+def claim(*codes, prices=None):
+    prices = prices or {}
+    return [ClaimLine(i, code, 1, prices.get(code, Decimal("100.00"))) for i, code in enumerate(codes, start=1)]
+
+
+class TestMatching:
+    """Tests for BundleIndex.match"""
+
+    def test_mandatory_items_are_required(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-CBC", "150.00", [
+            ("LAB-1", 1, True), ("LAB-2", 1, True), ("LAB-3", 1, False)
+        ]))
+
+        assert [b.bundle_code for b in index.match({"LAB-1": 1, "LAB-2": 1})] == ["BND-CBC"]
+        assert index.match({"LAB-1": 1, "LAB-3": 1}) == []
+
+    def test_quantities_are_required(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-PT", "300.00", [
+            ("PT-1", 3, True), ("CONS-1", 1, True)
+        ]))
+
+        assert index.match({"PT-1": 2, "CONS-1": 1}) == []
+        assert len(index.match({"PT-1": 3, "CONS-1": 1})) == 1
+
+    def test_optional_items_alone_need_two_matches(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-OPT", "90.00", [
+            ("A", 1, False), ("B", 1, False), ("C", 1, False)
+        ]))
+
+        assert index.match({"A": 1}) == []
+        assert len(index.match({"A": 1, "C": 1})) == 1
+
+    def test_bundles_without_price_are_skipped(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-X", None, [("A", 1, True), ("B", 1, True)]))
+
+        assert len(index) == 0
+
+
+def allocate(index, lines, **kwargs):
+    allocation = allocate_bundles(index, lines, **kwargs)
+    return allocation.assignments, allocation.leftovers
+
+
+class TestAllocation:
+    """Tests for allocate_bundles"""
+
+    def test_non_overlapping_bundles_and_leftovers(self):
+        index = BundleIndex.from_rows(
+            bundle_rows(1, "BND-AB", "150.00", [("A", 1, True), ("B", 1, True)])
+            + bundle_rows(2, "BND-CD", "120.00", [("C", 1, True), ("D", 1, True)])
+        )
+        lines = claim("A", "B", "C", "D", "E")
+
+        assignments, leftovers = allocate(index, lines)
+
+        assert sorted(a.bundle.bundle_code for a in assignments) == ["BND-AB", "BND-CD"]
+        assert [line.sbs_code for line in leftovers] == ["E"]
+        assert sum(a.saving for a in assignments) == Decimal("130.00")
+
+    def test_overlapping_bundles_keep_the_larger_saving(self):
+        index = BundleIndex.from_rows(
+            bundle_rows(1, "BND-AB", "150.00", [("A", 1, True), ("B", 1, True)])
+            + bundle_rows(2, "BND-BC", "100.00", [("B", 1, True), ("C", 1, True)])
+        )
+
+        assignments, leftovers = allocate(index, claim("A", "B", "C"))
+
+        assert [a.bundle.bundle_code for a in assignments] == ["BND-BC"]
+        assert [line.sbs_code for line in leftovers] == ["A"]
+
+    def test_bundle_costing_more_than_items_is_not_applied(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-AB", "250.00", [("A", 1, True), ("B", 1, True)]))
+
+        assignments, leftovers = allocate(index, claim("A", "B"))
+
+        assert assignments == []
+        assert len(leftovers) == 2
+
+    def test_quantity_consumes_whole_lines(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-PT", "250.00", [("PT", 3, True), ("CONS", 1, True)]))
+        lines = [
+            ClaimLine(1, "PT", 2, Decimal("100.00")),
+            ClaimLine(2, "PT", 1, Decimal("100.00")),
+            ClaimLine(3, "CONS", 1, Decimal("100.00")),
+            ClaimLine(4, "PT", 1, Decimal("100.00")),
+        ]
+
+        assert claim_units(lines) == {"PT": 4, "CONS": 1}
+        assignments, leftovers = allocate(index, lines)
+
+        assert sorted(line.sequence for line in assignments[0].lines) == [1, 2, 3]
+        assert [line.sequence for line in leftovers] == [4]
+
+    def test_unmatched_claim_is_priced_individually(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-AB", "150.00", [("A", 1, True), ("B", 1, True)]))
+
+        assignments, leftovers = allocate(index, claim("A", "Z"))
+
+        assert assignments == []
+        assert [line.sbs_code for line in leftovers] == ["A", "Z"]
+
+    def test_exact_search_beats_greedy(self):
+        # Greedy by saving takes ABCD (200), greedy by ratio takes BC (180); AB + CD saves 300
+        index = BundleIndex.from_rows(
+            bundle_rows(1, "BND-ABCD", "200.00", [("A", 1, True), ("B", 1, True), ("C", 1, True), ("D", 1, True)])
+            + bundle_rows(2, "BND-AB", "50.00", [("A", 1, True), ("B", 1, True)])
+            + bundle_rows(3, "BND-BC", "20.00", [("B", 1, True), ("C", 1, True)])
+            + bundle_rows(4, "BND-CD", "50.00", [("C", 1, True), ("D", 1, True)])
+        )
+        lines = claim("A", "B", "C", "D")
+
+        greedy = allocate_bundles(index, lines, max_exact_candidates=0)
+        exact = allocate_bundles(index, lines)
+
+        assert (greedy.method, greedy.saving) == ("greedy", Decimal("200.00"))
+        assert (exact.method, exact.saving) == ("exact", Decimal("300.00"))
+        assert sorted(a.bundle.bundle_code for a in exact.assignments) == ["BND-AB", "BND-CD"]
+        assert exact.leftovers == []
+
+    def test_bundle_applies_repeatedly_on_large_claims(self):
+        index = BundleIndex.from_rows(bundle_rows(1, "BND-AB", "150.00", [("A", 1, True), ("B", 1, True)]))
+        lines = claim(*(["A", "B"] * 60 + ["A"]))
+
+        allocation = allocate_bundles(index, lines)
+
+        assert len(allocation.assignments) == 60
+        assert [line.sbs_code for line in allocation.leftovers] == ["A"]
+        assert allocation.saving == Decimal("3000.00")
+
+    def test_time_budget_returns_best_found(self):
+        # 20 overlapping pair bundles around a ring of 20 codes: large search tree
+        codes = [f"C{i:02d}" for i in range(20)]
+        rows = []
+        for i, code in enumerate(codes):
+            rows += bundle_rows(i + 1, f"BND-{i:02d}", "100.00", [(code, 1, True), (codes[(i + 1) % 20], 1, True)])
+        index = BundleIndex.from_rows(rows)
+        lines = claim(*(codes * 3))
+
+        bounded = allocate_bundles(index, lines, max_exact_candidates=50, time_budget=0)
+        greedy = allocate_bundles(index, lines, max_exact_candidates=0)
+
+        assert bounded.method == "bounded"
+        assert bounded.saving >= greedy.saving == Decimal("3000.00")
+        used = [line.sequence for a in bounded.assignments for line in a.lines]
+        assert len(used) == len(set(used))
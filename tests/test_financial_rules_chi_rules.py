@@ -0,0 +1,183 @@
+"""
+Test Suite for Rules Engine CHI Claim Rules
+===========================================
+
+Tests for:
+- Compiling declarative conditions (all/any/not, operators, exact money values)
+- Indexing by SBS code, category and tier (only applicable rules evaluate)
+- Coverage limits from pricing_tier_rules as built-in claim rules
+- Reject / cap / flag outcomes when pricing claims
+- Per-rule counters
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "financial-rules-engine"))
+
+from bundle_index import BundleIndex  # noqa: E402
+from chi_rules import CLAIM_FIELDS, ITEM_FIELDS, RuleCompileError, RuleSet, compile_condition  # noqa: E402
+from claim_pricing import ClaimPricingError, price_claims  # noqa: E402
+
+CATEGORIES = {"LAB-1": "Lab", "LAB-2": "Lab", "RAD-1": "Radiology"}
+PRICES = {"LAB-1": Decimal("100.00"), "LAB-2": Decimal("50.00"), "RAD-1": Decimal("400.00")}
+FACILITIES = {
+    1: {"facility_id": 1, "accreditation_tier": 1, "markup_pct": 10.0, "tier_description": "Reference"},
+    2: {"facility_id": 2, "accreditation_tier": 2, "markup_pct": 20.0, "tier_description": "Tertiary"},
+}
+
+
+def rule(rule_code, scope="item", condition=None, action="flag", **fields):
+    row = {"rule_code": rule_code, "scope": scope, "sbs_code": None, "category": None, "tier_level": None,
+           "condition": condition or {}, "action": action, "action_value": None, "message": None, "priority": 100}
+    row.update(fields)
+    return row
+
+
+def item(code, quantity=1):
+    return {"productOrService": {"coding": [{"system": "http://sbs.sa/coding/services", "code": code}]},
+            "quantity": {"value": quantity}}
+
+
+def price(claims, rules):
+    return price_claims(claims, FACILITIES, PRICES, BundleIndex(()), "v1",
+                        max_exact_candidates=16, time_budget=0.02, rules=rules)
+
+
+class TestConditions:
+    """Tests for compile_condition"""
+
+    def test_combinators_and_operators(self):
+        predicate = compile_condition({"all": [
+            {"field": "units", "op": ">=", "value": 2},
+            {"any": [{"field": "category", "op": "in", "value": ["Lab", "Dental"]},
+                     {"field": "sbs_code", "op": "==", "value": "RAD-1"}]},
+            {"not": {"field": "facility_id", "op": "in", "value": [9]}},
+        ]}, ITEM_FIELDS)
+
+        assert predicate({"units": 2, "category": "Lab", "sbs_code": "LAB-1", "facility_id": 1})
+        assert predicate({"units": 3, "category": "Radiology", "sbs_code": "RAD-1", "facility_id": 1})
+        assert not predicate({"units": 1, "category": "Lab", "sbs_code": "LAB-1", "facility_id": 1})
+        assert not predicate({"units": 2, "category": "Lab", "sbs_code": "LAB-1", "facility_id": 9})
+
+    def test_money_is_compared_exactly_and_missing_values_never_match(self):
+        predicate = compile_condition({"field": "base_price", "op": ">", "value": 0.1}, ITEM_FIELDS)
+
+        assert predicate({"base_price": Decimal("0.11")})
+        assert not predicate({"base_price": Decimal("0.10")})
+        assert not predicate({"base_price": None})
+
+    def test_contains_on_claim_codes(self):
+        predicate = compile_condition({"field": "sbs_codes", "op": "contains", "value": "RAD-1"}, CLAIM_FIELDS)
+
+        assert predicate({"sbs_codes": frozenset({"RAD-1", "LAB-1"})})
+
+    @pytest.mark.parametrize("condition", [
+        {"field": "price", "op": ">", "value": 1},
+        {"field": "units", "op": "~", "value": 1},
+        {"field": "units", "op": ">"},
+        {"field": "units", "op": ">", "value": "10"},
+        {"field": "sbs_code", "op": "==", "value": 7},
+        {"field": "facility_id", "op": "in", "value": 3},
+        {"field": "units", "op": "contains", "value": 1},
+    ])
+    def test_invalid_conditions(self, condition):
+        with pytest.raises(RuleCompileError):
+            compile_condition(condition, ITEM_FIELDS)
+
+
+class TestRuleSet:
+    """Tests for RuleSet indexing and compilation"""
+
+    def test_only_applicable_rules_are_evaluated(self):
+        rules = RuleSet.from_rows([
+            rule("CODE", sbs_code="LAB-1"),
+            rule("CATEGORY", category="Radiology"),
+            rule("TIER-2", tier_level=2),
+            rule("ANY", priority=1),
+        ], categories=CATEGORIES)
+
+        assert [r.rule_code for r in rules.item_rules("LAB-1", 1)] == ["ANY", "CODE"]
+        assert [r.rule_code for r in rules.item_rules("RAD-1", 2)] == ["ANY", "CATEGORY", "TIER-2"]
+
+        rules.evaluate_item("LAB-2", 1, PRICES["LAB-2"], 1, 1)
+        evaluations = {stat["rule_code"]: stat["evaluations"] for stat in rules.stats()}
+        assert evaluations == {"ANY": 1, "CODE": 0, "CATEGORY": 0, "TIER-2": 0}
+
+    def test_invalid_rules_are_skipped(self):
+        rules = RuleSet.from_rows([
+            rule("OK"),
+            rule("BAD-CAP", action="cap"),
+            rule("BAD-FIELD", condition={"field": "nope", "op": "==", "value": 1}),
+        ])
+
+        assert [r.rule_code for r in rules.rules] == ["OK"]
+        assert len(rules.errors) == 2
+
+    def test_mistyped_literal_is_a_compile_error(self):
+        rules = RuleSet.from_rows([rule("BAD-UNITS", condition={"field": "units", "op": ">", "value": "10"})])
+
+        assert rules.rules == ()
+        assert rules.errors and "BAD-UNITS" in rules.errors[0]
+        assert rules.evaluate_item("LAB-1", 2, PRICES["LAB-1"], 1, 1) == []
+
+    def test_failing_predicate_counts_as_no_match(self):
+        rules = RuleSet.from_rows([rule("UNITS", condition={"field": "units", "op": ">", "value": 1})])
+
+        assert rules.evaluate_item("LAB-1", "2", PRICES["LAB-1"], 1, 1) == []
+        assert [(stat["evaluations"], stat["matches"], stat["errors"]) for stat in rules.stats()] == [(1, 0, 1)]
+
+    def test_coverage_limits_become_claim_rules(self):
+        rules = RuleSet.from_rows([], [
+            {"tier_level": 1, "base_coverage_limit": "300.00", "annual_coverage_limit": "1000.00"},
+        ])
+
+        assert {r.rule_code: r.action for r in rules.claim_rules(1)} == {
+            "TIER1-BASE-COVERAGE": "cap", "TIER1-ANNUAL-COVERAGE": "flag"
+        }
+        assert rules.claim_rules(2) == ()
+
+
+class TestPricingWithRules:
+    """Tests for rule outcomes in price_claims"""
+
+    def test_item_reject_cap_and_flag(self):
+        rules = RuleSet.from_rows([
+            rule("LAB-UNITS", category="Lab", condition={"field": "units", "op": ">", "value": 5},
+                 action="reject", message="Too many units"),
+            rule("RAD-CAP", sbs_code="RAD-1", action="cap", action_value="300.00"),
+            rule("REVIEW", condition={"field": "units", "op": ">=", "value": 2}),
+        ], categories=CATEGORIES)
+
+        (claim,) = price([(1, [item("LAB-1", 6), item("RAD-1", 2), item("LAB-2")])], rules)
+
+        assert [line["sequence"] for line in claim["item"]] == [2, 3]
+        assert claim["item"][0]["extensions"]["base_price"] == 300.0
+        assert claim["total"]["value"] == 385.0
+        applied = [(r["rule"], r["action"], r.get("sequence")) for r in claim["extensions"]["rules_applied"]]
+        assert applied == [("LAB-UNITS", "reject", 1), ("RAD-CAP", "cap", 2), ("REVIEW", "flag", 2)]
+
+    def test_claim_coverage_cap_and_reject(self):
+        rules = RuleSet.from_rows(
+            [rule("NO-RAD", scope="claim", tier_level=2, action="reject", message="Radiology not covered",
+                  condition={"field": "sbs_codes", "op": "contains", "value": "RAD-1"})],
+            [{"tier_level": 1, "base_coverage_limit": "300.00", "annual_coverage_limit": None}],
+            CATEGORIES
+        )
+
+        capped, rejected = price([(1, [item("RAD-1")]), (2, [item("RAD-1")])], rules)
+
+        assert capped["total"]["value"] == 440.0
+        assert capped["extensions"]["payable_amount"] == 300.0
+        assert capped["extensions"]["rules_applied"][0]["rule"] == "TIER1-BASE-COVERAGE"
+        assert isinstance(rejected, ClaimPricingError) and rejected.status_code == 422
+        assert "NO-RAD" in rejected.message
+
+    def test_without_rules_payable_equals_total(self):
+        (claim,) = price([(1, [item("LAB-1")])], None)
+
+        assert claim["extensions"]["payable_amount"] == claim["total"]["value"] == 110.0
+        assert claim["extensions"]["rules_applied"] == []
@@ -0,0 +1,135 @@
+"""
+Test Suite for Rules Engine Claim Pricing
+=========================================
+
+Tests for:
+- Pricing a claim from resolved facility tiers, prices and bundles
+- Batches priced together, with per-claim errors (unknown facility)
+- Parsing /validate/batch bodies (JSON array, and NDJSON as it streams in)
+"""
+
+import asyncio
+import json
+import os
+import sys
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "financial-rules-engine"))
+
+from bundle_index import BundleIndex  # noqa: E402
+from claim_pricing import (  # noqa: E402
+    ClaimPricingError,
+    coded_items,
+    iter_ndjson_claims,
+    parse_claim_array,
+    price_claim,
+    price_claims
+)
+
+FACILITY = {"facility_id": 1, "accreditation_tier": 2, "markup_pct": 20.0, "tier_description": "Tertiary"}
+PRICES = {"LAB-1": Decimal("100.00"), "LAB-2": Decimal("50.00"), "CONS-1": Decimal("200.00")}
+BUNDLES = BundleIndex.from_rows([
+    {"bundle_id": 3, "bundle_code": "BND-LAB", "bundle_name": "Labs", "total_allowed_price": "120.00",
+     "sbs_code": code, "quantity": 1, "is_mandatory": True}
+    for code in ("LAB-1", "LAB-2")
+])
+
+
+def item(code, quantity=None):
+    entry = {"productOrService": {"coding": [{"system": "http://sbs.sa/coding/services", "code": code}]}}
+    if quantity is not None:
+        entry["quantity"] = {"value": quantity}
+    return entry
+
+
+def price(items, facility=FACILITY):
+    return price_claim(1, items, facility, PRICES, BUNDLES, "v1", max_exact_candidates=16, time_budget=0.02)
+
+
+class TestPriceClaim:
+    """Tests for price_claim"""
+
+    def test_bundle_and_individual_items(self):
+        result = price([item("LAB-1"), item("CONS-1"), item("LAB-2")])
+
+        assert [line["sequence"] for line in result["item"]] == [1, 2]
+        bundle, consult = result["item"]
+        assert bundle["productOrService"]["coding"][0]["code"] == "BND-LAB"
+        assert bundle["extensions"]["item_sequences"] == [1, 3]
+        assert bundle["net"]["value"] == 144.0
+        assert consult["net"]["value"] == 240.0
+        assert result["total"]["value"] == 384.0
+        assert result["extensions"]["bundles_applied"] == ["BND-LAB"]
+        assert result["extensions"]["pricing_version"] == "v1"
+
+    def test_unpriced_items_are_dropped(self):
+        result = price([item("CONS-1"), item("UNKNOWN")])
+
+        assert [line["sequence"] for line in result["item"]] == [1]
+        assert result["extensions"]["bundle_applied"] is False
+
+    def test_unknown_facility_is_a_404(self):
+        with pytest.raises(ClaimPricingError) as excinfo:
+            price([item("CONS-1")], facility=None)
+
+        assert excinfo.value.status_code == 404
+
+    def test_batch_keeps_order_and_errors_in_place(self):
+        facilities = {1: FACILITY, 2: dict(FACILITY, facility_id=2, markup_pct=15.0)}
+        claims = [(1, [item("CONS-1")]), (99, [item("CONS-1")]), (2, [item("LAB-1"), item("LAB-2")]), (2, [])]
+
+        results = price_claims(claims, facilities, PRICES, BUNDLES, "v1", max_exact_candidates=16, time_budget=0.02)
+
+        assert results[0]["total"]["value"] == 240.0
+        assert isinstance(results[1], ClaimPricingError)
+        assert results[2]["total"]["value"] == 138.0
+        assert results[3]["item"] == [] and results[3]["total"]["value"] == 0.0
+
+    def test_coded_items_keep_sequences_and_units(self):
+        items = [{"productOrService": {"coding": []}}, item("LAB-1", quantity=3), item("LAB-2", quantity=0)]
+
+        assert coded_items(items) == [(2, "LAB-1", 3), (3, "LAB-2", 1)]
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(entries):
+    return [entry async for entry in entries]
+
+
+class TestParseClaimBatch:
+    """Tests for parse_claim_array and iter_ndjson_claims"""
+
+    def test_json_array_with_wrapped_claims(self):
+        body = json.dumps([{"facility_id": 1, "item": []}, {"claim": {"facility_id": 2, "item": []}}])
+
+        claims = parse_claim_array(body.encode())
+
+        assert [claim["facility_id"] for claim in claims] == [1, 2]
+
+    def test_ndjson_keeps_bad_lines_in_place(self):
+        body = _chunks(b'{"facility_id": 1, "item": []}\n\nnot json\n[1, 2]\n{"facility_id": 3, "item": []}\n')
+
+        entries = asyncio.run(_collect(iter_ndjson_claims(body)))
+
+        assert len(entries) == 4
+        assert entries[0]["facility_id"] == 1
+        assert entries[1].status_code == 400
+        assert entries[2].status_code == 422
+        assert entries[3]["facility_id"] == 3
+
+    def test_ndjson_lines_split_across_chunks(self):
+        body = _chunks(b'{"facility_id": 1, "it', b'em": []}\n{"claim": {"facility', b'_id": 2, "item": []}}')
+
+        entries = asyncio.run(_collect(iter_ndjson_claims(body)))
+
+        assert [entry["facility_id"] for entry in entries] == [1, 2]
+
+    def test_malformed_array_raises(self):
+        with pytest.raises(ValueError):
+            parse_claim_array(b'[{"facility_id": 1')
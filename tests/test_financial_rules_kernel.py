@@ -0,0 +1,102 @@
+"""
+Test Suite for the Rules Engine Pricing Kernel
+==============================================
+
+Tests for:
+- Exact markups (no float multiplier) in integer halalas
+- Half-even and half-up rounding identical to Decimal.quantize
+- Vectorized batches with per-line markups, int64 overflow fallback
+- Per-claim totals
+"""
+
+import os
+import random
+import sys
+from decimal import ROUND_HALF_EVEN as DECIMAL_HALF_EVEN, ROUND_HALF_UP as DECIMAL_HALF_UP, Decimal
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "financial-rules-engine"))
+
+from pricing_kernel import (  # noqa: E402
+    ROUND_HALF_EVEN,
+    ROUND_HALF_UP,
+    apply_markup,
+    apply_markup_batch,
+    claim_totals,
+    from_halalas,
+    markup_ratio,
+    to_halalas
+)
+
+MARKUPS = [0.0, 5.0, 10.0, 12.5, 15.0, 20.0, 7.77, 0.1, 100.0, 33.333333333333336]
+
+
+def decimal_markup(halalas, markup_pct, rounding):
+    """Reference: exact Decimal product quantized to 0.01"""
+    price = Decimal(halalas).scaleb(-2)
+    marked_up = price * (1 + Decimal(str(markup_pct)) / 100)
+    return to_halalas(marked_up.quantize(Decimal("0.01"), rounding=rounding))
+
+
+class TestScalar:
+    """Tests for apply_markup and conversions"""
+
+    def test_markup_ratio_is_exact(self):
+        assert markup_ratio(10.0) == (11, 10)
+        assert markup_ratio(12.5) == (9, 8)
+
+    def test_float_multiplier_rounding_error_is_gone(self):
+        # 0.10 * 1.15 = 0.115 exactly; Decimal(1.15) from float is 1.14999... and gives 0.11
+        assert apply_markup(10, 15.0) == 12
+        assert (Decimal("0.10") * Decimal(1 + 15.0 / 100)).quantize(Decimal("0.01")) == Decimal("0.11")
+
+    def test_rounding_modes_differ_only_on_ties(self):
+        assert apply_markup(15, 10.0, ROUND_HALF_EVEN) == 16  # 16.5
+        assert apply_markup(15, 10.0, ROUND_HALF_UP) == 17
+        assert apply_markup(-15, 10.0, ROUND_HALF_UP) == -17
+        assert apply_markup(14, 10.0, ROUND_HALF_UP) == apply_markup(14, 10.0, ROUND_HALF_EVEN) == 15
+
+    def test_halala_conversions(self):
+        assert to_halalas(Decimal("150.25")) == 15025
+        assert to_halalas("0.125") == 12
+        assert to_halalas("0.125", ROUND_HALF_UP) == 13
+        assert from_halalas(15025) == Decimal("150.25")
+
+    def test_unknown_rounding_mode(self):
+        with pytest.raises(ValueError):
+            apply_markup(100, 10.0, "half_down")
+
+
+class TestBatch:
+    """Tests for apply_markup_batch and claim_totals"""
+
+    @pytest.mark.parametrize("rounding,decimal_rounding", [
+        (ROUND_HALF_EVEN, DECIMAL_HALF_EVEN),
+        (ROUND_HALF_UP, DECIMAL_HALF_UP),
+    ])
+    def test_identical_to_decimal(self, rounding, decimal_rounding):
+        rng = random.Random(19)
+        halalas = [rng.randint(-10**5, 10**10) for _ in range(5000)] + list(range(-200, 200))
+        markups = [rng.choice(MARKUPS) for _ in halalas]
+
+        result = apply_markup_batch(halalas, markups, rounding)
+
+        expected = [decimal_markup(h, m, decimal_rounding) for h, m in zip(halalas, markups)]
+        assert result.dtype == np.int64
+        assert result.tolist() == expected
+
+    def test_single_markup_and_empty_batch(self):
+        assert apply_markup_batch([5, 15, 25], 10.0).tolist() == [6, 16, 28]
+        assert apply_markup_batch([], []).tolist() == []
+
+    def test_int64_overflow_falls_back_to_python_ints(self):
+        halalas = [10**17, 3]
+
+        result = apply_markup_batch(halalas, 33.333333333333336)
+
+        assert result.tolist() == [decimal_markup(h, 33.333333333333336, DECIMAL_HALF_EVEN) for h in halalas]
+
+    def test_claim_totals_with_empty_claims(self):
+        assert claim_totals(np.array([100, 250, 5, 7]), [0, 2, 2, 4, 4]).tolist() == [350, 0, 12, 0]
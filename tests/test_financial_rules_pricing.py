@@ -0,0 +1,110 @@
+"""
+Test Suite for Rules Engine Pricing Lookups
+===========================================
+
+Tests for:
+- Single round trip per claim or batch (facilities, prices, bundles, rules)
+- Exact Decimal prices and de-duplicated code lists
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "financial-rules-engine"))
+
+from pricing_repository import fetch_batch_pricing  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((query, params))
+
+    def fetchone(self):
+        return self.conn.rows[0]
+
+    def fetchall(self):
+        return self.conn.rows
+
+    def close(self):
+        self.conn.closed_cursors += 1
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.closed_cursors = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class TestClaimPricing:
+    """Tests for fetch_batch_pricing on a single claim, as /validate uses it without a snapshot"""
+
+    def test_one_query_regardless_of_item_count(self):
+        conn = FakeConnection([(
+            {"1": {"facility_id": 1, "accreditation_tier": 2, "markup_pct": 20.0, "tier_description": "Tertiary"}},
+            {"SBS-LAB-001": "50.00", "SBS-RAD-001": "150.10"},
+            None, None, None, None,
+        )])
+        codes = ["SBS-LAB-001", "SBS-RAD-001"] * 50
+
+        pricing = fetch_batch_pricing(conn, [1], codes)
+
+        assert len(conn.executed) == 1
+        assert conn.executed[0][1] == {"facility_ids": [1], "codes": ["SBS-LAB-001", "SBS-RAD-001"]}
+        assert pricing["prices"] == {"SBS-LAB-001": Decimal("50.00"), "SBS-RAD-001": Decimal("150.10")}
+        assert pricing["facilities"][1]["accreditation_tier"] == 2
+        assert len(pricing["bundles"]) == 0
+        assert conn.closed_cursors == 1
+
+    def test_bundle_items_become_an_index_and_missing_rows_are_empty(self):
+        conn = FakeConnection([(
+            None,
+            None,
+            [
+                {"bundle_id": 3, "bundle_code": "BND-1", "bundle_name": "Checkup", "total_allowed_price": "199.99",
+                 "sbs_code": code, "quantity": 1, "is_mandatory": True}
+                for code in ("SBS-LAB-001", "SBS-RAD-001")
+            ],
+            None, None, None,
+        )])
+
+        pricing = fetch_batch_pricing(conn, [99], [])
+
+        assert pricing["facilities"] == {}
+        assert pricing["prices"] == {}
+        (bundle,) = pricing["bundles"].bundles
+        assert bundle.price == Decimal("199.99")
+        assert [item.sbs_code for item in bundle.items] == ["SBS-LAB-001", "SBS-RAD-001"]
+
+
+class TestBatchPricing:
+    """Tests for fetch_batch_pricing"""
+
+    def test_facilities_keyed_by_id_in_one_query(self):
+        conn = FakeConnection([(
+            {"1": {"facility_id": 1, "markup_pct": 10.0}, "7": {"facility_id": 7, "markup_pct": 30.0}},
+            {"SBS-LAB-001": "50.00"},
+            None,
+            [{"rule_code": "LAB-MAX", "scope": "item", "sbs_code": None, "category": "Lab", "tier_level": None,
+              "condition": {"field": "units", "op": ">", "value": 5}, "action": "reject",
+              "action_value": None, "message": None, "priority": 10}],
+            [{"tier_level": 1, "base_coverage_limit": "5000.00", "annual_coverage_limit": None}],
+            {"SBS-LAB-001": "Lab"},
+        )])
+
+        pricing = fetch_batch_pricing(conn, [7, 1, 7, 9], ["SBS-LAB-001", "SBS-LAB-001"])
+
+        assert len(conn.executed) == 1
+        assert conn.executed[0][1] == {"facility_ids": [1, 7, 9], "codes": ["SBS-LAB-001"]}
+        assert sorted(pricing["facilities"]) == [1, 7]
+        assert pricing["prices"] == {"SBS-LAB-001": Decimal("50.00")}
+        rules = pricing["rules"]
+        assert [rule.rule_code for rule in rules.item_rules("SBS-LAB-001", 1)] == ["LAB-MAX"]
+        assert [rule.rule_code for rule in rules.claim_rules(1)] == ["TIER1-BASE-COVERAGE"]
@@ -0,0 +1,173 @@
+"""
+Test Suite for the Rules Engine Pricing Snapshot
+================================================
+
+Tests for:
+- Content versioning (stable for identical data, changes with prices)
+- Loading the reference tables in one transaction and compiling the rules
+- Atomic swap on reload and NOTIFY-triggered reloads
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "financial-rules-engine"))
+
+from pricing_snapshot import (  # noqa: E402
+    PricingChangeListener,
+    PricingSnapshot,
+    PricingSnapshotStore,
+    load_snapshot
+)
+
+TIERS = {1: (10.0, "Reference Hospital"), 2: (20.0, "Tertiary Care Center")}
+
+
+BUNDLE_COLUMNS = ("bundle_id", "bundle_code", "bundle_name", "total_allowed_price",
+                  "sbs_code", "quantity", "is_mandatory")
+RULE_COLUMNS = ("rule_code", "scope", "sbs_code", "category", "tier_level", "condition",
+                "action", "action_value", "message", "priority")
+COVERAGE_COLUMNS = ("tier_level", "base_coverage_limit", "annual_coverage_limit")
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+        self.description = None
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        # Later markers are more specific
+        for marker, (columns, rows) in self.conn.tables.items():
+            if marker in query:
+                self.result = rows
+                self.description = [(column,) for column in columns]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, prices, rules=()):
+        self.tables = {
+            "FROM sbs_master_catalogue": (("sbs_id", "standard_price"), prices),
+            "FROM pricing_tier_rules": (
+                ("tier_level", "markup_pct", "tier_description"),
+                [(1, 10.0, "Reference Hospital"), (2, 20.0, "Tertiary Care Center")]
+            ),
+            "FROM facilities": (("facility_id", "accreditation_tier"), [(1, 1), (7, 2)]),
+            "FROM service_bundles": (BUNDLE_COLUMNS, [
+                (5, "BND-1", "Checkup", Decimal("90.00"), "SBS-1", 1, True),
+                (5, "BND-1", "Checkup", Decimal("90.00"), "SBS-2", 1, True),
+            ]),
+            "FROM chi_claim_rules": (RULE_COLUMNS, list(rules)),
+            "base_coverage_limit::text": (COVERAGE_COLUMNS, [(2, "1000.00", None)]),
+            "SELECT sbs_id, category": (("sbs_id", "category"), [("SBS-1", "Lab"), ("SBS-2", "Radiology")]),
+        }
+        self.executed = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class TestPricingSnapshot:
+    """Tests for PricingSnapshot"""
+
+    def test_version_depends_only_on_contents(self):
+        first = PricingSnapshot({"SBS-1": Decimal("50.00")}, TIERS, {1: 1})
+        same = PricingSnapshot({"SBS-1": Decimal("50.00")}, dict(TIERS), {1: 1})
+        repriced = PricingSnapshot({"SBS-1": Decimal("55.00")}, TIERS, {1: 1})
+        retiered = PricingSnapshot({"SBS-1": Decimal("50.00")}, TIERS, {1: 2})
+
+        assert first.version == same.version
+        assert len({first.version, repriced.version, retiered.version}) == 3
+
+    def test_facility_tier_matches_repository_shape(self):
+        snapshot = PricingSnapshot({}, TIERS, {7: 2, 8: 5})
+
+        assert snapshot.facility_tier(7) == {
+            "facility_id": 7, "accreditation_tier": 2, "markup_pct": 20.0,
+            "tier_description": "Tertiary Care Center"
+        }
+        assert snapshot.facility_tier(8) is None  # tier without pricing rules
+        assert snapshot.facility_tier(99) is None
+
+    def test_load_reads_all_tables_in_one_transaction(self):
+        conn = FakeConnection([("SBS-1", Decimal("50.00")), ("SBS-2", Decimal("12.50"))])
+
+        snapshot = load_snapshot(conn)
+
+        assert conn.executed[0] == "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+        assert conn.rollbacks == 1
+        assert snapshot.prices == {"SBS-1": Decimal("50.00"), "SBS-2": Decimal("12.50")}
+        assert snapshot.facility_tier(7)["markup_pct"] == 20.0
+        assert [b.bundle_code for b in snapshot.bundles.match({"SBS-1": 1, "SBS-2": 1})] == ["BND-1"]
+        assert [rule.rule_code for rule in snapshot.rules.claim_rules(2)] == ["TIER2-BASE-COVERAGE"]
+        assert snapshot.rules.categories["SBS-1"] == "Lab"
+
+    def test_rule_changes_change_the_version(self):
+        rule = ("LAB-MAX", "item", None, "Lab", None, {"field": "units", "op": ">", "value": 5},
+                "reject", None, "Too many units", 10)
+        without_rules = load_snapshot(FakeConnection([("SBS-1", Decimal("50.00"))]))
+        with_rule = load_snapshot(FakeConnection([("SBS-1", Decimal("50.00"))], [rule]))
+
+        assert without_rules.version != with_rule.version
+        assert [r.rule_code for r in with_rule.rules.item_rules("SBS-1", 1)] == ["LAB-MAX"]
+        assert with_rule.rules.item_rules("SBS-2", 1) == ()
+
+
+class TestPricingSnapshotStore:
+    """Tests for PricingSnapshotStore and PricingChangeListener"""
+
+    def make_store(self, prices):
+        @contextmanager
+        def connection():
+            yield FakeConnection(prices)
+        return PricingSnapshotStore(connection)
+
+    def test_reload_swaps_snapshot(self):
+        prices = [("SBS-1", Decimal("50.00"))]
+        store = self.make_store(prices)
+        first = store.reload()
+
+        prices[0] = ("SBS-1", Decimal("60.00"))
+        second = store.reload()
+
+        assert store.current is second
+        assert first.price("SBS-1") == Decimal("50.00")  # readers holding the old snapshot are unaffected
+        assert second.price("SBS-1") == Decimal("60.00")
+        assert store.status()["version"] == second.version != first.version
+        assert store.status()["reloads"] == 2
+
+    def test_notification_queues_reload(self):
+        store = self.make_store([])
+        listener = PricingChangeListener(connect=None, store=store)
+
+        listener.handle_payload('{"table": "pricing_tier_rules"}')
+
+        assert store._wakeup.is_set()
+
+    def test_background_loader_loads_and_stops(self):
+        store = self.make_store([("SBS-1", Decimal("50.00"))])
+        store.start()
+        try:
+            for _ in range(100):
+                if store.current is not None:
+                    break
+                store._stop_event.wait(0.01)
+        finally:
+            store.stop()
+            store.join(timeout=2)
+
+        assert store.current.price("SBS-1") == Decimal("50.00")
+        assert not store.is_alive()
@@ -59,5 +59,49 @@ def test_normalize_missing_fields():
     assert response.status_code == 422  # Validation error
 
 
+def test_normalize_batch_preserves_order():
+    """Test batch normalization returns one result per item in input order"""
+    payload = [
+        {"facility_id": 1, "internal_code": "LAB-CBC-01", "description": "Complete Blood Count Test"},
+        {"facility_id": 1, "internal_code": "INVALID-001", "description": "Invalid service"},
+        {"facility_id": 1, "internal_code": "RAD-CXR-01", "description": "Chest X-Ray Standard"}
+    ]
+
+    response = requests.post(f"{BASE_URL}/normalize/batch", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["total"] == 3
+    assert [r["index"] for r in data["results"]] == [0, 1, 2]
+    assert [r["internal_code"] for r in data["results"]] == ["LAB-CBC-01", "INVALID-001", "RAD-CXR-01"]
+    assert data["results"][0]["status"] == "mapped"
+    assert data["results"][1]["status"] == "not_found"
+
+
+def test_normalize_batch_reports_invalid_items():
+    """Test that a malformed item gets an error status without rejecting the batch"""
+    payload = [
+        {"facility_id": 1, "internal_code": "LAB-CBC-01", "description": "Complete Blood Count Test"},
+        {"facility_id": 1, "internal_code": "LAB'; DROP TABLE--", "description": "Injected code"},
+        {"facility_id": 1}
+    ]
+
+    response = requests.post(f"{BASE_URL}/normalize/batch", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["total"] == 3
+    assert [r["status"] for r in data["results"]] == ["mapped", "error", "error"]
+    assert data["errors"] == 2
+    assert data["results"][2]["facility_id"] == 1
+    assert data["results"][2]["internal_code"] is None
+
+
+def test_normalize_batch_empty():
+    """Test that an empty batch is rejected"""
+    response = requests.post(f"{BASE_URL}/normalize/batch", json=[])
+    assert response.status_code == 422
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
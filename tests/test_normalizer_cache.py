@@ -0,0 +1,587 @@
+"""
+Test Suite for Normalizer Caching Layers
+========================================
+
+Tests for:
+- In-process mapping cache (LRU, negative caching)
+- LISTEN/NOTIFY driven invalidation
+- Full-facility mapping snapshot
+- AI fallback tier (LRU, buffered hit counts, local suggestion provider)
+- Single-flight coalescing of concurrent fallback misses
+- Offline description matcher (n-gram TF-IDF, Arabic folding)
+- Vectorized batch scoring and the rule_based mapping backfill
+"""
+
+import asyncio
+import os
+import sys
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "normalizer-service"))
+
+from mapping_cache import LRUCache, MappingCache, MappingInvalidationListener, MISSING  # noqa: E402
+from mapping_snapshot import MappingSnapshotStore, SnapshotBuilder  # noqa: E402
+from ai_cache import HitCountBuffer  # noqa: E402
+from suggestion_providers import LocalSuggestionProvider  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+from description_matcher import DescriptionMatcher, normalize_text  # noqa: E402
+import mapping_backfill  # noqa: E402
+
+
+SAMPLE_MAPPING = {
+    "sbs_code": "SBS-LAB-001",
+    "confidence": 1.0,
+    "mapping_source": "manual",
+    "description_en": "Complete Blood Count (CBC)",
+    "description_ar": "تحليل صورة دم كاملة"
+}
+
+
+@pytest.fixture
+def cache():
+    return MappingCache(max_entries=3)
+
+
+class TestMappingCache:
+    """Tests for the (facility_id, internal_code) LRU cache"""
+
+    def test_unknown_key_is_missing(self, cache):
+        assert cache.get(1, "LAB-CBC-01") is MISSING
+
+    def test_hit_returns_copy(self, cache):
+        cache.put(1, "LAB-CBC-01", SAMPLE_MAPPING, cache.generation)
+
+        first = cache.get(1, "LAB-CBC-01")
+        first["sbs_code"] = "MUTATED"
+
+        assert cache.get(1, "LAB-CBC-01")["sbs_code"] == "SBS-LAB-001"
+        assert cache.stats()["hits"] == 2
+
+    def test_negative_caching(self, cache):
+        cache.put(1, "UNKNOWN-01", None, cache.generation)
+
+        assert cache.get(1, "UNKNOWN-01") is None
+        assert cache.stats()["negative_hits"] == 1
+
+    def test_negative_caching_disabled(self):
+        cache = MappingCache(max_entries=10, cache_misses=False)
+        cache.put(1, "UNKNOWN-01", None, cache.generation)
+
+        assert cache.get(1, "UNKNOWN-01") is MISSING
+
+    def test_lru_eviction(self, cache):
+        for code in ("A", "B", "C"):
+            cache.put(1, code, SAMPLE_MAPPING, cache.generation)
+
+        cache.get(1, "A")  # A becomes most recently used
+        cache.put(1, "D", SAMPLE_MAPPING, cache.generation)
+
+        assert cache.get(1, "B") is MISSING
+        assert cache.get(1, "A") is not MISSING
+        assert len(cache) == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_facility(self, cache):
+        cache.put(1, "A", SAMPLE_MAPPING, cache.generation)
+        cache.put(1, "B", None, cache.generation)
+        cache.put(2, "A", SAMPLE_MAPPING, cache.generation)
+
+        assert cache.invalidate_facility(1) == 2
+
+        assert cache.get(1, "A") is MISSING
+        assert cache.get(1, "B") is MISSING
+        assert cache.get(2, "A") is not MISSING
+
+    def test_stale_put_is_dropped(self, cache):
+        generation = cache.generation
+        cache.invalidate_all()  # e.g. NOTIFY arrived while the query was running
+
+        cache.put(1, "A", SAMPLE_MAPPING, generation)
+
+        assert cache.get(1, "A") is MISSING
+        assert cache.stats()["stale_puts_dropped"] == 1
+
+
+class TestMappingInvalidationListener:
+    """Tests for NOTIFY payload handling"""
+
+    @pytest.fixture
+    def listener(self, cache):
+        return MappingInvalidationListener(connect=None, targets=[cache])
+
+    def test_facility_payload_invalidates_facility(self, cache, listener):
+        cache.put(1, "A", SAMPLE_MAPPING, cache.generation)
+        cache.put(2, "A", SAMPLE_MAPPING, cache.generation)
+
+        listener.handle_payload('{"table": "facility_internal_codes", "facility_id": 1}')
+
+        assert cache.get(1, "A") is MISSING
+        assert cache.get(2, "A") is not MISSING
+
+    @pytest.mark.parametrize("payload", [
+        '{"table": "sbs_master_catalogue", "facility_id": null}',
+        "",
+        "not-json",
+    ])
+    def test_global_or_unparseable_payload_invalidates_all(self, cache, listener, payload):
+        cache.put(1, "A", SAMPLE_MAPPING, cache.generation)
+        cache.put(2, "A", SAMPLE_MAPPING, cache.generation)
+
+        listener.handle_payload(payload)
+
+        assert len(cache) == 0
+
+
+SNAPSHOT_ROWS = [
+    # facility_id, internal_code, sbs_code, confidence, mapping_source, description_en, description_ar
+    (1, "LAB-CBC-01", "SBS-LAB-001", 1.0, "manual", "Complete Blood Count (CBC)", "تحليل صورة دم كاملة"),
+    (1, "LAB-CBC-01", "SBS-LAB-002", 0.4, "ai", "Comprehensive Metabolic Panel", "لوحة الأيض الشاملة"),
+    (1, "RAD-CXR-01", "SBS-RAD-001", 1.0, "manual", "Chest X-Ray", "أشعة سينية للصدر"),
+    (2, "CBC", "SBS-LAB-001", 1.0, "manual", "Complete Blood Count (CBC)", "تحليل صورة دم كاملة"),
+]
+SNAPSHOT_COLUMNS = ["facility_id", "internal_code", "sbs_code", "confidence",
+                    "mapping_source", "description_en", "description_ar"]
+
+
+class FakeSnapshotCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.description = [(name,) for name in SNAPSHOT_COLUMNS]
+        self.itersize = None
+
+    def execute(self, query, params):
+        if not params["all_facilities"]:
+            self.rows = [r for r in self.rows if r[0] in params["facility_ids"]]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeSnapshotConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, name=None):
+        return FakeSnapshotCursor(list(self.rows))
+
+    def commit(self):
+        pass
+
+
+def snapshot_store(rows, facility_ids=None):
+    @contextmanager
+    def connection_factory():
+        yield FakeSnapshotConnection(rows)
+    return MappingSnapshotStore(connection_factory, facility_ids=facility_ids)
+
+
+class TestMappingSnapshot:
+    """Tests for the preloaded facility snapshot"""
+
+    def test_builder_shares_identical_records(self):
+        builder = SnapshotBuilder()
+        for row in SNAPSHOT_ROWS:
+            builder.add(dict(zip(SNAPSHOT_COLUMNS, row)))
+        snapshot = builder.build()
+
+        assert snapshot.entry_count() == 3
+        # facility 1 / LAB-CBC-01 and facility 2 / CBC point at the same record
+        assert snapshot.facilities[1]["LAB-CBC-01"] == snapshot.facilities[2]["CBC"]
+        assert len(snapshot.records) == 2
+        assert snapshot.memory_footprint() > 0
+
+    def test_lookup_semantics(self):
+        store = snapshot_store(SNAPSHOT_ROWS)
+        assert store.reload(None)
+
+        mapping = store.lookup(1, "LAB-CBC-01")
+        assert mapping["sbs_code"] == "SBS-LAB-001"  # highest confidence wins
+        assert mapping["description_ar"] == "تحليل صورة دم كاملة"
+        assert store.lookup(1, "UNKNOWN") is None
+        assert store.lookup(99, "LAB-CBC-01") is MISSING
+
+    def test_scoped_facilities(self):
+        store = snapshot_store(SNAPSHOT_ROWS, facility_ids={2, 3})
+        store.reload(None)
+
+        assert store.lookup(1, "LAB-CBC-01") is MISSING
+        assert store.lookup(2, "CBC")["sbs_code"] == "SBS-LAB-001"
+        # facility 3 has no mappings but is snapshotted, so misses stay off the DB
+        assert store.lookup(3, "ANY") is None
+
+    def test_invalidate_facility_then_reload(self):
+        store = snapshot_store(SNAPSHOT_ROWS)
+        store.reload(None)
+
+        store.invalidate_facility(1)
+        assert store.lookup(1, "RAD-CXR-01") is MISSING
+        assert store.lookup(2, "CBC") is not MISSING
+        assert store.status()["pending_facilities"] == [1]
+
+        assert store.reload({1})
+        assert store.lookup(1, "RAD-CXR-01")["sbs_code"] == "SBS-RAD-001"
+        assert store.status()["reload_pending"] is False
+
+    def test_status_report(self):
+        store = snapshot_store(SNAPSHOT_ROWS)
+        store.reload(None)
+
+        status = store.status()
+        assert status["total_entries"] == 3
+        assert status["facilities"]["1"]["entries"] == 2
+        assert status["memory_bytes"] > 0
+        assert status["snapshot_age_seconds"] >= 0
+
+
+class TestLRUCache:
+    """Tests for the generic LRU map"""
+
+    def test_eviction_order(self):
+        lru = LRUCache(max_entries=2)
+        lru.put("a", 1)
+        lru.put("b", 2)
+        lru.get("a")
+        lru.put("c", 3)
+
+        assert lru.get("b") is MISSING
+        assert lru.get("a") == 1
+        assert len(lru) == 2
+
+    def test_zero_size_disables_cache(self):
+        lru = LRUCache(max_entries=0)
+        lru.put("a", 1)
+
+        assert lru.get("a") is MISSING
+
+
+class FakeFlushConnection:
+    def __init__(self, log, fail=False):
+        self.log = log
+        self.fail = fail
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def hit_buffer(log, fail=False):
+    @contextmanager
+    def connection_factory():
+        if fail:
+            raise ConnectionError("database down")
+        yield FakeFlushConnection(log)
+    return HitCountBuffer(connection_factory, flush_interval=60, max_pending=100)
+
+
+class TestHitCountBuffer:
+    """Tests for buffered ai_normalization_cache hit counting"""
+
+    def test_hits_are_aggregated_into_one_flush(self, monkeypatch):
+        log = []
+        monkeypatch.setattr("ai_cache.execute_values", lambda cursor, query, rows: log.append(rows))
+        buffer = hit_buffer(log)
+
+        for desc_hash in ("h1", "h2", "h1", "h1"):
+            buffer.record(desc_hash)
+
+        assert buffer.flush() == 2
+        assert log == [[("h1", 3), ("h2", 1)]]
+        assert buffer.pending() == 0
+        assert buffer.flush() == 0
+
+    def test_failed_flush_keeps_counts(self):
+        buffer = hit_buffer([], fail=True)
+        buffer.record("h1")
+        buffer.record("h1")
+
+        assert buffer.flush() == 0
+        assert buffer.flush_errors == 1
+        assert buffer.pending() == 1
+
+
+class FakeCatalogue:
+    version = 1
+
+    def __init__(self, entries):
+        self._entries = {e["sbs_id"]: e for e in entries}
+
+    def entries(self):
+        return self._entries
+
+    def get(self, sbs_id):
+        return self._entries.get(sbs_id)
+
+
+CATALOGUE_ENTRIES = [
+    {"sbs_id": "SBS-LAB-001", "description_en": "Complete Blood Count (CBC)",
+     "description_ar": "تحليل صورة دم كاملة", "category": "Laboratory"},
+    {"sbs_id": "SBS-RAD-001", "description_en": "Chest X-Ray",
+     "description_ar": "أشعة سينية للصدر", "category": "Radiology"},
+]
+
+
+class TestLocalSuggestionProvider:
+    """Tests for the deterministic offline provider"""
+
+    @pytest.fixture
+    def provider(self):
+        return LocalSuggestionProvider(FakeCatalogue(CATALOGUE_ENTRIES), min_score=0.2)
+
+    def test_english_match(self, provider):
+        suggestion = provider.suggest("chest x-ray, two views")
+        assert suggestion["sbs_code"] == "SBS-RAD-001"
+        assert 0 < suggestion["confidence"] <= 1
+
+    def test_arabic_match(self, provider):
+        assert provider.suggest("صورة دم كاملة")["sbs_code"] == "SBS-LAB-001"
+
+    def test_deterministic(self, provider):
+        assert provider.suggest("blood count") == provider.suggest("blood count")
+
+    def test_no_match(self, provider):
+        assert provider.suggest("dental cleaning") is None
+        assert provider.suggest("!!!") is None
+
+    def test_best_ignores_min_score(self):
+        provider = LocalSuggestionProvider(FakeCatalogue(CATALOGUE_ENTRIES), min_score=0.99)
+        best = provider.best("chest x-ray, two views")
+        assert best["sbs_code"] == "SBS-RAD-001" and best["confidence"] < 0.99
+        assert provider.suggest("chest x-ray, two views") is None
+        assert provider.best("!!!") is None
+
+
+class TestSingleFlight:
+    """Tests for request coalescing"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        observed = []
+        flight = SingleFlight(observer=observed.append)
+        executions = []
+
+        async def compute():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return {"sbs_code": "SBS-LAB-001"}
+
+        async def scenario():
+            return await asyncio.gather(*(flight.do("h1", compute) for _ in range(20)))
+
+        results = asyncio.run(scenario())
+
+        assert len(executions) == 1
+        assert all(r == {"sbs_code": "SBS-LAB-001"} for r in results)
+        stats = flight.stats()
+        assert stats["coalesced"] == 19
+        assert stats["coalesce_rate"] == 0.95
+        assert observed == [False] + [True] * 19
+        assert stats["in_flight"] == 0
+
+    def test_distinct_keys_and_sequential_calls_execute(self):
+        flight = SingleFlight()
+
+        async def compute():
+            return 1
+
+        async def scenario():
+            await asyncio.gather(flight.do("h1", compute), flight.do("h2", compute))
+            await flight.do("h1", compute)
+
+        asyncio.run(scenario())
+
+        assert flight.stats()["executions"] == 3
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("provider down")
+
+        async def scenario():
+            return await asyncio.gather(
+                *(flight.do("h1", compute) for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(scenario())
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats()["errors"] == 1
+
+
+class TestDescriptionMatcher:
+    """Tests for the n-gram TF-IDF matcher"""
+
+    @pytest.fixture
+    def matcher(self):
+        return DescriptionMatcher(CATALOGUE_ENTRIES)
+
+    def test_arabic_folding(self):
+        # alef with hamza, ta marbuta, alef maqsura, diacritics and tatweel
+        assert normalize_text("أشعّة سينيـة") == normalize_text("اشعه سينيه")
+        assert normalize_text("مستشفى") == "مستشفي"
+        assert normalize_text("Chest X-Ray!") == "chest x ray"
+
+    def test_spelling_variants_match(self, matcher):
+        assert matcher.top_k("اشعه سينيه للصدر", 1)[0][0] == "SBS-RAD-001"
+        assert matcher.top_k("complete blod count", 1)[0][0] == "SBS-LAB-001"
+
+    def test_top_k_scores_sorted(self, matcher):
+        candidates = matcher.top_k("chest blood", 5)
+        scores = [score for _, score in candidates]
+        assert len(candidates) == 2
+        assert scores == sorted(scores, reverse=True)
+        assert all(0 < score <= 1 for score in scores)
+
+    def test_exact_description_scores_one(self, matcher):
+        assert matcher.top_k("Chest X-Ray أشعة سينية للصدر", 1) == [("SBS-RAD-001", 1.0)]
+
+    def test_ties_broken_by_code(self):
+        twins = [
+            {"sbs_id": "SBS-B", "description_en": "Blood test", "description_ar": ""},
+            {"sbs_id": "SBS-A", "description_en": "Blood test", "description_ar": ""},
+        ]
+        assert [code for code, _ in DescriptionMatcher(twins).top_k("blood test", 1)] == ["SBS-A"]
+
+    def test_no_overlap(self, matcher):
+        assert matcher.top_k("zzz", 5) == []
+
+
+class FakeBackfillCursor:
+    def __init__(self, rows, inserts):
+        self.rows = list(rows)
+        self.inserts = inserts
+        self.itersize = None
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeBackfillConnection:
+    def __init__(self, rows, inserts):
+        self.rows = rows
+        self.inserts = inserts
+        self.commits = 0
+
+    def cursor(self, name=None):
+        return FakeBackfillCursor(self.rows if name else [], self.inserts)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakePagingCursor:
+    """Cursor for psycopg2's real execute_values: rowcount and fetchall cover the last page only"""
+
+    def __init__(self):
+        self.connection = SimpleNamespace(encoding="UTF8")
+        self.pages = []
+        self.pending = 0
+        self.rowcount = -1
+
+    def mogrify(self, template, args):
+        self.pending += 1
+        return b"(" + b",".join(str(arg).encode() for arg in args) + b")"
+
+    def execute(self, query):
+        self.pages.append(self.pending)
+        self.rowcount, self.pending = self.pending, 0
+
+    def fetchall(self):
+        return [(1,)] * self.rowcount
+
+
+class TestBatchScoring:
+    """Tests for sparse-matrix bulk scoring and the backfill job"""
+
+    QUERIES = ["chest xray", "CBC blood count", "اشعه للصدر", "dental cleaning", ""]
+
+    def test_batch_matches_single_queries(self):
+        matcher = DescriptionMatcher(CATALOGUE_ENTRIES)
+
+        batch = matcher.top_k_batch(self.QUERIES, k=2, chunk_size=2)
+
+        assert batch == [matcher.top_k(q, 2) for q in self.QUERIES]
+
+    def test_backfill_writes_rule_based_proposals(self, monkeypatch):
+        inserts = []
+
+        def fake_execute_values(cursor, query, rows, fetch=False):
+            inserts.extend(rows)
+            return [(1,)] * len(rows)
+
+        monkeypatch.setattr(mapping_backfill, "execute_values", fake_execute_values)
+        unmapped = [
+            (10, "Chest X Ray PA view", None),
+            (11, "Dental cleaning", None),
+            (12, "تحليل صورة دم", "CBC"),
+        ]
+
+        @contextmanager
+        def connection_factory():
+            yield FakeBackfillConnection(unmapped, inserts)
+
+        summary = mapping_backfill.run_backfill(
+            connection_factory,
+            matcher=DescriptionMatcher(CATALOGUE_ENTRIES),
+            min_score=0.3,
+            batch_size=2
+        )
+
+        assert [(row[0], row[1], row[3], row[4]) for row in inserts] == [
+            (10, "SBS-RAD-001", "rule_based", False),
+            (12, "SBS-LAB-001", "rule_based", False),
+        ]
+        assert all(0.3 <= row[2] <= 1 for row in inserts)
+        assert summary["scanned"] == 3
+        assert summary["inserted"] == 2
+        assert summary["below_threshold"] == 1
+
+    def test_activate_keeps_only_the_top_candidate_live(self):
+        matcher = DescriptionMatcher(CATALOGUE_ENTRIES)
+
+        proposals, _ = mapping_backfill.propose_mappings(
+            matcher, [(10, "chest blood", None)], min_score=0.0, top_k=2, activate=True
+        )
+
+        assert [row[4] for row in proposals] == [True, False]
+        assert proposals[0][2] >= proposals[1][2]
+
+    def test_write_proposals_counts_every_page(self):
+        cursor = FakePagingCursor()
+        proposals = [(i, "SBS-LAB-001", 0.9, "rule_based", False) for i in range(250)]
+
+        assert mapping_backfill.write_proposals(cursor, proposals) == 250
+        assert cursor.pages == [100, 100, 50]
+
+    def test_backfill_dry_run_writes_nothing(self, monkeypatch):
+        monkeypatch.setattr(mapping_backfill, "execute_values", lambda *a: pytest.fail("wrote rows"))
+
+        @contextmanager
+        def connection_factory():
+            yield FakeBackfillConnection([(10, "Chest X Ray", None)], [])
+
+        summary = mapping_backfill.run_backfill(
+            connection_factory, matcher=DescriptionMatcher(CATALOGUE_ENTRIES), min_score=0.1, dry_run=True
+        )
+
+        assert summary["proposed"] == 1
+        assert summary["inserted"] == 0
@@ -0,0 +1,223 @@
+"""
+Test Suite for the Streaming Facility Code Import
+=================================================
+
+Tests for:
+- Incremental CSV / NDJSON parsing from byte chunks
+- Record validation
+- Chunked COPY -> upsert -> auto-map pipeline (fake connection)
+"""
+
+import csv
+import os
+import sys
+from contextlib import contextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "normalizer-service"))
+
+import mapping_backfill  # noqa: E402
+from description_matcher import DescriptionMatcher  # noqa: E402
+from facility_import import (  # noqa: E402
+    FacilityCodeImporter,
+    clean_record,
+    iter_lines,
+    parse_records,
+)
+
+CATALOGUE_ENTRIES = [
+    {"sbs_id": "SBS-LAB-001", "description_en": "Complete Blood Count (CBC)",
+     "description_ar": "تحليل صورة دم كاملة"},
+    {"sbs_id": "SBS-RAD-001", "description_en": "Chest X-Ray",
+     "description_ar": "أشعة سينية للصدر"},
+]
+
+
+def byte_chunks(text: str, size: int):
+    data = text.encode("utf-8")
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestParsing:
+    """Tests for incremental parsing"""
+
+    def test_csv_across_arbitrary_chunk_boundaries(self):
+        text = (
+            "﻿internal_code,local_description,local_description_ar\r\n"
+            "LAB-1,\"Blood count, full\",تحليل دم\r\n"
+            "RAD-1,\"Chest\nX-Ray\",\r\n"
+        )
+        records = list(parse_records(iter_lines(byte_chunks(text, 3)), "csv"))
+
+        assert [r["internal_code"] for _, r in records] == ["LAB-1", "RAD-1"]
+        assert records[0][1]["local_description"] == "Blood count, full"
+        assert records[0][1]["local_description_ar"] == "تحليل دم"
+        assert records[1][1]["local_description"] == "Chest\nX-Ray"
+
+    def test_ndjson_invalid_lines_are_reported(self):
+        text = '{"internal_code": "A", "description": "x"}\n\nnot json\n[1]\n'
+        records = list(parse_records(iter_lines(byte_chunks(text, 5)), "ndjson"))
+
+        assert [line for line, _ in records] == [1, 3, 4]
+        with pytest.raises(ValueError):
+            clean_record(records[1][1])
+        with pytest.raises(ValueError):
+            clean_record(records[2][1])
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            list(parse_records([], "xml"))
+
+
+class TestCleanRecord:
+    """Tests for row validation"""
+
+    def test_valid_record(self):
+        assert clean_record({
+            "internal_code": " LAB-1 ", "description": "CBC", "price_gross": "12.345", "department": ""
+        }) == ("LAB-1", "CBC", None, Decimal("12.35"), None)
+
+    @pytest.mark.parametrize("record", [
+        {"internal_code": "", "local_description": "x"},
+        {"internal_code": "A;DROP", "local_description": "x"},
+        {"internal_code": "A" * 101, "local_description": "x"},
+        {"internal_code": "A", "local_description": "  "},
+        {"internal_code": "A", "local_description": "x", "price_gross": "abc"},
+        {"internal_code": "A", "local_description": "x", "price_gross": "1e12"},
+    ])
+    def test_invalid_records(self, record):
+        with pytest.raises(ValueError):
+            clean_record(record)
+
+
+class FakeImportCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.connection = SimpleNamespace(encoding="UTF8")
+        self.result = []
+        self.rowcount = 0
+        self.pending = 0
+
+    def mogrify(self, template, args):
+        self.pending += 1
+        return b"(" + b",".join(str(arg).encode() for arg in args) + b")"
+
+    def execute(self, query, params=None):
+        if isinstance(query, bytes):
+            # One page of proposals from psycopg2's execute_values; rowcount covers this page only
+            self.conn.proposal_pages.append(self.pending)
+            self.rowcount, self.pending = self.pending, 0
+            self.result = [(1,)] * self.rowcount
+        elif "INSERT INTO facility_internal_codes" in query:
+            latest = {}
+            for row in self.conn.staged:
+                latest[row[1]] = row
+            self.result = []
+            for code, row in sorted(latest.items()):
+                known = code in self.conn.ids
+                internal_code_id = self.conn.ids.setdefault(code, len(self.conn.ids) + 1)
+                self.result.append((internal_code_id, row[2], row[3] or None, not known))
+        elif "FROM sbs_normalization_map" in query:
+            self.result = [(i,) for i in params[0] if i in self.conn.mapped]
+
+    def copy_expert(self, sql, buffer):
+        self.conn.staged = list(csv.reader(buffer))
+        self.conn.chunk_sizes.append(len(self.conn.staged))
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeImportConnection:
+    def __init__(self):
+        self.staged = []
+        self.ids = {}
+        self.mapped = set()
+        self.chunk_sizes = []
+        self.proposal_pages = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeImportCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class TestFacilityCodeImporter:
+    """Tests for the chunked import pipeline"""
+
+    @pytest.fixture
+    def conn(self):
+        return FakeImportConnection()
+
+    @pytest.fixture
+    def proposals(self, monkeypatch):
+        written = []
+
+        def fake_execute_values(cursor, query, rows, fetch=False):
+            written.extend(rows)
+            return [(1,)] * len(rows)
+
+        monkeypatch.setattr(mapping_backfill, "execute_values", fake_execute_values)
+        return written
+
+    def importer(self, conn, **kwargs):
+        @contextmanager
+        def connection_factory():
+            yield conn
+        return FacilityCodeImporter(
+            connection_factory, facility_id=1, matcher=DescriptionMatcher(CATALOGUE_ENTRIES), **kwargs
+        )
+
+    def test_chunks_upserts_and_auto_maps(self, conn, proposals):
+        conn.ids["RAD-1"] = 1
+        conn.mapped.add(1)  # already mapped, must not be re-proposed
+        records = [
+            (2, {"internal_code": "RAD-1", "local_description": "Chest X-Ray"}),
+            (3, {"internal_code": "LAB-1", "local_description": "Complete blood count"}),
+            (4, {"internal_code": "BAD;", "local_description": "x"}),
+            (5, {"internal_code": "DEN-1", "local_description": "Dental cleaning"}),
+        ]
+        progress = []
+
+        summary = self.importer(conn, chunk_size=2, min_score=0.3, progress=progress.append).run(records)
+
+        assert conn.chunk_sizes == [2, 1]
+        assert conn.commits == 2
+        assert summary["rows_read"] == 4
+        assert summary["rows_invalid"] == 1
+        assert summary["errors"][0]["line"] == 4
+        assert summary["inserted"] == 2
+        assert summary["updated"] == 1
+        assert summary["unmapped"] == 2
+        assert [(p[1], p[3], p[4]) for p in proposals] == [("SBS-LAB-001", "rule_based", False)]
+        assert summary["mappings_inserted"] == 1
+        assert [p["chunks"] for p in progress] == [1, 2]
+
+    def test_mappings_inserted_counts_every_page(self, conn):
+        records = [(i + 2, {"internal_code": f"LAB-{i}", "local_description": "Complete blood count"})
+                   for i in range(250)]
+
+        summary = self.importer(conn, min_score=0.3).run(records)
+
+        assert conn.proposal_pages == [100, 100, 50]
+        assert summary["mappings_proposed"] == 250
+        assert summary["mappings_inserted"] == 250
+
+    def test_auto_map_disabled(self, conn, proposals):
+        records = [(2, {"internal_code": "LAB-1", "local_description": "Complete blood count"})]
+
+        summary = self.importer(conn, auto_map=False).run(records)
+
+        assert summary["inserted"] == 1
+        assert proposals == []
@@ -0,0 +1,157 @@
+"""
+Test Suite for Normalizer Prometheus Metrics
+============================================
+
+Tests for:
+- Text exposition of the latency histograms and counters
+- Cache hit ratio derivation
+- Multiprocess aggregation across worker processes
+- asyncpg checkout / query latency hooks
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+from prometheus_client import CollectorRegistry, Counter
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SERVICE_DIR = os.path.join(REPO_ROOT, "normalizer-service")
+sys.path.insert(0, SERVICE_DIR)
+
+import service_metrics  # noqa: E402
+from async_mapping_repository import AsyncMappingRepository  # noqa: E402
+from sbs_common.db import AsyncDatabasePool  # noqa: E402
+from sbs_common.metrics import CacheHitRatioCollector  # noqa: E402
+
+
+class TestExposition:
+    """Tests for /metrics content"""
+
+    def test_histograms_and_counters_are_exposed(self):
+        service_metrics.REQUEST_LATENCY.labels(method="POST", route="/normalize", status="200").observe(0.003)
+        service_metrics.DB_QUERY_LATENCY.labels(query="mapping", driver="psycopg2").observe(0.0007)
+        service_metrics.record_cache_lookup("mapping_cache", True)
+
+        body, content_type = service_metrics.render_latest()
+        text = body.decode()
+
+        assert content_type.startswith("text/plain")
+        assert ('normalizer_http_request_duration_seconds_bucket{le="0.005",method="POST",'
+                'route="/normalize",status="200"}') in text
+        assert 'normalizer_db_query_duration_seconds_count{driver="psycopg2",query="mapping"}' in text
+        assert 'normalizer_cache_hit_ratio{cache="mapping_cache"}' in text
+
+    def test_counter_values_are_keyed_by_sample(self):
+        service_metrics.RATE_LIMITED.inc()
+        values = service_metrics.counter_values()
+
+        assert values["normalizer_rate_limited_total"] >= 1
+        assert any(key.startswith('normalizer_cache_lookups_total{cache=') for key in values)
+
+    def test_fallback_coalescing_counters(self):
+        before = service_metrics.counter_values()
+        service_metrics.record_fallback_call(False)
+        service_metrics.record_fallback_call(True)
+        after = service_metrics.counter_values()
+
+        assert after["normalizer_fallback_calls_total"] - before.get("normalizer_fallback_calls_total", 0) == 2
+        assert after["normalizer_fallback_coalesced_total"] - before.get("normalizer_fallback_coalesced_total", 0) == 1
+
+    def test_uptime_is_time_since_start(self):
+        assert 0 <= service_metrics.uptime_seconds() < 3600
+
+
+class TestCacheHitRatio:
+    """Tests for CacheHitRatioCollector"""
+
+    def test_ratio_per_cache(self):
+        lookups = Counter(
+            "normalizer_cache_lookups_total", "test", ["cache", "result"], registry=CollectorRegistry()
+        )
+        lookups.labels(cache="a", result="hit").inc(3)
+        lookups.labels(cache="a", result="miss").inc(1)
+        lookups.labels(cache="b", result="miss").inc(2)
+
+        family = next(CacheHitRatioCollector(lookups, "normalizer").collect())
+        ratios = {s.labels["cache"]: s.value for s in family.samples}
+
+        assert ratios == {"a": 0.75, "b": 0.0}
+
+
+WORKER_SCRIPT = """
+import sys
+sys.path[:0] = [{service_dir!r}, {repo_root!r}]
+import service_metrics
+service_metrics.record_cache_lookup("mapping_cache", {hit})
+service_metrics.REQUEST_LATENCY.labels(method="GET", route="/health", status="200").observe(0.01)
+"""
+
+SCRAPE_SCRIPT = """
+import sys
+sys.path[:0] = [{service_dir!r}, {repo_root!r}]
+import service_metrics
+sys.stdout.write(service_metrics.render_latest()[0].decode())
+"""
+
+
+class TestMultiprocess:
+    """Samples from several worker processes are aggregated at scrape time"""
+
+    def run(self, script, directory, **kwargs):
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(directory))
+        return subprocess.run(
+            [sys.executable, "-c", script.format(service_dir=SERVICE_DIR, repo_root=REPO_ROOT, **kwargs)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+
+    def test_workers_are_aggregated(self, tmp_path):
+        self.run(WORKER_SCRIPT, tmp_path, hit=True)
+        self.run(WORKER_SCRIPT, tmp_path, hit=False)
+
+        text = self.run(SCRAPE_SCRIPT, tmp_path)
+
+        assert 'normalizer_http_request_duration_seconds_count{method="GET",route="/health",status="200"} 2.0' in text
+        assert 'normalizer_cache_hit_ratio{cache="mapping_cache"} 0.5' in text
+
+
+class FakeAsyncConnection:
+    async def fetchrow(self, query, *args):
+        return {"sbs_code": "SBS-1"}
+
+    async def fetch(self, query, *args):
+        return []
+
+
+class FakeAcquire:
+    async def __aenter__(self):
+        await asyncio.sleep(0)
+        return FakeAsyncConnection()
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeAsyncPool:
+    def acquire(self):
+        return FakeAcquire()
+
+
+class TestAsyncRepositoryObservers:
+    """Tests for the asyncpg latency hooks"""
+
+    def test_checkout_and_query_are_observed(self):
+        checkouts, queries = [], []
+        pool = AsyncDatabasePool(
+            {"host": "localhost", "database": "db", "user": "user", "password": None, "port": "5432"},
+            checkout_observer=checkouts.append
+        )
+        pool.pool = FakeAsyncPool()
+        repository = AsyncMappingRepository(pool, query_observer=lambda query, seconds: queries.append(query))
+
+        assert asyncio.run(repository.fetch_mapping(1, "LAB-1")) == {"sbs_code": "SBS-1"}
+        asyncio.run(repository.fetch_mappings([(1, "LAB-1")]))
+
+        assert len(checkouts) == 2 and all(s >= 0 for s in checkouts)
+        assert queries == ["mapping", "mappings_batch"]
@@ -0,0 +1,102 @@
+"""
+Test Suite for Normalizer Claim Item Validation
+===============================================
+
+The precompiled validators must behave exactly like the original
+per-request implementation, kept here as the reference.
+"""
+
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "normalizer-service"))
+
+from claim_validation import sanitize_description, validate_internal_code  # noqa: E402
+
+
+def reference_validate_code(v):
+    dangerous_patterns = [
+        r';', r'--', r'/\*', r'\*/', r'\\', r'\x00',
+        r'\$\(', r'`', r'\|', r'&&', r'\|\|',
+        r'<script', r'javascript:', r'data:',
+        r'\.\./', r'\.\.\\',
+    ]
+    v_lower = v.lower()
+    for pattern in dangerous_patterns:
+        if re.search(pattern, v_lower):
+            raise ValueError('Invalid characters in code')
+    if not re.match(r'^[a-zA-Z0-9_\-\.]+$', v):
+        raise ValueError('Code must contain only alphanumeric characters, hyphens, underscores, and periods')
+    return v.strip()
+
+
+def reference_validate_description(v):
+    dangerous_patterns = [
+        r'<script.*?>.*?</script>', r'javascript:', r'on\w+\s*=',
+        r'\.\./', r'\.\.\\',
+    ]
+    v_clean = v
+    for pattern in dangerous_patterns:
+        v_clean = re.sub(pattern, '', v_clean, flags=re.IGNORECASE)
+    return v_clean.strip()
+
+
+def outcome(fn, value):
+    try:
+        return ("ok", fn(value))
+    except ValueError as e:
+        return ("error", str(e))
+
+
+CODES = [
+    "LAB-CBC-01", "RAD.CXR_01", "abc", "A--B", "A;B", "A/*B", "A*/B", "A\\B", "A\x00B",
+    "$(rm)", "`id`", "a|b", "a&&b", "a||b", "<SCRIPT>", "JavaScript:x", "data:x",
+    "../etc", "..\\etc", "ABC\n", " ABC", "ABC ", "مختبر", "LAB-01:", "KelvinK",
+    "İstanbul", "a b", "A-B-C-", "-", ".", "__",
+]
+
+DESCRIPTIONS = [
+    "Complete Blood Count Test",
+    "  padded  ",
+    "<script>alert(1)</script>CBC",
+    "<SCRIPT src=x>bad</Script> x-ray",
+    "java<script>x</script>script:alert(1)",
+    "JavaScript:void(0)",
+    "img onerror = alert(1)",
+    "consultation=follow-up",
+    "Follow-up ONCLICK=x",
+    "../../etc/passwd",
+    "..\\windows",
+    ".<script>x</script>./x",
+    "تحليل صورة دم كاملة",
+    "on = x",
+    "<script>\nmultiline</script>",
+]
+
+
+class TestValidatorEquivalence:
+    """New validators return the same values and errors as the reference"""
+
+    @pytest.mark.parametrize("code", CODES)
+    def test_internal_code(self, code):
+        assert outcome(validate_internal_code, code) == outcome(reference_validate_code, code)
+
+    @pytest.mark.parametrize("description", DESCRIPTIONS)
+    def test_description(self, description):
+        assert sanitize_description(description) == reference_validate_description(description)
+
+    def test_random_inputs(self):
+        rng = random.Random(1234)
+        alphabet = "aZ09_-.;/*\\$()`|&<>:= \n\tscriptjavaondtا"
+        fragments = ["--", "../", "..\\", "<script>", "</script>", "javascript:", "onload=", "data:"]
+        for _ in range(5000):
+            parts = [rng.choice(alphabet) for _ in range(rng.randint(1, 12))]
+            if rng.random() < 0.3:
+                parts.insert(rng.randint(0, len(parts)), rng.choice(fragments))
+            value = "".join(parts)
+            assert outcome(validate_internal_code, value) == outcome(reference_validate_code, value), value
+            assert sanitize_description(value) == reference_validate_description(value), value
@@ -0,0 +1,260 @@
+"""
+Test Suite for the Shared sbs_common Package
+============================================
+
+Tests for:
+- RateLimiter window and idle-client sweep
+- Common middleware stack (request IDs, 429s, CORS, latency metrics)
+- DatabasePool checkout/return, bounded waiting and idle health checks (fake psycopg2 pool)
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sbs_common import db as sbs_db  # noqa: E402
+from sbs_common.db import DatabasePool, PoolTimeout  # noqa: E402
+from sbs_common.metrics import ServiceMetrics  # noqa: E402
+from sbs_common.middleware import RateLimiter, install_middleware  # noqa: E402
+
+
+class TestRateLimiter:
+    """Tests for the sliding-window limiter"""
+
+    def test_limits_per_identifier(self):
+        limiter = RateLimiter(max_requests=2, time_window=60)
+
+        assert [limiter.is_allowed("a") for _ in range(3)] == [True, True, False]
+        assert limiter.is_allowed("b")
+
+    def test_window_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        limiter = RateLimiter(max_requests=1, time_window=60)
+
+        assert limiter.is_allowed("a")
+        assert not limiter.is_allowed("a")
+        now[0] += 61
+        assert limiter.is_allowed("a")
+
+    def test_idle_clients_are_swept(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        limiter = RateLimiter(max_requests=5, time_window=60, sweep_interval=120)
+        for client in range(100):
+            limiter.is_allowed(f"10.0.0.{client}")
+
+        now[0] += 121
+        limiter.is_allowed("10.0.1.1")
+
+        assert list(limiter.requests) == ["10.0.1.1"]
+
+
+@pytest.fixture(scope="module")
+def metrics():
+    return ServiceMetrics("sbs_common_test")
+
+
+@pytest.fixture
+def client(metrics):
+    app = FastAPI()
+    install_middleware(
+        app, metrics, rate_limiter=RateLimiter(max_requests=1, time_window=60),
+        allowed_origins=["http://localhost:3000"]
+    )
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    @app.get("/health")
+    def health():
+        return {"status": "healthy"}
+
+    return TestClient(app)
+
+
+class TestMiddleware:
+    """Tests for install_middleware"""
+
+    def test_request_id_and_latency_by_route_template(self, client, metrics):
+        response = client.get("/items/7")
+
+        assert response.status_code == 200
+        assert response.headers["X-Request-ID"]
+        text = metrics.render_latest()[0].decode()
+        assert 'route="/items/{item_id}"' in text
+
+    def test_rate_limited_response_keeps_cors_and_request_id(self, client, metrics):
+        headers = {"Origin": "http://localhost:3000"}
+        client.get("/items/1", headers=headers)
+        response = client.get("/items/2", headers=headers)
+
+        assert response.status_code == 429
+        assert response.json()["retry_after_seconds"] == 60
+        assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+        assert response.headers["X-Request-ID"]
+        assert metrics.counter_values()["sbs_common_test_rate_limited_total"] >= 1
+
+    def test_health_is_exempt(self, client):
+        assert all(client.get("/health").status_code == 200 for _ in range(3))
+
+    def test_exempt_paths_are_per_service(self, metrics):
+        app = FastAPI()
+        install_middleware(app, metrics, rate_limiter=RateLimiter(max_requests=1, time_window=60),
+                           allowed_origins=[], exempt_paths=("/metrics",))
+
+        @app.get("/metrics")
+        def scrape():
+            return {}
+
+        @app.get("/health")
+        def health():
+            return {"status": "healthy"}
+
+        client = TestClient(app)
+        assert all(client.get("/metrics").status_code == 200 for _ in range(3))
+        assert [client.get("/health").status_code for _ in range(2)] == [200, 429]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.alive = True
+        self.pings = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.pings += 1
+        if not self.conn.alive:
+            raise RuntimeError("server closed the connection unexpectedly")
+
+    def close(self):
+        pass
+
+
+class FakeThreadedPool:
+    instances = 0
+
+    def __init__(self, minconn, maxconn, **params):
+        FakeThreadedPool.instances += 1
+        self.closed = False
+        self._pool = []
+        self._used = {}
+        self.returned = []
+
+    def getconn(self):
+        conn = self._pool.pop() if self._pool else FakeConnection()
+        self._used[id(conn)] = conn
+        return conn
+
+    def putconn(self, conn, close=False):
+        del self._used[id(conn)]
+        self.returned.append(close)
+        if not close:
+            self._pool.append(conn)
+
+    def closeall(self):
+        self.closed = True
+
+
+class TestDatabasePool:
+    """Tests for DatabasePool"""
+
+    @pytest.fixture
+    def db_pool(self, monkeypatch):
+        FakeThreadedPool.instances = 0
+        monkeypatch.setattr(sbs_db.pool, "ThreadedConnectionPool", FakeThreadedPool)
+        waits = []
+        return DatabasePool(
+            params={}, min_size=1, max_size=2, checkout_observer=waits.append,
+            checkout_timeout=0.05, health_check_idle=60
+        ), waits
+
+    def test_pool_is_created_once_and_connections_reused(self, db_pool):
+        db_pool, waits = db_pool
+        with db_pool.connection() as first:
+            assert db_pool.stats()["in_use"] == 1
+        with db_pool.connection() as second:
+            pass
+
+        assert first is second
+        assert FakeThreadedPool.instances == 1
+        assert len(waits) == 2
+        assert db_pool.stats() == {
+            "open": True, "min_size": 1, "max_size": 2, "in_use": 0, "idle": 1,
+            "checkouts": 2, "checkout_timeouts": 0, "health_checks": 0, "discarded": 0
+        }
+
+    def test_connection_returned_on_error_and_closed_connections_dropped(self, db_pool):
+        db_pool, _ = db_pool
+        with pytest.raises(RuntimeError):
+            with db_pool.connection() as conn:
+                conn.closed = 1
+                raise RuntimeError("query failed")
+
+        assert db_pool.pool.returned == [True]
+        assert db_pool.stats()["idle"] == 0
+
+    def test_checkout_waits_then_times_out_when_exhausted(self, db_pool):
+        db_pool, _ = db_pool
+        with db_pool.connection(), db_pool.connection():
+            with pytest.raises(PoolTimeout):
+                with db_pool.connection():
+                    pass
+
+        assert db_pool.stats()["checkout_timeouts"] == 1
+        assert db_pool.stats()["in_use"] == 0
+
+    def test_waiting_checkout_gets_released_connection(self, db_pool):
+        db_pool, _ = db_pool
+        db_pool.checkout_timeout = 5
+        holder = db_pool.connection()
+        holder.__enter__()
+        second = db_pool.connection()
+        second.__enter__()
+        threading.Timer(0.05, holder.__exit__, (None, None, None)).start()
+
+        with db_pool.connection() as conn:
+            assert conn is not None
+        second.__exit__(None, None, None)
+
+        assert db_pool.stats()["checkout_timeouts"] == 0
+
+    def test_dead_idle_connection_is_replaced(self, db_pool, monkeypatch):
+        db_pool, _ = db_pool
+        now = [1000.0]
+        monkeypatch.setattr(sbs_db.time, "monotonic", lambda: now[0])
+        with db_pool.connection() as first:
+            pass
+        first.alive = False
+
+        now[0] += 30
+        with db_pool.connection() as conn:
+            assert conn is first  # recently used: not pinged
+        assert first.pings == 0
+
+        now[0] += 61
+        with db_pool.connection() as conn:
+            assert conn is not first
+
+        stats = db_pool.stats()
+        assert (stats["health_checks"], stats["discarded"]) == (1, 1)
+        assert db_pool.pool.returned[-2:] == [True, False]
@@ -0,0 +1,113 @@
+"""
+Test Suite for Signer Batch Signing
+===================================
+
+Tests for:
+- One certificate/key resolution per facility
+- Results in input order with per-item errors
+- Signatures verifiable as SHA256withRSA (PKCS#1 v1.5)
+"""
+
+import base64
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "signer-service"))
+
+from batch_signing import SignItem, SigningError, group_by_facility, sign_batch  # noqa: E402
+
+
+class NotFound(Exception):
+    """Shaped like fastapi.HTTPException"""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.status_code = 404
+        self.detail = detail
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {facility_id: rsa.generate_private_key(public_exponent=65537, key_size=2048) for facility_id in (1, 2)}
+
+
+def canonical(payload):
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def sign(payload, private_key):
+    return base64.b64encode(private_key.sign(canonical(payload), padding.PKCS1v15(), hashes.SHA256())).decode()
+
+
+def submitter(executor, sign_function=None):
+    return lambda payload, certificate, private_key: executor.submit(sign_function or sign, payload, private_key)
+
+
+def run(items, keys, executor):
+    lookups = []
+
+    def get_signing_key(facility_id):
+        lookups.append(facility_id)
+        if facility_id not in keys:
+            raise NotFound(f"No valid signing certificate found for facility {facility_id}")
+        return {"serial_number": f"FAC-{facility_id}"}, keys[facility_id]
+
+    return sign_batch(items, get_signing_key, submitter(executor)), lookups
+
+
+class TestSignBatch:
+    """Tests for sign_batch"""
+
+    def test_results_in_input_order_with_one_lookup_per_facility(self, keys):
+        items = [SignItem(facility_id, {"resourceType": "Claim", "id": str(i)})
+                 for i, facility_id in enumerate([2, 1, 2, 1, 1])]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results, lookups = run(items, keys, executor)
+
+        assert sorted(lookups) == [1, 2]
+        assert [result["index"] for result in results] == list(range(5))
+        for item, result in zip(items, results):
+            assert result["signature"]["certificate_serial"] == f"FAC-{item.facility_id}"
+            keys[item.facility_id].public_key().verify(
+                base64.b64decode(result["signature"]["signature"]), canonical(item.payload),
+                padding.PKCS1v15(), hashes.SHA256()
+            )
+
+    def test_per_item_errors(self, keys):
+        items = [SignItem(1, {"id": "a"}), SignItem(9, {"id": "b"}), SigningError(422, "Invalid sign request"),
+                 SignItem(9, {"id": "c"}), SignItem(2, {"id": "d"})]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results, lookups = run(items, keys, executor)
+
+        assert [result["status"] for result in results] == ["ok", "error", "error", "error", "ok"]
+        assert results[1]["error"] == {"status_code": 404,
+                                       "message": "No valid signing certificate found for facility 9"}
+        assert results[2]["error"]["status_code"] == 422
+        assert lookups.count(9) == 1
+
+    def test_signing_failure_is_reported_per_item(self, keys):
+        def failing_sign(payload, private_key):
+            if payload["id"] == "bad":
+                raise ValueError("boom")
+            return sign(payload, private_key)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = sign_batch([SignItem(1, {"id": "ok"}), SignItem(1, {"id": "bad"})],
+                                 lambda facility_id: ({"serial_number": "S"}, keys[1]),
+                                 submitter(executor, failing_sign))
+
+        assert results[0]["status"] == "ok"
+        assert results[1]["error"] == {"status_code": 500, "message": "boom"}
+
+    def test_group_by_facility_skips_errors(self):
+        groups = group_by_facility([SignItem(3, {}), SigningError(422, "x"), SignItem(1, {}), SignItem(3, {})])
+
+        assert groups == {3: [0, 3], 1: [2]}
@@ -0,0 +1,133 @@
+"""
+Test Suite for Signer Canonicalization
+======================================
+
+Tests for:
+- canonical_bytes (orjson) matching canonicalize_payload(...).encode() byte for byte
+  on the sample claims and FHIR bundles in fixtures_data
+- Fallback to json.dumps where orjson formats differently (exponent floats,
+  NaN/Infinity, big integers, non-str keys, deep nesting)
+- Same errors as json.dumps for non-JSON values
+- iter_canonical_chunks/canonical_digest streaming the same bytes in bounded chunks
+"""
+
+import datetime
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "signer-service"))
+
+from canonical import (  # noqa: E402
+    STREAM_CHUNK_SIZE,
+    STREAM_PIECE_SIZE,
+    canonical_bytes,
+    canonical_digest,
+    canonicalize_payload,
+    iter_canonical_chunks,
+)
+from fixtures_data import (  # noqa: E402
+    SAMPLE_CLAIM_COMPLEX,
+    SAMPLE_CLAIM_SIMPLE,
+    SAMPLE_CLAIM_SURGERY,
+    SAMPLE_FHIR_BUNDLE_COMPLEX,
+    SAMPLE_FHIR_BUNDLE_SIMPLE,
+    SAMPLE_FHIR_BUNDLE_SURGERY,
+    SampleData,
+)
+
+
+def reference(payload):
+    return canonicalize_payload(payload).encode("utf-8")
+
+
+class TestCanonicalBytes:
+    """Tests for canonical_bytes"""
+
+    @pytest.mark.parametrize("payload", [
+        SAMPLE_CLAIM_SIMPLE, SAMPLE_CLAIM_COMPLEX, SAMPLE_CLAIM_SURGERY,
+        SAMPLE_FHIR_BUNDLE_SIMPLE, SAMPLE_FHIR_BUNDLE_COMPLEX, SAMPLE_FHIR_BUNDLE_SURGERY,
+        SampleData.SBS_CODES, SampleData.PATIENTS, SampleData.FACILITIES,
+    ])
+    def test_fixtures_are_byte_identical(self, payload):
+        assert canonical_bytes(payload) == reference(payload)
+
+    def test_generated_bundles_are_byte_identical(self):
+        codes = list(SampleData.SBS_CODES)
+        for i in range(len(codes)):
+            claim = SampleData.generate_claim(patient_idx=i % 3, facility_idx=i % 3, insurance_idx=i % 3,
+                                              services=codes[:i + 1], diagnosis_codes=["J06.9"])
+            bundle = SampleData.generate_fhir_bundle(claim)
+            assert canonical_bytes(bundle) == reference(bundle)
+
+    @pytest.mark.parametrize("value", [
+        1e16, -1.2345678901234568e+17, 1e-05, 5.6964280019929815e-08, 5e-324, 1.7976931348623157e+308,
+        float("nan"), float("inf"), -float("inf"),
+        2 ** 64, -2 ** 63 - 1, 2 ** 63 - 1, 0.1, 100.0, -0.0, 9999999999999998.0, 0.0001,
+        "\x00\x08\x0c\x1f\x7f  \"\\/\n\r\t", "تحليل صورة دم 😀", "x:1e5,", "null",
+    ])
+    def test_values_orjson_formats_differently(self, value):
+        payload = {"b": [value, {"v": value}], "a": value}
+        assert canonical_bytes(payload) == reference(payload)
+
+    def test_key_order_and_non_str_keys(self):
+        payload = {"é": 1, "z": 2, "A": 3, "a": 4, "\U0001F600": 5, "￿": 6}
+        assert canonical_bytes(payload) == reference(payload)
+        assert canonical_bytes({"a": {1: "x", 2: "y"}}) == reference({"a": {1: "x", 2: "y"}})
+
+    def test_deep_nesting(self):
+        payload = {}
+        for _ in range(300):
+            payload = {"n": [payload]}
+        assert canonical_bytes(payload) == reference(payload)
+
+    @pytest.mark.parametrize("payload", [{"date": datetime.date(2024, 1, 15)}, {"a": {1, 2}}])
+    def test_non_json_values_raise_like_json_dumps(self, payload):
+        with pytest.raises(TypeError):
+            reference(payload)
+        with pytest.raises(TypeError):
+            canonical_bytes(payload)
+
+
+def large_bundle():
+    """Over a megabyte: many claim items plus long non-ASCII strings"""
+    bundle = dict(SAMPLE_FHIR_BUNDLE_COMPLEX)
+    claim = SampleData.generate_claim(0, 0, 0, services=list(SampleData.SBS_CODES), diagnosis_codes=["J06.9"])
+    bundle["entry"] = [{"resource": claim, "fullUrl": f"urn:uuid:{i}"} for i in range(600)]
+    bundle["note"] = ("تقرير \"طبي\"\n" * 20000, [1e-7, float("nan"), 2 ** 70], {3: "int key", 4: None})
+    return bundle
+
+
+class TestStreamingCanonicalForm:
+    """Tests for iter_canonical_chunks and canonical_digest"""
+
+    @pytest.mark.parametrize("payload", [
+        SAMPLE_FHIR_BUNDLE_COMPLEX, {}, {"a": []}, {"b": [1e16, {"v": "x" * 100}] * 3000},
+    ])
+    def test_chunks_join_to_canonical_bytes(self, payload):
+        assert b"".join(iter_canonical_chunks(payload)) == reference(payload)
+
+    def test_large_payload_is_streamed_in_bounded_chunks(self):
+        payload = large_bundle()
+        expected = reference(payload)
+        chunks = list(iter_canonical_chunks(payload))
+
+        assert b"".join(chunks) == expected
+        assert len(chunks) > 1
+        assert max(len(chunk) for chunk in chunks) < STREAM_CHUNK_SIZE + 4 * STREAM_PIECE_SIZE
+        assert canonical_digest(payload) == hashlib.sha256(expected).digest()
+
+    def test_deep_nesting(self):
+        payload = {"s": "y" * STREAM_CHUNK_SIZE}
+        for _ in range(300):
+            payload = {"n": [payload]}
+        assert b"".join(iter_canonical_chunks(payload)) == reference(payload)
+
+    @pytest.mark.parametrize("payload", [{"date": datetime.date(2024, 1, 15)}, {"a": {1, 2}}, {"a": {1: 1, "b": 2}}])
+    def test_non_json_values_raise_like_json_dumps(self, payload):
+        with pytest.raises(TypeError):
+            reference(payload)
+        with pytest.raises(TypeError):
+            canonical_digest(payload)
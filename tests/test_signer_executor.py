@@ -0,0 +1,89 @@
+"""
+Test Suite for Signer Signing Executor
+======================================
+
+Tests for:
+- Thread and process workers producing verifiable SHA256withRSA signatures
+- Per-process key caches following key file changes
+- Canonical form of signed payloads
+- Streaming (prehashed digest) signatures identical to buffered ones
+"""
+
+import base64
+import os
+import sys
+
+import pytest
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "signer-service"))
+
+from canonical import canonical_bytes  # noqa: E402
+from signing_executor import EXECUTOR_PROCESS, EXECUTOR_THREAD, KeyRef, SigningExecutor  # noqa: E402
+
+PAYLOAD = {"resourceType": "Claim", "id": "c-1", "patient": {"name": "مريض"}, "total": {"value": 110.0}}
+
+
+def write_key(path):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    return private_key
+
+
+def verify(private_key, signature, payload=PAYLOAD):
+    private_key.public_key().verify(base64.b64decode(signature), canonical_bytes(payload),
+                                    padding.PKCS1v15(), hashes.SHA256())
+
+
+class TestSigningExecutor:
+    """Tests for SigningExecutor"""
+
+    def test_canonical_bytes(self):
+        assert canonical_bytes({"b": 1, "a": {"d": [1, 2], "c": "é"}}) == '{"a":{"c":"é","d":[1,2]},"b":1}'.encode()
+
+    def test_thread_workers_sign_with_the_given_key(self, tmp_path):
+        private_key = write_key(tmp_path / "key.pem")
+        executor = SigningExecutor(EXECUTOR_THREAD, workers=2)
+        try:
+            futures = [executor.submit(PAYLOAD, private_key, KeyRef(str(tmp_path / "key.pem"), 1, "S"))
+                       for _ in range(4)]
+            for future in futures:
+                verify(private_key, future.result())
+        finally:
+            executor.shutdown()
+
+        assert executor.stats() == {"mode": "thread", "workers": 2, "submitted": 4, "streamed": 0}
+
+    def test_process_workers_load_and_refresh_their_own_keys(self, tmp_path):
+        key_path = tmp_path / "key.pem"
+        first_key = write_key(key_path)
+        executor = SigningExecutor(EXECUTOR_PROCESS, workers=1)
+        try:
+            verify(first_key, executor.submit(PAYLOAD, None, KeyRef(str(key_path), 1, "S1")).result(timeout=60))
+
+            second_key = write_key(key_path)
+            verify(second_key, executor.submit(PAYLOAD, None, KeyRef(str(key_path), 2, "S2")).result(timeout=60))
+        finally:
+            executor.shutdown()
+
+    def test_streaming_signature_is_identical_and_verifies(self, tmp_path):
+        private_key = write_key(tmp_path / "key.pem")
+        payload = {"entry": [dict(PAYLOAD, id=f"c-{i}", note="x" * 2000) for i in range(100)], "big": "é" * 40000}
+        executor = SigningExecutor(EXECUTOR_THREAD, workers=1)
+        try:
+            key_ref = KeyRef(str(tmp_path / "key.pem"), 1, "S")
+            buffered = executor.submit(payload, private_key, key_ref).result()
+            streamed = executor.submit(payload, private_key, key_ref, streaming=True).result()
+        finally:
+            executor.shutdown()
+
+        assert streamed == buffered
+        verify(private_key, streamed, payload)
+        assert executor.stats()["streamed"] == 1
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            SigningExecutor("fiber")
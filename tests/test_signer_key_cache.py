@@ -0,0 +1,144 @@
+"""
+Test Suite for Signer Key Cache
+===============================
+
+Tests for:
+- Reusing the parsed private key across requests
+- Invalidation on certificate NOTIFY, key file changes and expiry
+- Keeping the parsed key when a re-checked row is unchanged
+- Resolving and loading key files (shared with process-mode workers)
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "signer-service"))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+
+from key_cache import CertificateChangeListener, SigningKeyCache, load_key_file, resolve_key_path  # noqa: E402
+
+TODAY = date(2026, 1, 15)
+
+
+class FakeCertificates:
+    """Stands in for the facility_certificates query and the PEM loader"""
+
+    def __init__(self, key_path):
+        self.rows = {1: {"cert_id": 10, "serial_number": "FAC-1-A", "private_key_path": str(key_path),
+                         "valid_from": TODAY - timedelta(days=30), "valid_until": TODAY + timedelta(days=30)}}
+        self.fetches = 0
+        self.loads = []
+
+    def fetch(self, facility_id):
+        self.fetches += 1
+        return dict(self.rows[facility_id])
+
+    def load(self, path):
+        with open(path, "rb") as key_file:
+            self.loads.append(key_file.read())
+        return object()
+
+
+def make_cache(tmp_path, ttl=300.0, today=lambda: TODAY):
+    key_path = tmp_path / "private_key.pem"
+    key_path.write_bytes(b"key-1")
+    certificates = FakeCertificates(key_path)
+    return SigningKeyCache(certificates.fetch, certificates.load, ttl=ttl, today=today), certificates, key_path
+
+
+class TestSigningKeyCache:
+    """Tests for SigningKeyCache"""
+
+    def test_key_is_loaded_once(self, tmp_path):
+        cache, certificates, _ = make_cache(tmp_path)
+
+        first = cache.get(1)
+        second = cache.get(1)
+
+        assert first[1] is second[1]
+        assert certificates.fetches == 1
+        assert len(certificates.loads) == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_notify_drops_the_facility(self, tmp_path):
+        cache, certificates, _ = make_cache(tmp_path)
+        listener = CertificateChangeListener(connect=None, cache=cache)
+        cache.get(1)
+
+        certificates.rows[1].update(cert_id=11, serial_number="FAC-1-B")
+        listener.handle_payload('{"facility_id": 1}')
+        certificate, _ = cache.get(1)
+
+        assert certificate["serial_number"] == "FAC-1-B"
+        assert len(certificates.loads) == 2
+
+    def test_file_change_reloads_the_key(self, tmp_path):
+        cache, certificates, key_path = make_cache(tmp_path)
+        cache.get(1)
+
+        key_path.write_bytes(b"key-2-longer")
+        cache.get(1)
+
+        assert certificates.loads == [b"key-1", b"key-2-longer"]
+        assert cache.stats()["file_changes"] == 1
+
+    def test_expired_certificate_is_not_served(self, tmp_path):
+        today = [TODAY]
+        cache, certificates, _ = make_cache(tmp_path, today=lambda: today[0])
+        cache.get(1)
+
+        today[0] = TODAY + timedelta(days=30)
+        cache.get(1)
+
+        assert certificates.fetches == 2
+        assert cache.stats()["expired"] == 1
+
+    def test_unchanged_row_keeps_the_parsed_key(self, tmp_path):
+        cache, certificates, _ = make_cache(tmp_path, ttl=0.0)
+
+        first = cache.get(1)
+        second = cache.get(1)
+
+        assert certificates.fetches == 2
+        assert len(certificates.loads) == 1
+        assert first[1] is second[1]
+
+    def test_invalidation_during_load_is_not_overwritten(self, tmp_path):
+        cache, certificates, _ = make_cache(tmp_path)
+        fetch = certificates.fetch
+
+        def fetch_then_invalidate(facility_id):
+            row = fetch(facility_id)
+            cache.invalidate_all()
+            return row
+
+        cache.fetch_certificate = fetch_then_invalidate
+        cache.get(1)
+
+        assert cache.stats()["size"] == 0
+
+
+class TestKeyFiles:
+    """Tests for the key loader shared by the service and process-mode workers"""
+
+    def test_relative_paths_resolve_under_cert_base_path(self, monkeypatch):
+        monkeypatch.setenv("CERT_BASE_PATH", "/srv/certs")
+
+        assert resolve_key_path("facility_1/key.pem") == "/srv/certs/facility_1/key.pem"
+        assert resolve_key_path("/keys/key.pem") == "/keys/key.pem"
+
+    def test_encrypted_key_uses_cert_password(self, tmp_path, monkeypatch):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        key_path = tmp_path / "key.pem"
+        key_path.write_bytes(private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(b"secret")
+        ))
+        monkeypatch.setenv("CERT_PASSWORD", "secret")
+
+        loaded = load_key_file(str(key_path))
+
+        assert loaded.private_numbers() == private_key.private_numbers()
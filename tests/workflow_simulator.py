@@ -291,39 +291,54 @@ class WorkflowSimulator:
         normalized_services = []
 
         try:
-            for service in claim.services:
-                payload = {
+            payload = [
+                {
                     "facility_id": claim.facility_id,
                     "internal_code": service["internal_code"],
                     "description": service["description"]
                 }
+                for service in claim.services
+            ]
 
-                step.request = payload
+            step.request = payload
 
-                async with self._session.post(
-                    f"{self.normalizer_url}/normalize",
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        normalized_services.append({
-                            **service,
-                            "sbs_code": data.get("sbs_mapped_code"),
-                            "sbs_description": data.get("official_description"),
-                            "confidence": data.get("confidence"),
-                            "mapping_source": data.get("mapping_source")
-                        })
-                    else:
-                        error_text = await response.text()
-                        logger.warning(f"Normalization returned {response.status}: {error_text}")
-                        # Use fallback with original data
-                        normalized_services.append({
-                            **service,
-                            "sbs_code": service["internal_code"],
-                            "sbs_description": service["description"],
-                            "confidence": 0.5,
-                            "mapping_source": "fallback"
-                        })
+            async with self._session.post(
+                f"{self.normalizer_url}/normalize/batch",
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    results = data.get("results", [])
+                else:
+                    error_text = await response.text()
+                    logger.warning(f"Batch normalization returned {response.status}: {error_text}")
+                    results = []
+
+            results_by_index = {r.get("index"): r for r in results}
+            for index, service in enumerate(claim.services):
+                item = results_by_index.get(index, {})
+                if item.get("status") == "mapped":
+                    normalized_services.append({
+                        **service,
+                        "sbs_code": item.get("sbs_mapped_code"),
+                        "sbs_description": item.get("official_description"),
+                        "confidence": item.get("confidence"),
+                        "mapping_source": item.get("mapping_source")
+                    })
+                else:
+                    if item:
+                        logger.warning(
+                            f"Normalization of {service['internal_code']} returned "
+                            f"{item.get('status')}: {item.get('error')}"
+                        )
+                    # Use fallback with original data
+                    normalized_services.append({
+                        **service,
+                        "sbs_code": service["internal_code"],
+                        "sbs_description": service["description"],
+                        "confidence": 0.5,
+                        "mapping_source": "fallback"
+                    })
 
             result.normalized_bundle = {
                 "claim_id": claim.claim_id,